@@ -0,0 +1,330 @@
+"""
+Adaptive per-host concurrency for stream requests.
+
+Pushing more parallel range requests at a host than it tolerates gets them throttled:
+403/429/503 responses, dropped connections or crawling transfers. AdaptiveController
+keeps one window per host and every range request of every download needs a slot in it,
+so concurrent downloads and their segments share whatever the host currently accepts.
+Windows follow AIMD, like TCP congestion control:
+    additive increase: each successful request while the window is full grows it by
+        1/window, i.e. about one slot per window's worth of successes.
+    multiplicative decrease: a throttled, failed or unusually slow request (well below
+        the host's running throughput) shrinks it by `decrease`, at most
+        once per `cooldown` seconds so one burst of errors counts as one signal.
+Transient failures are retried by the caller with `backoff_delay`, which spreads the
+retries of many requests out with full jitter and honours Retry-After.
+Args:
+    initial (int, optional): Starting window per host. Defaults to 8.
+    minimum (int, optional): Smallest window. Defaults to 1.
+    maximum (int, optional): Largest window. Defaults to 32.
+    decrease (float, optional): Factor the window is multiplied by on a signal. Defaults to 0.5.
+    cooldown (float, optional): Seconds between two decreases of a window. Defaults to 1.
+    metrics (MetricsRecorder | None, optional): Receives the window sizes and signals.
+        Defaults to the process-wide recorder.
+Methods:
+    slot: Context manager holding a slot of a URL's host for one request.
+    slot_async: The same for coroutines, waiting on the event loop.
+    classify: Maps an error to the signal it gives the controller.
+    backoff_delay: Jittered exponential delay before a retry.
+    get_controller: The process-wide controller.
+"""
+
+import asyncio
+import http.client
+import random
+import socket
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, Union
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from Youtube.errors import DownloadAbortedError
+from Youtube.metrics import MetricsRecorder, get_metrics
+from Youtube.scheduler import get_scheduler
+
+# Outcomes of a request, as signals to the controller
+OK, THROTTLED, FAILED, NEUTRAL, SLOW = "ok", "throttled", "failed", "neutral", "slow"
+THROTTLE_STATUS = {403, 429, 503}
+RETRY_STATUS = THROTTLE_STATUS | {500, 502, 504}
+SLOW_FRACTION = 0.25  # A request below this share of the usual throughput counts as slow
+SLOW_MIN_BYTES = 1 << 20  # Requests smaller than this are dominated by latency
+THROUGHPUT_SMOOTHING = 0.2
+MAX_RETRY_AFTER = 60.0
+SLOT_POLL_INTERVAL = 0.05  # Seconds between slot checks of a coroutine waiting for one
+
+
+def classify(error: BaseException) -> str:
+    """
+    Return the signal an error gives: THROTTLED, FAILED (transient) or NEUTRAL.
+
+    :param error: Error raised by a request or while reading its body.
+    """
+    if isinstance(error, HTTPError):
+        if error.code in THROTTLE_STATUS:
+            return THROTTLED
+        return FAILED if error.code in RETRY_STATUS else NEUTRAL
+    if isinstance(error, DownloadAbortedError):
+        return NEUTRAL
+    if isinstance(
+        error,
+        (
+            URLError,
+            socket.timeout,
+            ConnectionError,
+            http.client.HTTPException,
+            asyncio.TimeoutError,
+            asyncio.IncompleteReadError,
+        ),
+    ):
+        return FAILED
+    return NEUTRAL
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether retrying the request that raised `error` may succeed.
+    """
+    return classify(error) != NEUTRAL
+
+
+def retry_after(error: BaseException) -> Union[float, None]:
+    """
+    Return the Retry-After delay in seconds sent with an HTTP error, if any.
+    """
+    headers = getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return min(MAX_RETRY_AFTER, max(0.0, float(value))) if value else None
+    except ValueError:
+        return None  # An HTTP date; fall back to the exponential delay
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = 0.5,
+    cap: float = 30.0,
+    error: Union[BaseException, None] = None,
+) -> float:
+    """
+    Return the delay before retry number `attempt` (0 for the first retry).
+
+    Full jitter: uniform between 0 and the exponential bound, so requests that failed
+    together do not retry together. A Retry-After sent by the server is a lower bound.
+
+    :param attempt: Retries already made.
+    :param base: Bound of the first retry in seconds.
+    :param cap: Largest bound in seconds.
+    :param error: The error being retried, checked for Retry-After.
+    """
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    hint = retry_after(error) if error is not None else None
+    return max(delay, hint) if hint is not None else delay
+
+
+@dataclass
+class Transfer:
+    """Bytes moved by the request holding a slot, reported back to its window."""
+
+    received: int = 0
+
+
+class HostWindow:
+    """AIMD Concurrency Window of One Host"""
+
+    def __init__(
+        self,
+        host: str,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+        metrics: Union[MetricsRecorder, None] = None,
+    ):
+        self.host = host
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.metrics = metrics or get_metrics()
+        self.in_flight = 0
+        self.throughput: Union[float, None] = None  # Smoothed bytes/s of the host
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a free slot if there is one, without waiting (for event loops).
+        """
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, cancel: Union[threading.Event, None] = None) -> None:
+        """
+        Block until the window has a free slot and take it.
+
+        :param cancel: Raises DownloadAbortedError when set while waiting.
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadAbortedError
+                self._cond.wait(0.25)
+            self.in_flight += 1
+
+    def release(self, outcome: str, received: int = 0, seconds: float = 0.0) -> None:
+        """
+        Give a slot back and adjust the window to the outcome of its request.
+
+        :param outcome: OK, THROTTLED, FAILED or NEUTRAL.
+        :param received: Bytes the request transferred.
+        :param seconds: How long the slot was held.
+        """
+        with self._cond:
+            full = self.in_flight >= int(self.limit)
+            sharing = self.in_flight
+            self.in_flight -= 1
+            # A global bandwidth cap slows requests down on purpose; that is no signal
+            if (
+                outcome == OK
+                and received >= SLOW_MIN_BYTES
+                and seconds > 0
+                and not get_scheduler().rate
+            ):
+                # Scale by the requests sharing the link, so a wider window on its own
+                # does not look like a slowdown
+                rate = received / seconds * sharing
+                if self.throughput is not None and rate < self.throughput * SLOW_FRACTION:
+                    outcome = SLOW
+                else:
+                    self.throughput = rate if self.throughput is None else (
+                        THROUGHPUT_SMOOTHING * rate
+                        + (1 - THROUGHPUT_SMOOTHING) * self.throughput
+                    )
+            if outcome in {THROTTLED, FAILED, SLOW}:
+                self._shrink(outcome)
+            elif outcome == OK and full:
+                # Only grow a window that is actually used up
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _shrink(self, reason: str) -> None:
+        now = time.monotonic()
+        self.metrics.observe("yt_host_signals", 1, host=self.host, reason=reason)
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.metrics.observe("yt_host_window", self.limit, host=self.host)
+
+
+class AdaptiveController:
+    """Per-Host AIMD Concurrency Controller"""
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+        metrics: Union[MetricsRecorder, None] = None,
+    ):
+        self.options = {
+            "initial": initial,
+            "minimum": minimum,
+            "maximum": maximum,
+            "decrease": decrease,
+            "cooldown": cooldown,
+            "metrics": metrics,
+        }
+        self.windows: Dict[str, HostWindow] = {}
+        self._lock = threading.Lock()
+
+    def window(self, url: str) -> HostWindow:
+        """
+        Return the window of the host a URL points at.
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self.windows:
+                self.windows[host] = HostWindow(host, **self.options)
+            return self.windows[host]
+
+    @contextmanager
+    def slot(
+        self, url: str, cancel: Union[threading.Event, None] = None
+    ) -> Iterator[Transfer]:
+        """
+        Hold a slot of the URL's host while one request runs.
+
+        Report the bytes read on the yielded Transfer; errors raised inside the block are
+        classified and fed back to the window before they propagate.
+
+        :param url: URL of the request.
+        :param cancel: Raises DownloadAbortedError when set while waiting for a slot.
+        """
+        window = self.window(url)
+        window.acquire(cancel)
+        with self._held(window) as transfer:
+            yield transfer
+
+    @asynccontextmanager
+    async def slot_async(self, url: str) -> AsyncIterator[Transfer]:
+        """
+        `slot` for coroutines: waits for the slot on the event loop instead of a thread.
+
+        :param url: URL of the request.
+        """
+        window = self.window(url)
+        while not window.try_acquire():
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        with self._held(window) as transfer:
+            yield transfer
+
+    @staticmethod
+    @contextmanager
+    def _held(window: HostWindow) -> Iterator[Transfer]:
+        """
+        Time a request holding a slot and release the slot with the request's outcome.
+        """
+        transfer = Transfer()
+        start = time.monotonic()
+        outcome = OK
+        try:
+            yield transfer
+        except BaseException as e:
+            outcome = classify(e)
+            raise
+        finally:
+            window.release(outcome, transfer.received, time.monotonic() - start)
+
+
+_CONTROLLER: Union[AdaptiveController, None] = None
+_CONTROLLER_LOCK = threading.Lock()
+
+
+def get_controller() -> AdaptiveController:
+    """
+    Return the process-wide controller shared by every download.
+    """
+    global _CONTROLLER  # pylint: disable = global-statement
+    with _CONTROLLER_LOCK:
+        if _CONTROLLER is None:
+            _CONTROLLER = AdaptiveController()
+        return _CONTROLLER
+
+
+def set_controller(controller: AdaptiveController) -> None:
+    """
+    Replace the process-wide controller (e.g. with different bounds, or in benchmarks).
+    """
+    global _CONTROLLER  # pylint: disable = global-statement
+    with _CONTROLLER_LOCK:
+        _CONTROLLER = controller
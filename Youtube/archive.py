@@ -0,0 +1,298 @@
+"""
+SQLite archive of completed downloads.
+
+Every finished download is recorded under (video ID, download type, resolution) with its
+output path and size. `YT.download_video` and `PL.download_playlist` look the key up
+before fetching anything, so a video that is already on disk is skipped instead of being
+downloaded again and rejected at the merge step.
+The archive doubles as the index of the GUI library view, which pages through it with
+`library_count` and `library_page` instead of walking the download folder.
+Args:
+    path (str, optional): Database file. Defaults to `APP_PATH/.cache/archive.sqlite3`.
+Methods:
+    lookup: Returns the archived download for a key if its file is still intact.
+    record: Stores a completed download.
+    forget: Drops the entries of a deleted output file.
+    rebuild: Re-creates the archive from the files found under a download folder.
+    library_count / library_page: Search and page through the entries, sorted.
+    revision: Changes whenever this or another process modified the archive.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+from Youtube.logic_helpers import APP_PATH, sanitize_filename
+
+SKIPPED_DIRS = {"tmp", ".cache", ".staging"}
+# Output names written by YT: <title>_audio.mp3, <title>_<res>_video.mp4, <title>_<res>.mp4
+OUTPUT_NAME = re.compile(
+    r"^(?P<title>.+?)_(?:(?P<audio>audio)\.mp3|(?P<res>\d{3,4}p)(?P<video>_video)?\.mp4)$"
+)
+# Sortable library columns and the SQL they order by
+LIBRARY_ORDER = {
+    "title": "title COLLATE NOCASE",
+    "video_id": "video_id",
+    "type": "type",
+    "resolution": "CAST(resolution AS INTEGER)",
+    "size": "size",
+    "completed": "completed",
+}
+
+
+def archive_resolution(_type: int, t_res: str) -> str:
+    """
+    Normalise the resolution part of an archive key; audio downloads have none.
+
+    :param _type: Type of download (1: audio, 2: video, 3: both).
+    :param t_res: Resolution label such as "1080p".
+    """
+    return "" if _type == 1 else t_res
+
+
+class DownloadArchive:
+    """Completed Downloads Archive"""
+
+    def __init__(self, path: str = os.path.join(APP_PATH, ".cache", "archive.sqlite3")):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS downloads (
+                    video_id TEXT NOT NULL,
+                    type INTEGER NOT NULL,
+                    resolution TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    title TEXT,
+                    completed REAL NOT NULL,
+                    PRIMARY KEY (video_id, type, resolution)
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS downloads_path ON downloads (path)"
+            )
+            # Serve the library view's default and title orders without sorting
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS downloads_completed ON downloads (completed)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS downloads_title ON downloads (title COLLATE NOCASE)"
+            )
+        self._revision = 0
+
+    def lookup(self, video_id: str, _type: int, resolution: str) -> Union[Dict, None]:
+        """
+        Return the archived download for a key, or None if it is unknown.
+
+        Entries whose file was deleted or changed size are dropped and reported as misses.
+
+        :param video_id: ID of the video.
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution label, "" for audio.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM downloads WHERE video_id = ? AND type = ? AND resolution = ?",
+                (video_id, _type, resolution),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            intact = os.path.getsize(row["path"]) == row["size"]
+        except OSError:
+            intact = False
+        if not intact:
+            self.forget(row["path"])
+            return None
+        return dict(row)
+
+    def record(
+        self,
+        video_id: str,
+        _type: int,
+        resolution: str,
+        path: str,
+        title: Union[str, None] = None,
+    ) -> None:
+        """
+        Store a completed download.
+
+        :param video_id: ID of the video.
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution label, "" for audio.
+        :param path: Path of the output file.
+        :param title: Title of the video.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id,
+                    _type,
+                    resolution,
+                    os.path.abspath(path),
+                    os.path.getsize(path),
+                    title,
+                    time.time(),
+                ),
+            )
+            self._revision += 1
+
+    def forget(self, path: str) -> None:
+        """
+        Drop the entries of an output file, e.g. after it was deleted.
+
+        :param path: Path of the output file.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM downloads WHERE path = ?", (os.path.abspath(path),)
+            )
+            self._revision += 1
+
+    def rebuild(
+        self, root: str, titles: Iterable[Tuple[str, str]]
+    ) -> Tuple[int, List[str]]:
+        """
+        Re-create the archive from the output files found under `root`.
+
+        Output names only carry the sanitized title, so files are matched to video IDs
+        through known (video ID, title) pairs, typically those of the metadata cache, and
+        the titles already in the archive. Entries whose files no longer exist are removed.
+
+        :param root: Download folder to scan.
+        :param titles: Known (video ID, title) pairs.
+        :return: Number of archived files and the paths that could not be matched.
+        """
+        ids = {sanitize_filename(title): video_id for video_id, title in titles}
+        with self._lock:
+            rows = self._db.execute("SELECT video_id, path, title FROM downloads").fetchall()
+        archived = {row["path"] for row in rows}
+        for row in rows:
+            if row["title"]:
+                ids.setdefault(sanitize_filename(row["title"]), row["video_id"])
+        found, unresolved = [], []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS]
+            for filename in filenames:
+                match = OUTPUT_NAME.match(filename)
+                if not match:
+                    continue
+                path = os.path.abspath(os.path.join(dirpath, filename))
+                video_id = ids.get(match.group("title"))
+                if video_id is None:
+                    if path not in archived:
+                        unresolved.append(path)
+                    continue
+                _type = 1 if match.group("audio") else 2 if match.group("video") else 3
+                found.append(
+                    (
+                        video_id,
+                        _type,
+                        archive_resolution(_type, match.group("res") or ""),
+                        path,
+                        os.path.getsize(path),
+                        match.group("title"),
+                        os.path.getmtime(path),
+                    )
+                )
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?)", found
+            )
+            for row in rows:
+                if not os.path.exists(row["path"]):
+                    self._db.execute("DELETE FROM downloads WHERE path = ?", (row["path"],))
+            self._revision += 1
+        return len(found), unresolved
+
+    def revision(self) -> Tuple[int, int]:
+        """
+        Return a value that changes whenever the archive was modified, by this process or
+        another one (e.g. the download daemon); cheap enough to poll from a timer.
+        """
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            return self._revision, data_version
+
+    @staticmethod
+    def _search(search: str) -> Tuple[str, Tuple]:
+        if not search:
+            return "", ()
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", search) + "%"
+        return " WHERE title LIKE ? ESCAPE '\\' OR video_id LIKE ? ESCAPE '\\'", (
+            pattern,
+            pattern,
+        )
+
+    def library_count(self, search: str = "") -> int:
+        """
+        Return the number of entries whose title or video ID contains `search`.
+
+        :param search: Case-insensitive substring; empty matches everything.
+        """
+        where, params = self._search(search)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM downloads{where}", params).fetchone()[0]
+
+    def library_page(
+        self,
+        search: str = "",
+        order_by: str = "completed",
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = 256,
+    ) -> List[Dict]:
+        """
+        Return one page of the entries matching `search`, sorted.
+
+        :param search: Case-insensitive substring of the title or video ID.
+        :param order_by: One of LIBRARY_ORDER.
+        :param descending: Sort direction.
+        :param offset: Index of the first entry of the page.
+        :param limit: Page size.
+        """
+        where, params = self._search(search)
+        direction = "DESC" if descending else "ASC"
+        order = f"{LIBRARY_ORDER[order_by]} {direction}, rowid {direction}"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM downloads{where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+_ARCHIVE: Union[DownloadArchive, None] = None
+_ARCHIVE_LOCK = threading.Lock()
+
+
+def get_archive() -> DownloadArchive:
+    """
+    Return the process-wide download archive.
+    """
+    global _ARCHIVE  # pylint: disable = global-statement
+    with _ARCHIVE_LOCK:
+        if _ARCHIVE is None:
+            _ARCHIVE = DownloadArchive()
+        return _ARCHIVE
+
+
+def set_archive(archive: Union[DownloadArchive, None]) -> None:
+    """
+    Replace the process-wide download archive; None restores the default on next use.
+
+    :param archive: The new archive.
+    """
+    global _ARCHIVE  # pylint: disable = global-statement
+    with _ARCHIVE_LOCK:
+        _ARCHIVE = archive
@@ -0,0 +1,671 @@
+"""
+asyncio counterparts of YT and PL.
+
+AsyncYT and AsyncPL expose metadata fetch, stream selection, download and merge as
+coroutines, so an asyncio service can drive many downloads from one event loop instead of
+parking a thread per download in `run_in_executor`.
+Stream transfers use asyncio sockets and ranged requests, merges run ffmpeg through an
+asyncio subprocess, and progress is published as an async iterator. Cancelling the task
+(or passing `timeout`) stops the transfers, kills ffmpeg and removes partial output.
+pytubefix, SQLite and disk setup are blocking, so metadata lookups, archive lookups,
+staging and manifest writes run on the default executor; the loop itself only moves
+bytes.
+Methods:
+    open_range_async: Opens a ranged GET request on an asyncio connection.
+    AsyncSegmentedDownloader: SegmentedDownloader whose ranges are fetched as tasks.
+    AsyncYT: Coroutine API for a single video.
+    AsyncPL: Coroutine API for a playlist, downloading entries concurrently.
+"""
+
+import asyncio
+import http.client
+import inspect
+import io
+import os
+import shutil
+import ssl
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import AsyncIterator, Dict, List, Set, Union
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+import ffmpeg
+from Youtube import urls
+from Youtube.adaptive import Transfer
+from Youtube.archive import archive_resolution, get_archive
+from Youtube.errors import (
+    DownloadError,
+    FFmpegError,
+    _FileExistsError,
+)
+from Youtube.http_pool import MAX_REDIRECTS, REDIRECTS
+from Youtube.logic_helpers import APP_PATH, describe_error, resolution_label
+from Youtube.logs import logging
+from Youtube.manifest import JobManifest
+from Youtube.scheduler import PRIORITY_BACKGROUND, get_scheduler
+from Youtube.segmented import DEFAULT_HEADERS, CONTENT_RANGE, SegmentedDownloader
+from Youtube.streams import StreamInfo
+from Youtube.yt_playlist_logic import PL, ItemResult
+from Youtube.yt_vid_logic import YT, FetchResult
+
+_SSL = ssl.create_default_context()
+
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking call (pytubefix, SQLite, disk setup) on the default executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+class AsyncResponse:
+    """Body reader of a response on a dedicated asyncio connection."""
+
+    def __init__(self, reader, writer, status: int, reason: str, headers, url: str, timeout):
+        self._reader = reader
+        self._writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.url = url
+        self.timeout = timeout
+        self._chunked = headers.get("Transfer-Encoding", "").lower() == "chunked"
+        length = headers.get("Content-Length")
+        self._left = int(length) if length is not None and not self._chunked else None
+        self._chunk_left = 0
+        self._eof = False
+
+    async def _read_raw(self, n: int) -> bytes:
+        return await asyncio.wait_for(self._reader.read(n), self.timeout)
+
+    async def _read_chunked(self, n: int) -> bytes:
+        if not self._chunk_left:
+            line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            self._chunk_left = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            if not self._chunk_left:
+                self._eof = True
+                return b""
+        data = await self._read_raw(min(n, self._chunk_left))
+        self._chunk_left -= len(data)
+        if not self._chunk_left:
+            await asyncio.wait_for(self._reader.readline(), self.timeout)  # Chunk CRLF
+        return data
+
+    async def read(self, n: int = 1 << 16) -> bytes:
+        """
+        Read up to `n` bytes of the body; b"" once it is exhausted.
+
+        :param n: Maximum number of bytes.
+        """
+        if self._eof:
+            return b""
+        if self._chunked:
+            return await self._read_chunked(n)
+        if self._left is not None:
+            n = min(n, self._left)
+            if not n:
+                self._eof = True
+                return b""
+        data = await self._read_raw(n)
+        if not data:
+            self._eof = True
+        elif self._left is not None:
+            self._left -= len(data)
+        return data
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+    async def __aenter__(self) -> "AsyncResponse":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+async def _send(url: str, headers: Dict[str, str], timeout: float) -> AsyncResponse:
+    parts = urlsplit(url)
+    https = parts.scheme.lower() == "https"
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += f"?{parts.query}"
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=_SSL if https else None),
+        timeout,
+    )
+    try:
+        lines = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except BaseException:
+        writer.close()
+        raise
+    status_line, _, raw_headers = head.partition(b"\r\n")
+    _, status, reason = (status_line.decode("latin-1").split(" ", 2) + [""])[:3]
+    parsed = http.client.parse_headers(io.BytesIO(raw_headers))
+    return AsyncResponse(reader, writer, int(status), reason.strip(), parsed, url, timeout)
+
+
+async def open_range_async(
+    url: str,
+    start: int,
+    end: Union[int, None] = None,
+    headers: Union[Dict[str, str], None] = None,
+    timeout: float = 30,
+) -> AsyncResponse:
+    """
+    Open a ranged GET request for the inclusive byte range [start, end], following redirects.
+
+    :param url: URL of the stream.
+    :param start: First byte offset.
+    :param end: Last byte offset, or None for the rest of the stream.
+    :param headers: Extra request headers.
+    :param timeout: Timeout in seconds for connecting and for every read.
+    """
+    headers = {
+        **DEFAULT_HEADERS,
+        **(headers or {}),
+        "Range": f"bytes={start}-{'' if end is None else end}",
+    }
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await _send(url, headers, timeout)
+        if response.status in REDIRECTS and response.headers.get("Location"):
+            await response.close()
+            url = urljoin(url, response.headers["Location"])
+            continue
+        if response.status >= 400:
+            await response.close()
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return response
+    raise HTTPError(url, 310, "Too many redirects", None, None)
+
+
+class AsyncSegmentedDownloader(SegmentedDownloader):
+    """
+    Segmented Range Downloader on asyncio.
+
+    Range splitting, manifest resume, progress bookkeeping and the retry policy are
+    inherited; every range is fetched as a task on the running loop, holding a slot of the
+    host's adaptive window. Progress is recorded in the manifest in memory and written out
+    on the default executor every `save_interval`. Cancellation is regular task
+    cancellation.
+    """
+
+    save_progress = False
+
+    async def _acquire(self, n: int) -> None:
+        # Reserve from the token bucket and sleep on the loop, so a rate cap never ties
+        # up an executor thread per transfer
+        while True:
+            granted, wait = get_scheduler().reserve(n, self.priority)
+            if wait:
+                await asyncio.sleep(wait)
+            if granted:
+                return
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.manifest.save_interval)
+            await _run_blocking(self.manifest.save)
+
+    async def probe_size(self) -> int:  # pylint: disable = invalid-overridden-method
+        async with await open_range_async(
+            self.url, 0, 0, self.headers, self.timeout
+        ) as response:
+            match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status != 206 or not match or match.group(3) == "*":
+                raise DownloadError(f"Server does not support range requests: {self.url}")
+            return int(match.group(3))
+
+    async def _fetch(self, index: int) -> None:  # pylint: disable = invalid-overridden-method
+        # The retry loop of SegmentedDownloader._fetch, sleeping on the loop
+        attempt = 0
+        while True:
+            try:
+                async with self.controller.slot_async(self.url) as transfer:
+                    await self._fetch_range(index, transfer)
+                return
+            except Exception as e:  # pylint: disable = broad-exception-caught
+                delay = self._retry_delay(index, attempt, e)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _fetch_range(self, index: int, transfer: Transfer) -> None:  # pylint: disable = invalid-overridden-method
+        start, end, done = self.state[index]
+        expected = end - start + 1
+        if done >= expected:
+            return
+        async with await open_range_async(
+            self.url, start + done, end, self.headers, self.timeout
+        ) as response:
+            if response.status != 206:
+                raise DownloadError(
+                    f"Expected partial content for bytes {start + done}-{end}, got HTTP {response.status}"
+                )
+            with open(self.path, "r+b", buffering=0) as f:
+                f.seek(start + done)
+                while done < expected:
+                    want = min(self.chunk_size, expected - done)
+                    await self._acquire(want)
+                    chunk = await response.read(want)
+                    if not chunk:
+                        break
+                    f.write(chunk)  # Page-cache write of one chunk; not worth a thread hop
+                    done += len(chunk)
+                    transfer.received += len(chunk)
+                    self._set_done(index, done, chunk)
+        if done != expected:
+            # The server closed early; retried from `done`
+            raise http.client.IncompleteRead(b"", expected - done)
+
+    async def download(self) -> int:  # pylint: disable = invalid-overridden-method
+        if self.size is None:
+            self.size = await self.probe_size()
+        self.state = await _run_blocking(self._resume_state)
+        limit = asyncio.Semaphore(self.segments)
+
+        async def fetch(index: int) -> None:
+            async with limit:
+                await self._fetch(index)
+
+        saver = asyncio.ensure_future(self._save_periodically()) if self.manifest else None
+        try:
+            await gather_all([fetch(index) for index in range(len(self.state))])
+        finally:
+            if saver:
+                saver.cancel()
+                await asyncio.gather(saver, return_exceptions=True)
+                await _run_blocking(self.manifest.save, force=True)
+        written = sum(r[2] for r in self.state)
+        actual = os.path.getsize(self.path)
+        if written != self.size or actual != self.size:
+            raise DownloadError(
+                f"Size mismatch for {self.path}: expected {self.size}, got {actual}"
+            )
+        return self.size
+
+
+async def gather_all(coros) -> list:
+    """
+    Await coroutines that must all succeed.
+
+    The asyncio counterpart of `wait_all`: on the first failure the remaining tasks are
+    cancelled and the original error is raised once they have stopped.
+
+    :param coros: The coroutines to run concurrently.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+@dataclass
+class ProgressEvent:
+    """Progress of one stream of an AsyncYT download."""
+
+    video_id: str
+    itag: int
+    received: int
+    remaining: int
+
+
+class AsyncYT:
+    """
+    Async Youtube Class
+
+    Wraps a YT instance for the metadata and naming logic and runs the transfers on the
+    event loop. Accepts the keyword arguments of YT; `streaming_merge` is not used.
+    """
+
+    def __init__(self, url: str, app_path: str = APP_PATH, **options):
+        self.url = url
+        self.app_path = app_path
+        self.options = options
+        self.yt: Union[YT, None] = None
+        self.skipped = False
+        self._listeners: Set[asyncio.Queue] = set()
+
+    async def fetch_metadata(self) -> str:
+        """
+        Resolve the video metadata and return its title.
+
+        Constructing YT is offline; the title comes from the metadata cache when it is
+        warm and is otherwise fetched from pytubefix, on the default executor either way.
+        """
+        if self.yt is None:
+            self.yt = YT(self.url, app_path=self.app_path, **self.options)
+        return await _run_blocking(getattr, self.yt, "title")
+
+    @property
+    def video_id(self) -> str:
+        return self.yt.video_id if self.yt else urls.video_id(self.url)
+
+    async def select_streams(self, _type: int, resolution: int = None):
+        """
+        Pick the video and audio streams for a download _type and resolution.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :return: (video, audio) StreamInfo, either of which may be None.
+        """
+        await self.fetch_metadata()
+        # Reads the metadata cache from disk even on a hit
+        return await _run_blocking(self.yt._select_streams, _type, resolution)  # pylint: disable = protected-access
+
+    async def progress(self) -> AsyncIterator[ProgressEvent]:
+        """
+        Iterate over the progress events of the running download.
+
+        Start iterating before (or while) `download` runs; iteration ends when it finishes.
+        Any number of consumers may iterate at the same time.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._listeners.discard(queue)
+
+    def _publish(self, event: Union[ProgressEvent, None]) -> None:
+        for queue in self._listeners:
+            queue.put_nowait(event)
+
+    async def download(self, _type: int, resolution: int = None, timeout: float = None) -> str:
+        """
+        Download a video and return the path of the output file.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :param timeout: Seconds after which the download is cancelled with TimeoutError.
+        """
+        try:
+            return await asyncio.wait_for(self._download(_type, resolution), timeout)
+        finally:
+            self._publish(None)
+
+    async def _download(self, _type: int, resolution: int = None) -> str:
+        await self.fetch_metadata()
+        yt = self.yt
+        yt.t_res = yt.requested_res = resolution_label(resolution)
+        key = (yt.video_id, _type, archive_resolution(_type, yt.t_res))
+        hit = await _run_blocking(yt.archive.lookup, *key)
+        if hit:
+            self.skipped = yt.skipped = True
+            logging.info(f"Skipped {yt.watch_url}: already downloaded to {hit['path']}")
+            return hit["path"]
+        try:
+            video, audio = await self.select_streams(_type, resolution)
+            out_path = yt._output_path(_type)  # pylint: disable = protected-access
+            if os.path.exists(out_path):
+                # Downloaded before the archive knew it (e.g. under a fallback resolution)
+                self.skipped = yt.skipped = True
+                await _run_blocking(yt._archive, _type, out_path)  # pylint: disable = protected-access
+                logging.info(f"Skipped {yt.watch_url}: already downloaded to {out_path}")
+                return out_path
+            fetched = await self._process(_type, video, audio)
+            await _run_blocking(yt.finalize, fetched)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await _run_blocking(yt.cache.invalidate_streams, yt.video_id)
+            logging.error(e)
+            raise DownloadError from e
+        finally:
+            await _run_blocking(yt.release)
+        return fetched.out_path
+
+    async def _process(
+        self, _type: int, video: Union[StreamInfo, None], audio: Union[StreamInfo, None]
+    ) -> FetchResult:
+        yt = self.yt
+        await _run_blocking(yt._stage, _type, video, audio)  # pylint: disable = protected-access
+        out_path = yt._output_path(_type)  # pylint: disable = protected-access
+        if os.path.exists(out_path):
+            raise _FileExistsError
+        manifest = await _run_blocking(JobManifest, os.path.join(yt.tmp, "manifest.json"))
+        v_out = os.path.join(yt.tmp, f"{video.itag}.mp4") if video else None
+        a_out = os.path.join(yt.tmp, f"{audio.itag}.mp3") if audio else None
+        transfers = []
+        if _type in {2, 3} and video:
+            transfers.append((video, v_out))
+        if _type in {1, 3} and audio:
+            transfers.append((audio, a_out))
+        await gather_all(
+            [self.download_stream(stream, path, manifest) for stream, path in transfers]
+        )
+        if _type == 3 and video and audio:
+            staged_path = os.path.join(yt.tmp, "merged.mp4")
+            await self.merge(v_out, a_out, staged_path)
+            return FetchResult(_type, out_path, staged_path)
+        if _type in {2, 3} and video:
+            return FetchResult(_type, out_path, v_out)
+        return FetchResult(_type, out_path, a_out)
+
+    async def download_stream(
+        self, stream: StreamInfo, path: str, manifest: Union[JobManifest, None] = None
+    ) -> None:
+        """
+        Download a single stream, resuming any progress recorded in the manifest.
+
+        :param stream: Stream to download.
+        :param path: Path of the output file.
+        :param manifest: Manifest of the current job.
+        """
+        yt = self.yt
+        start = time.perf_counter()
+        first_byte = []
+
+        def on_progress(_chunk: bytes, remaining: int) -> None:
+            if not first_byte:
+                first_byte.append(time.perf_counter() - start)
+            # Stream infos may lack a size; the downloader probes it before the first chunk
+            total = stream.filesize or downloader.size
+            if total:
+                self._publish(
+                    ProgressEvent(yt.video_id, stream.itag, total - remaining, remaining)
+                )
+            if yt.on_progress_callback:
+                yt.on_progress_callback(stream, _chunk, remaining)
+
+        downloader = AsyncSegmentedDownloader(
+            stream.url,
+            path,
+            size=stream.filesize,
+            segments=yt.segments,
+            segment_size=yt.segment_size,
+            manifest=manifest,
+            stream_id=str(stream.itag),
+            priority=yt.priority,
+            on_progress=on_progress,
+        )
+        size = await downloader.download()
+        yt._observe_stream(  # pylint: disable = protected-access
+            stream, time.perf_counter() - start, size, first_byte[0] if first_byte else None
+        )
+        if yt.on_complete_callback:
+            yt.on_complete_callback(stream, path)
+
+    async def merge(self, v_out: str, a_out: str, out_path: str) -> None:
+        """
+        Merge the video and audio files with an ffmpeg subprocess.
+
+        :param v_out: Path to the video file.
+        :param a_out: Path to the audio file.
+        :param out_path: Path of the merged output, which must not exist yet.
+        """
+        if os.path.exists(out_path):
+            raise _FileExistsError
+        args = ffmpeg.compile(
+            ffmpeg.output(
+                ffmpeg.input(v_out),
+                ffmpeg.input(a_out),
+                out_path,
+                vcodec="copy",
+                acodec="copy",
+                loglevel="quiet",
+            ),
+            overwrite_output=True,
+        )
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            if await process.wait() != 0:
+                raise FFmpegError(f"ffmpeg exited with code {process.returncode}")
+            self.yt.metrics.observe(
+                "yt_merge_seconds",
+                time.perf_counter() - start,
+                mode="async",
+                video_id=self.yt.video_id,
+            )
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if os.path.exists(out_path):
+                os.remove(out_path)  # Never leave a half-muxed file behind
+            raise
+
+
+class AsyncPL:
+    """
+    Async Playlist Logic
+
+    Entries are downloaded as AsyncYT tasks, at most `max_concurrency` at a time, while the
+    playlist pages are enumerated on the default executor.
+    """
+
+    def __init__(
+        self, url: str, app_path: str = APP_PATH, max_concurrency: int = 8, **options
+    ):
+        self.url = url
+        self.app_path = app_path
+        self.max_concurrency = max_concurrency
+        self.options = options
+        self.pl: Union[PL, None] = None
+
+    async def fetch_metadata(self) -> str:
+        """
+        Resolve the playlist metadata and return its title.
+        """
+        if self.pl is None:
+            # The options are meant for the entries (YT); pass on the ones PL shares,
+            # such as the client, proxies and OAuth settings
+            accepted = inspect.signature(PL.__init__).parameters
+            self.pl = PL(
+                self.url,
+                app_path=self.app_path,
+                **{name: value for name, value in self.options.items() if name in accepted},
+            )
+        # Fetching the title is a network request; keep it off the event loop
+        await _run_blocking(getattr, self.pl, "safe_title")
+        return self.pl.title
+
+    async def iter_video_urls(self) -> AsyncIterator[str]:
+        """
+        Yield the video URLs of the playlist as each page of it arrives.
+        """
+        await self.fetch_metadata()
+        pages = self.pl.iter_video_urls()
+        done = object()
+        while True:
+            url = await _run_blocking(next, pages, done)
+            if url is done:
+                return
+            yield url
+
+    async def download_playlist(
+        self, _type: int, resolution: int = None, timeout: float = None
+    ) -> List[ItemResult]:
+        """
+        Download all videos in the playlist; a failing entry does not stop the others.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :param timeout: Per-entry timeout in seconds.
+        :return: One result per entry, in playlist order.
+        """
+        await self.fetch_metadata()
+        manifest = await _run_blocking(JobManifest, os.path.join(self.pl.tmp, "playlist.json"))
+        limit = asyncio.Semaphore(max(1, self.max_concurrency))
+        tasks = []
+        index = 0
+        async for url in self.iter_video_urls():
+            await limit.acquire()  # Enumerate only as fast as entries are taken up
+            task = asyncio.ensure_future(
+                self._download_item(index, url, _type, resolution, manifest, timeout)
+            )
+            task.add_done_callback(lambda _: limit.release())
+            tasks.append(task)
+            index += 1
+        results = list(await asyncio.gather(*tasks))
+        failed = [result for result in results if not result.ok]
+        if not failed and os.path.exists(self.pl.tmp):
+            await _run_blocking(shutil.rmtree, self.pl.tmp)
+        logging.info(
+            f"Playlist {self.pl.playlist_url}: {len(results) - len(failed)} downloaded, {len(failed)} failed"
+        )
+        return results
+
+    async def _download_item(
+        self,
+        index: int,
+        url: str,
+        _type: int,
+        resolution: int,
+        manifest: JobManifest,
+        timeout: Union[float, None],
+    ) -> ItemResult:
+        start = time.monotonic()
+        result = ItemResult(index=index, url=url, ok=False)
+        try:
+            video_id = urls.video_id(url)
+            item_id = f"{video_id}:{_type}:{resolution}"
+            if manifest.is_item_finished(item_id) or await _run_blocking(
+                get_archive().lookup,
+                video_id,
+                _type,
+                archive_resolution(_type, resolution_label(resolution)),
+            ):
+                result.ok = result.skipped = True
+                return result
+            video = AsyncYT(
+                url,
+                app_path=self.pl.path,
+                priority=PRIORITY_BACKGROUND,
+                **self.options,
+            )
+            result.title = await video.fetch_metadata()
+            await video.download(_type, resolution, timeout=timeout)
+            result.ok = True
+            result.skipped = video.skipped
+            await _run_blocking(manifest.finish_item, item_id)
+        except Exception as e:  # pylint: disable = broad-exception-caught
+            result.error = describe_error(e)
+            logging.error(f"Failed to download {url}: {result.error}")
+        result.elapsed = time.monotonic() - start
+        return result
+
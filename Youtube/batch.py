@@ -0,0 +1,183 @@
+"""
+Batch downloads for yt-cli.
+
+A batch is a list of video URLs, one per line, read from a file or stdin. Each line may
+override the download type and resolution, either positionally or with the usual flags:
+    https://youtu.be/abc123
+    https://youtu.be/def456 1
+    https://youtu.be/ghi789 -f 2 -r 1
+Blank lines and lines starting with `#` are ignored, and repeated videos (by video ID)
+are dropped. All jobs then run through one in-process thread pool, and progress is
+written as JSON lines so other programs can follow along.
+Methods:
+    parse_batch: Turns batch lines into jobs, dropping duplicates.
+    run_batch: Downloads the jobs concurrently and returns a summary.
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterable, List, TextIO, Tuple
+from Youtube import urls
+from Youtube.errors import InvalidURLError
+from Youtube.logic_helpers import describe_error
+from Youtube.yt_vid_logic import YT
+
+PROGRESS_INTERVAL = 1.0  # Seconds between progress events of one job
+
+
+@dataclass
+class BatchJob:
+    """A single line of a batch."""
+
+    line: int
+    url: str
+    video_id: str
+    file_type: int
+    resolution: int
+
+
+def _parse_options(tokens: List[str], file_type: int, resolution: int) -> Tuple[int, int]:
+    """
+    Read the per-line overrides: `[type] [resolution]` or `-f N` / `-r N`.
+
+    :param tokens: Tokens after the URL.
+    :param file_type: Default download type.
+    :param resolution: Default resolution.
+    """
+    positional = []
+    tokens = list(tokens)
+    while tokens:
+        token = tokens.pop(0)
+        if token in {"-f", "--file-type"} and tokens:
+            file_type = int(tokens.pop(0))
+        elif token in {"-r", "--resolution"} and tokens:
+            resolution = int(tokens.pop(0))
+        else:
+            positional.append(int(token))
+    if positional:
+        file_type = positional[0]
+    if len(positional) > 1:
+        resolution = positional[1]
+    if file_type not in {1, 2, 3} or resolution not in {1, 2, 3}:
+        raise ValueError("type and resolution must be 1, 2 or 3")
+    return file_type, resolution
+
+
+def parse_batch(
+    lines: Iterable[str], file_type: int = 3, resolution: int = 3
+) -> Tuple[List[BatchJob], List[Dict]]:
+    """
+    Turn batch lines into jobs, dropping repeated videos.
+
+    :param lines: Lines of the batch.
+    :param file_type: Default download type (1: audio, 2: video, 3: both).
+    :param resolution: Default resolution (1: 1080p, 2: 720p, 3: 480p).
+    :return: The jobs and a list of rejected lines (duplicates and parse errors).
+    """
+    jobs, rejected, seen = [], [], {}
+    for number, raw in enumerate(lines, start=1):
+        text = raw.strip()
+        if not text or text.startswith("#"):
+            continue
+        url, *options = text.split()
+        try:
+            video_id = urls.parse_url(url).video_id
+            if video_id is None:
+                raise InvalidURLError(f"no video ID in {url}")
+            job_type, job_res = _parse_options(options, file_type, resolution)
+        except Exception as e:  # pylint: disable = broad-exception-caught
+            rejected.append({"line": number, "url": url, "reason": f"invalid: {e}"})
+            continue
+        if video_id in seen:
+            rejected.append(
+                {"line": number, "url": url, "reason": f"duplicate of line {seen[video_id]}"}
+            )
+            continue
+        seen[video_id] = number
+        jobs.append(BatchJob(number, urls.watch_url(video_id), video_id, job_type, job_res))
+    return jobs, rejected
+
+
+class JsonLinesEmitter:
+    """Thread-safe writer of JSON-lines events."""
+
+    def __init__(self, out: TextIO = sys.stdout):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def __call__(self, event: str, **fields) -> None:
+        record = {"event": event, "time": round(time.time(), 3), **fields}
+        with self._lock:
+            self.out.write(json.dumps(record) + "\n")
+            self.out.flush()
+
+
+def _run_job(job: BatchJob, emit: Callable, options: Dict) -> Dict:
+    """
+    Download one batch job, emitting start, throttled progress and end events.
+
+    :param job: The job to run.
+    :param emit: Event writer.
+    :param options: Extra keyword arguments for YT.
+    """
+    start = time.monotonic()
+    remaining: Dict[int, int] = {}
+    last = [0.0]
+    lock = threading.Lock()
+
+    def on_progress(stream, _chunk, bytes_remaining):
+        # Called from every segment thread; emit at most once per PROGRESS_INTERVAL
+        with lock:
+            remaining[stream.itag] = bytes_remaining
+            now = time.monotonic()
+            if now - last[0] < PROGRESS_INTERVAL:
+                return
+            last[0] = now
+            left = sum(remaining.values())
+        emit("progress", id=job.video_id, remaining=left)
+
+    emit("start", **asdict(job))
+    try:
+        video = YT(job.url, on_progress_callback=on_progress, **options)
+        video.download_video(job.file_type, job.resolution)
+        status = "skipped" if video.skipped else "done"
+        result = {"id": job.video_id, "status": status, "title": video.title}
+    except Exception as e:  # pylint: disable = broad-exception-caught
+        result = {"id": job.video_id, "status": "failed", "error": describe_error(e)}
+    result["elapsed"] = round(time.monotonic() - start, 3)
+    emit("end", **result)
+    return result
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    workers: int = 4,
+    emit: Callable = None,
+    **options,
+) -> Dict:
+    """
+    Download the jobs on one shared thread pool.
+
+    :param jobs: Jobs from parse_batch.
+    :param workers: Number of jobs downloaded at the same time.
+    :param emit: Event writer, JSON lines on stdout by default.
+    :param options: Extra keyword arguments for YT (e.g. segments).
+    :return: The summary, also emitted as the final event.
+    """
+    emit = emit or JsonLinesEmitter()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda job: _run_job(job, emit, options), jobs))
+    summary = {
+        "total": len(results),
+        "done": sum(1 for r in results if r["status"] == "done"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "elapsed": round(time.monotonic() - start, 3),
+    }
+    emit("summary", **summary)
+    return summary
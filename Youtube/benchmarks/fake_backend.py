@@ -0,0 +1,193 @@
+"""
+Offline stand-in for YouTube used by the benchmark suite.
+
+FakeBackend registers fake videos on a StreamServer (see stream_server) and seeds a
+private metadata cache with their titles and stream manifests, so YT finds everything it
+needs without asking pytubefix for metadata. OfflineYT and OfflinePL replace the
+remaining pytubefix lookups (title, playlist enumeration) with the fake data and refuse
+any other network access.
+Methods:
+    make_media: Renders real media files with ffmpeg.
+    FakeBackend: Creates fake videos and playlists and the YT/PL classes bound to them.
+"""
+
+import os
+import shutil
+import subprocess
+from typing import Dict, List, Union
+from Youtube.archive import DownloadArchive, set_archive
+from Youtube.benchmarks.stream_server import StreamServer
+from Youtube.cache import MetadataCache
+from Youtube.metrics import MetricsRecorder
+from Youtube.streams import StreamInfo
+from Youtube.yt_playlist_logic import PL
+from Youtube.yt_vid_logic import YT
+
+
+def make_media(work_dir: str, seconds: float, video_kbps: int, audio_kbps: int) -> Dict[str, str]:
+    """
+    Render a test pattern video and a sine tone with ffmpeg, sized by duration and bitrate.
+
+    :param work_dir: Directory the files are written to.
+    :return: Paths of the "video" and "audio" files.
+    """
+    video = os.path.join(work_dir, "video.mp4")
+    audio = os.path.join(work_dir, "audio.m4a")
+    common = ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi"]
+    subprocess.run(
+        common
+        + [
+            "-i", f"testsrc=size=1280x720:rate=30:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-b:v", f"{video_kbps}k",
+            "-movflags", "+faststart", video,
+        ],
+        check=True,
+    )
+    subprocess.run(
+        common
+        + [
+            "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:a", "aac", "-b:a", f"{audio_kbps}k", "-movflags", "+faststart", audio,
+        ],
+        check=True,
+    )
+    return {"video": video, "audio": audio}
+
+
+class FakeBackend:
+    """
+    Fake videos and playlists served by a StreamServer.
+
+    Args:
+        server (StreamServer): Server the streams are registered on.
+        root (str): Directory for the metadata cache, archive and downloads.
+        metrics (MetricsRecorder | None, optional): Recorder passed to every OfflineYT.
+    """
+
+    def __init__(self, server: StreamServer, root: str, metrics: MetricsRecorder = None):
+        self.server = server
+        self.root = root
+        self.metrics = metrics
+        self.cache = MetadataCache(root=os.path.join(root, "metadata"))
+        self.archive: Union[DownloadArchive, None] = None
+        self.runs = 0
+        self.titles: Dict[str, str] = {}
+        self.playlists: Dict[str, List[str]] = {}
+
+    def add_video(
+        self,
+        number: int,
+        video_size: int,
+        audio_size: int,
+        media: Union[Dict[str, str], None] = None,
+    ) -> str:
+        """
+        Register a fake video with one 720p video stream and one audio stream.
+
+        :param number: Distinguishes the video ID and title.
+        :param video_size: Size of the synthetic video stream in bytes.
+        :param audio_size: Size of the synthetic audio stream in bytes.
+        :param media: Real media files (from make_media) served instead of synthetic bytes.
+        :return: Watch URL of the video.
+        """
+        video_id = f"bench{number:06d}"
+        title = f"Benchmark video {number}"
+        media = media or {}
+        video_url = self.server.add(f"{video_id}-136", video_size, media.get("video"))
+        audio_url = self.server.add(f"{video_id}-140", audio_size, media.get("audio"))
+        streams = [
+            StreamInfo(
+                itag=136,
+                url=video_url,
+                mime_type="video/mp4",
+                filesize=self.server.streams[f"{video_id}-136"].size,
+                resolution="720p",
+                fps=30,
+                video_codec="avc1.4d401f",
+                includes_video=True,
+            ),
+            StreamInfo(
+                itag=140,
+                url=audio_url,
+                mime_type="audio/mp4",
+                filesize=self.server.streams[f"{video_id}-140"].size,
+                abr="128kbps",
+                audio_codec="mp4a.40.2",
+                includes_audio=True,
+            ),
+        ]
+        self.cache.put(video_id, title=title, streams=streams)
+        self.titles[video_id] = title
+        return f"https://youtu.be/{video_id}"
+
+    def add_playlist(self, urls: List[str]) -> str:
+        """
+        Register a playlist of fake videos and return its URL.
+
+        :param urls: Watch URLs of the entries.
+        """
+        playlist_id = f"PLbenchmark{len(self.playlists):08d}"
+        self.playlists[playlist_id] = list(urls)
+        return f"https://www.youtube.com/playlist?list={playlist_id}"
+
+    def reset_downloads(self) -> str:
+        """
+        Start a run with an empty archive and download folder, and return the folder.
+
+        The empty archive also becomes the process-wide one, which PL consults before
+        creating a YT.
+        """
+        self.runs += 1
+        downloads = os.path.join(self.root, "downloads")
+        shutil.rmtree(downloads, ignore_errors=True)
+        os.makedirs(downloads)
+        self.archive = DownloadArchive(os.path.join(self.root, f"archive-{self.runs}.sqlite3"))
+        set_archive(self.archive)
+        return downloads
+
+    def yt_class(self):
+        """
+        Return a YT subclass bound to this backend.
+        """
+        backend = self
+
+        class OfflineYT(YT):
+            """YT that reads metadata from the fake backend only."""
+
+            def __init__(self, url: str, **options):
+                options.setdefault("cache", backend.cache)
+                options.setdefault("archive", backend.archive)
+                options.setdefault("metrics", backend.metrics)
+                super().__init__(url, **options)
+
+            def _load_title(self):
+                return backend.titles[self.video_id]
+
+            @property
+            def streams(self):
+                raise RuntimeError("The benchmark must not fetch stream manifests")
+
+        return OfflineYT
+
+    def pl_class(self):
+        """
+        Return a PL subclass bound to this backend.
+        """
+        backend = self
+        offline_yt = self.yt_class()
+
+        class OfflinePL(PL):
+            """PL that enumerates a fake playlist."""
+
+            def __init__(self, url: str, **options):
+                super().__init__(url, **options)
+                self.video_handle = offline_yt
+
+            @property
+            def title(self):
+                return f"Benchmark playlist {self.playlist_id}"
+
+            def iter_video_urls(self):
+                yield from backend.playlists[self.playlist_id]
+
+        return OfflinePL
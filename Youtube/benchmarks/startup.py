@@ -0,0 +1,169 @@
+"""
+Cold-start benchmark of the Youtube entry points.
+
+Every entry point is started in a fresh interpreter several times and the median
+wall-clock time is compared with `startup_baseline.json`. The run fails when an entry
+point got slower than its baseline by more than the tolerance, or when a light entry
+point (help, show, daemon client) loads one of the heavy modules it must not import.
+Entry points whose dependencies are not installed are reported and skipped.
+Usage:
+    python -m Youtube.benchmarks.startup [--runs N] [--tolerance F] [--update-baseline]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Union
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+HEAVY_MODULES = ["pytubefix", "ffmpeg", "PyQt5", "sqlite3", "ssl", "concurrent.futures"]
+SLACK = 0.010  # Seconds of noise always allowed on top of the relative tolerance
+
+# name: (code run in a fresh interpreter, heavy modules it must not load)
+ENTRY_POINTS = {
+    "python": ("pass", []),
+    "cli --help": (
+        "import sys; sys.argv = ['yt-cli', '--help']\n"
+        "from Youtube.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass",
+        HEAVY_MODULES,
+    ),
+    "cli import": ("import Youtube.cli", HEAVY_MODULES),
+    "daemon client": (
+        "from Youtube.daemon import DaemonClient",
+        ["pytubefix", "ffmpeg", "PyQt5", "ssl"],
+    ),
+    "download stack": ("import Youtube.yt_vid_logic, Youtube.yt_playlist_logic", []),
+    "async api": ("import Youtube.async_api", []),
+    "gui": ("import Youtube.gui", ["pytubefix", "ffmpeg"]),
+}
+
+PROBE = (
+    "\nimport json as _json, sys as _sys\n"
+    "_sys.stdout.write('\\n__LOADED__' + _json.dumps(sorted(_sys.modules)))\n"
+)
+
+
+def run_once(code: str, cwd: str) -> Dict:
+    """
+    Run `code` in a fresh interpreter.
+
+    :param code: Python source of the entry point.
+    :param cwd: Directory the package is importable from.
+    :return: Elapsed seconds and the loaded modules, or the error output.
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", code + PROBE],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0 or "__LOADED__" not in process.stdout:
+        return {"error": process.stderr.strip().splitlines()[-1:] or ["failed"]}
+    loaded = json.loads(process.stdout.rsplit("__LOADED__", 1)[1])
+    return {"elapsed": elapsed, "loaded": loaded}
+
+
+def measure(runs: int, cwd: str) -> Dict[str, Dict]:
+    """
+    Measure every entry point `runs` times.
+
+    :param runs: Number of cold starts per entry point.
+    :param cwd: Directory the package is importable from.
+    """
+    results = {}
+    for name, (code, forbidden) in ENTRY_POINTS.items():
+        times: List[float] = []
+        loaded: List[str] = []
+        error: Union[str, None] = None
+        for _ in range(runs):
+            outcome = run_once(code, cwd)
+            if "error" in outcome:
+                error = outcome["error"][0]
+                break
+            times.append(outcome["elapsed"])
+            loaded = outcome["loaded"]
+        if error:
+            results[name] = {"error": error}
+            continue
+        results[name] = {
+            "median": statistics.median(times),
+            "min": min(times),
+            "heavy": [m for m in forbidden if m in loaded],
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """
+    Return the regressions of `results` against `baseline`.
+
+    :param results: Output of `measure`.
+    :param baseline: Median seconds per entry point.
+    :param tolerance: Allowed relative slowdown, e.g. 0.25 for 25%.
+    """
+    failures = []
+    for name, result in results.items():
+        if "error" in result:
+            continue
+        if result["heavy"]:
+            failures.append(f"{name}: imports {', '.join(result['heavy'])}")
+        limit = baseline.get(name)
+        if limit is not None and result["median"] > limit * (1 + tolerance) + SLACK:
+            failures.append(
+                f"{name}: {result['median'] * 1000:.1f} ms, baseline {limit * 1000:.1f} ms"
+            )
+    return failures
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the entry points")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Record this run as the baseline"
+    )
+    args = parser.parse_args(argv)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    results = measure(max(1, args.runs), root)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<16} unavailable ({result['error']})")
+            continue
+        reference = baseline.get(name)
+        print(
+            f"{name:<16} median {result['median'] * 1000:7.1f} ms  min {result['min'] * 1000:7.1f} ms"
+            + (f"  baseline {reference * 1000:7.1f} ms" if reference else "")
+        )
+
+    if args.update_baseline:
+        baseline.update(
+            {name: round(r["median"], 4) for name, r in results.items() if "error" not in r}
+        )
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
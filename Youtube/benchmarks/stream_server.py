@@ -0,0 +1,186 @@
+"""
+Local HTTP server of synthetic streams, for the benchmark suite and the tests.
+
+StreamServer serves registered streams with Range support at a configurable
+per-connection rate and first-byte latency. It can also simulate a host that throttles:
+responses beyond a connection limit get a 429, and a share of them is cut off halfway.
+It only needs the standard library, so it runs without pytubefix or ffmpeg.
+Methods:
+    StreamServer: Serves registered streams on 127.0.0.1.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Union
+
+PATTERN = bytes(range(256)) * 4096  # 1 MiB block synthetic streams are cut from
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+WRITE_SIZE = 1 << 16
+
+
+@dataclass
+class _Stream:
+    size: int
+    path: Union[str, None] = None  # Served from this file; synthetic bytes when None
+
+
+def _synthetic(start: int, length: int) -> bytes:
+    offset = start % len(PATTERN)
+    data = PATTERN[offset : offset + length]
+    while len(data) < length:
+        data += PATTERN[: length - len(data)]
+    return data
+
+
+class StreamServer:
+    """
+    Local Range Stream Server
+
+    Args:
+        rate (float, optional): Bytes per second per connection, 0 for unlimited.
+        latency (float, optional): Seconds before the response headers are sent.
+        max_connections (int, optional): Simulated throttling: responses started while this
+            many are being sent get `throttle_status` instead. 0 for no limit.
+        throttle_status (int, optional): Status of throttled responses. Defaults to 429.
+        drop_rate (float, optional): Share of responses cut off halfway through the body.
+        seed (int | None, optional): Seed of the drop decisions, for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0,
+        latency: float = 0,
+        max_connections: int = 0,
+        throttle_status: int = 429,
+        drop_rate: float = 0,
+        seed: Union[int, None] = None,
+    ):
+        self.rate = rate
+        self.latency = latency
+        self.max_connections = max_connections
+        self.throttle_status = throttle_status
+        self.drop_rate = drop_rate
+        self.streams: Dict[str, _Stream] = {}
+        self.requests = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # pylint: disable = invalid-name
+                server.requests += 1
+                stream = server.streams.get(self.path.split("?")[0].rsplit("/", 1)[-1])
+                if stream is None:
+                    self.send_error(404)
+                    return
+                start, end = 0, stream.size - 1
+                match = RANGE.match(self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)) if match.group(2) else end, end)
+                if server.latency:
+                    time.sleep(server.latency)
+                drop = server.admit()
+                if drop is None:
+                    self.send_error(server.throttle_status)
+                    return
+                try:
+                    self.send_response(206 if match else 200)
+                    self.send_header("Content-Length", str(end - start + 1))
+                    self.send_header("Content-Type", "application/octet-stream")
+                    if match:
+                        self.send_header("Content-Range", f"bytes {start}-{end}/{stream.size}")
+                    self.end_headers()
+                    if drop:
+                        # Send half of the promised body, then hang up
+                        self.close_connection = True
+                        end = start + (end - start) // 2
+                    server.send_body(self.wfile, stream, start, end)
+                finally:
+                    with server._lock:  # pylint: disable = protected-access
+                        server.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def admit(self) -> Union[bool, None]:
+        """
+        Start a response: None when it is throttled, otherwise whether to cut it off.
+        """
+        with self._lock:
+            if self.max_connections and self.active >= self.max_connections:
+                self.throttled += 1
+                return None
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            drop = self._random.random() < self.drop_rate
+            self.dropped += drop
+            return drop
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def send_body(self, out, stream: _Stream, start: int, end: int) -> None:
+        """
+        Write bytes [start, end] of a stream, throttled to `rate`.
+        """
+        f = open(stream.path, "rb") if stream.path else None  # pylint: disable = consider-using-with
+        try:
+            if f:
+                f.seek(start)
+            began = time.monotonic()
+            sent = 0
+            position = start
+            while position <= end:
+                length = min(WRITE_SIZE, end - position + 1)
+                data = f.read(length) if f else _synthetic(position, length)
+                try:
+                    out.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                position += length
+                sent += length
+                if self.rate:
+                    ahead = sent / self.rate - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        finally:
+            if f:
+                f.close()
+
+    def add(self, name: str, size: int, path: Union[str, None] = None) -> str:
+        """
+        Register a stream and return its URL.
+
+        :param name: Last path segment of the stream URL.
+        :param size: Size in bytes; ignored when `path` is given.
+        :param path: File to serve instead of synthetic bytes.
+        """
+        if path:
+            size = os.path.getsize(path)
+        self.streams[name] = _Stream(size, path)
+        return f"{self.base_url}/videoplayback/{name}"
+
+    def start(self) -> "StreamServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
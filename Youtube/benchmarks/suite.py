@@ -0,0 +1,327 @@
+"""
+Offline download benchmark suite.
+
+Runs YT and PL against the fake backend and a local throttled stream server, so results
+are reproducible and never touch YouTube. Scenarios:
+    single: One video-only download.
+    merged: Video and audio downloaded and merged by ffmpeg (needs the ffmpeg binary;
+        the streams are real media rendered with ffmpeg at the configured size).
+    playlist: A playlist of audio downloads through PL's worker pool.
+    throttled: The playlist against a server that answers 429 beyond `--max-connections`
+        concurrent responses and cuts `--drop-rate` of them off, with more workers and
+        segments than it accepts; the adaptive windows and range retries must still
+        finish every item. Also reports the server's throttled and dropped responses and
+        the controller's signals and smallest window.
+Every scenario is repeated `--runs` times and reports throughput, job latency and time to
+first byte percentiles, plus the peak traced Python memory of one extra traced run.
+Results are compared with `suite_baseline.json`; the run fails when throughput dropped or
+latency or memory grew beyond the tolerance.
+Usage:
+    python -m Youtube.benchmarks.suite [--scenario NAME] [--size-mb N] [--rate R]
+        [--latency MS] [--runs N] [--items N] [--workers N] [--segments N]
+        [--max-connections N] [--drop-rate P] [--update-baseline]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Union
+from Youtube.adaptive import AdaptiveController, get_controller, set_controller
+from Youtube.benchmarks.fake_backend import FakeBackend, make_media
+from Youtube.benchmarks.stream_server import StreamServer
+from Youtube.metrics import MetricsRecorder
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_baseline.json")
+SCENARIOS = ["single", "merged", "playlist", "throttled"]
+HIGHER_IS_BETTER = {"throughput_mb_s"}
+COMPARED = ["throughput_mb_s", "job_p50_s", "job_p90_s", "ttfb_p50_s", "peak_memory_mb"]
+
+
+class SampleRecorder(MetricsRecorder):
+    """Keeps every observation so percentiles can be computed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def take(self) -> Dict[str, List[float]]:
+        with self._lock:
+            samples, self.samples = self.samples, {}
+        return samples
+
+
+def percentile(values: List[float], pct: float) -> Union[float, None]:
+    """
+    Nearest-rank percentile of `values`, or None when there are none.
+
+    :param values: The samples.
+    :param pct: Percentile between 0 and 100.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # Ceiling of n * pct / 100
+    return ordered[int(rank) - 1]
+
+
+class Suite:
+    """
+    Benchmark Scenarios
+
+    Args:
+        args (argparse.Namespace): Parsed command line options.
+        root (str): Scratch directory.
+    """
+
+    def __init__(self, args: argparse.Namespace, root: str):
+        self.args = args
+        self.root = root
+        self.recorder = SampleRecorder()
+        self.server = StreamServer(rate=args.rate, latency=args.latency / 1000).start()
+        self.backend = FakeBackend(self.server, root, metrics=self.recorder)
+        self.size = int(args.size_mb * (1 << 20))
+        self.servers = [self.server]
+        self.counters: Callable[[], Dict[str, float]] = dict
+
+    def close(self) -> None:
+        for server in self.servers:
+            server.stop()
+
+    def _single(self) -> Callable[[], int]:
+        url = self.backend.add_video(1, self.size, self.size // 8)
+        offline_yt = self.backend.yt_class()
+
+        def run() -> int:
+            app_path = self.backend.reset_downloads()
+            offline_yt(url, app_path=app_path, segments=self.args.segments).download_video(2, 2)
+            return self.size
+
+        return run
+
+    def _merged(self) -> Callable[[], int]:
+        media_dir = os.path.join(self.root, "media")
+        os.makedirs(media_dir, exist_ok=True)
+        seconds = 10
+        media = make_media(
+            media_dir, seconds, max(64, int(self.size * 8 / 1000 / seconds)), 128
+        )
+        url = self.backend.add_video(2, 0, 0, media=media)
+        total = sum(os.path.getsize(path) for path in media.values())
+        offline_yt = self.backend.yt_class()
+
+        def run() -> int:
+            app_path = self.backend.reset_downloads()
+            offline_yt(url, app_path=app_path, segments=self.args.segments).download_video(3, 2)
+            return total
+
+        return run
+
+    def _playlist(self) -> Callable[[], int]:
+        audio_size = max(1, self.size // 8)
+        urls = [
+            self.backend.add_video(100 + n, self.size, audio_size)
+            for n in range(self.args.items)
+        ]
+        url = self.backend.add_playlist(urls)
+        offline_pl = self.backend.pl_class()
+
+        def run() -> int:
+            app_path = self.backend.reset_downloads()
+            results = offline_pl(
+                url,
+                app_path=app_path,
+                max_workers=self.args.workers,
+                segments=self.args.segments,
+            ).download_playlist(1)
+            failed = [result.error for result in results if not result.ok]
+            if failed:
+                raise RuntimeError(f"{len(failed)} playlist items failed: {failed[0]}")
+            return audio_size * len(urls)
+
+        return run
+
+    def _throttled(self) -> Callable[[], int]:
+        server = StreamServer(
+            rate=self.args.rate,
+            latency=self.args.latency / 1000,
+            max_connections=self.args.max_connections,
+            drop_rate=self.args.drop_rate,
+            seed=1,
+        ).start()
+        self.servers.append(server)
+        backend = FakeBackend(server, os.path.join(self.root, "throttled"), metrics=self.recorder)
+        audio_size = max(1, self.size // 8)
+        urls = [
+            backend.add_video(200 + n, self.size, audio_size) for n in range(self.args.items)
+        ]
+        url = backend.add_playlist(urls)
+        offline_pl = backend.pl_class()
+
+        def run() -> int:
+            app_path = backend.reset_downloads()
+            previous = get_controller()
+            set_controller(AdaptiveController(metrics=self.recorder))
+            try:
+                results = offline_pl(
+                    url,
+                    app_path=app_path,
+                    max_workers=max(2, self.args.workers) * 2,
+                    segments=max(2, self.args.segments),
+                ).download_playlist(1)
+            finally:
+                set_controller(previous)
+            failed = [result.error for result in results if not result.ok]
+            if failed:
+                raise RuntimeError(f"{len(failed)} playlist items failed: {failed[0]}")
+            return audio_size * len(urls)
+
+        def counters() -> Dict[str, float]:
+            return {
+                "throttled_responses": server.throttled,
+                "dropped_responses": server.dropped,
+                "peak_connections": server.peak_active,
+            }
+
+        self.counters = counters
+        return run
+
+    def run(self, scenario: str) -> Dict[str, float]:
+        """
+        Run one scenario and return its measurements.
+
+        :param scenario: single, merged, playlist or throttled.
+        """
+        self.counters = dict
+        job = getattr(self, f"_{scenario}")()
+        job()  # Warm-up: imports, pool connections, caches
+        self.recorder.take()
+        walls, total_bytes = [], 0
+        for _ in range(self.args.runs):
+            start = time.perf_counter()
+            total_bytes += job()
+            walls.append(time.perf_counter() - start)
+        samples = self.recorder.take()
+        tracemalloc.start()
+        try:
+            job()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        jobs = samples.get("yt_job_seconds", [])
+        ttfb = samples.get("yt_ttfb_seconds", [])
+        result = {
+            "runs": self.args.runs,
+            "throughput_mb_s": total_bytes / sum(walls) / (1 << 20),
+            "wall_p50_s": percentile(walls, 50),
+            "job_p50_s": percentile(jobs, 50),
+            "job_p90_s": percentile(jobs, 90),
+            "job_p99_s": percentile(jobs, 99),
+            "ttfb_p50_s": percentile(ttfb, 50),
+            "ttfb_p90_s": percentile(ttfb, 90),
+            "peak_memory_mb": peak / (1 << 20),
+            "host_signals": len(samples.get("yt_host_signals", [])) or None,
+            "window_min": min(samples.get("yt_host_window", []), default=None),
+            **self.counters(),
+        }
+        return {key: value for key, value in result.items() if value is not None}
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float
+) -> List[str]:
+    """
+    Return the regressions of `results` against `baseline`.
+
+    :param results: Measurements per scenario.
+    :param baseline: Stored measurements per scenario.
+    :param tolerance: Allowed relative change in the bad direction, e.g. 0.2.
+    """
+    failures = []
+    for scenario, result in results.items():
+        reference = baseline.get(scenario, {})
+        for key in COMPARED:
+            if key not in result or not reference.get(key):
+                continue
+            change = (result[key] - reference[key]) / reference[key]
+            worse = -change if key in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                failures.append(
+                    f"{scenario} {key}: {result[key]:.4g}, baseline {reference[key]:.4g}"
+                )
+    return failures
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline download benchmarks")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--size-mb", type=float, default=8, help="Video stream size")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Per-connection server rate in bytes/s"
+    )
+    parser.add_argument("--latency", type=float, default=20, help="Server first-byte delay in ms")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--items", type=int, default=8, help="Playlist length")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=2,
+        help="Concurrent responses the throttled server accepts before answering 429",
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.05, help="Share of throttled-server responses cut off"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+    args.runs = max(1, args.runs)
+
+    scenarios = args.scenario or SCENARIOS
+    if "merged" in scenarios and not shutil.which("ffmpeg"):
+        print("merged: skipped, the ffmpeg binary is not installed")
+        scenarios = [name for name in scenarios if name != "merged"]
+
+    root = tempfile.mkdtemp(prefix="yt-bench-")
+    suite = Suite(args, root)
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario] = suite.run(scenario)
+            print(f"{scenario}: " + ", ".join(
+                f"{key}={value:.4g}" for key, value in results[scenario].items()
+            ))
+    finally:
+        suite.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
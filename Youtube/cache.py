@@ -0,0 +1,273 @@
+"""
+Persistent metadata and stream-manifest cache keyed by video ID.
+
+Every entry is a JSON file `<root>/<video_id>.json` holding the video title and, when
+known, the stream manifest with the time it stops being valid. Signed stream URLs expire,
+so stream manifests are only served until the `expire` time carried by their URLs (minus a
+safety margin) or `stream_ttl`, whichever comes first; titles are kept for `title_ttl`.
+The disk layer is bounded by `max_bytes` and evicts least recently used entries, using the
+file modification time as the access clock. Its size is kept as a running total, counted
+once on the first write, so the directory is only scanned again when it is over budget.
+A small in-process LRU sits in front of it so repeated lookups within one run never touch
+the disk.
+Args:
+    root (str, optional): Cache directory. Defaults to `APP_PATH/.cache/metadata`.
+    max_bytes (int, optional): Size bound of the disk layer. Defaults to 50 MiB.
+    memo_size (int, optional): Number of entries kept in memory. Defaults to 256.
+    stream_ttl (float, optional): Maximum age of a stream manifest in seconds. Defaults to 5 hours.
+    title_ttl (float, optional): Maximum age of a title in seconds. Defaults to 30 days.
+Methods:
+    get_title / get_streams: Return cached data or None on a miss.
+    put: Stores a title and/or stream manifest.
+    titles: Yields the (video ID, title) pairs of every entry.
+    invalidate_streams: Drops a stream manifest whose URLs were rejected.
+    DiskBudget: Size bound of a cache directory, shared with the thumbnail cache.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple, Union
+from Youtube.logic_helpers import APP_PATH
+from Youtube.streams import StreamInfo
+
+URL_EXPIRY_MARGIN = 10 * 60  # Never hand out a URL that expires within ten minutes
+EVICT_TARGET = 0.9  # Evict down to this share of the bound, so eviction is not rerun per write
+
+
+class DiskBudget:
+    """
+    LRU Size Bound of a Cache Directory
+
+    Args:
+        root (str): Cache directory.
+        suffix (str): Extension of the cache files; anything else is left alone.
+        max_bytes (int): Size bound of the directory.
+    """
+
+    def __init__(self, root: str, suffix: str, max_bytes: int):
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.total: Union[int, None] = None  # Counted on first use
+        self._lock = threading.Lock()
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        try:
+            with os.scandir(self.root) as it:
+                for item in it:
+                    if item.name.endswith(self.suffix):
+                        try:
+                            stat = item.stat()
+                        except OSError:
+                            continue  # Removed by another process meanwhile
+                        entries.append((stat.st_mtime, stat.st_size, item.path))
+        except OSError:
+            pass
+        return entries
+
+    def replace(self, tmp_path: str, path: str) -> None:
+        """
+        Move a written file into place, account for it and evict when over budget.
+
+        :param tmp_path: Fully written temporary file.
+        :param path: Final path of the cache file, possibly replacing an older version.
+        """
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            try:
+                old = os.path.getsize(path)
+            except OSError:
+                old = 0
+            os.replace(tmp_path, path)
+            if self.total is None:
+                self.total = sum(entry[1] for entry in self._scan())
+            else:
+                self.total += size - old
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Remove least recently used files until the directory is below its target size.
+
+        Rescans the directory, which also corrects the total for files other processes
+        sharing the cache have written or removed.
+        """
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.total = total
+
+
+class MetadataCache:
+    """Video Metadata Cache"""
+
+    def __init__(
+        self,
+        root: str = os.path.join(APP_PATH, ".cache", "metadata"),
+        max_bytes: int = 50 * 1024 * 1024,
+        memo_size: int = 256,
+        stream_ttl: float = 5 * 60 * 60,
+        title_ttl: float = 30 * 24 * 60 * 60,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self.stream_ttl = stream_ttl
+        self.title_ttl = title_ttl
+        self._memo: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._budget = DiskBudget(root, ".json", max_bytes)
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.root, f"{video_id}.json")
+
+    def _load(self, video_id: str) -> Union[Dict, None]:
+        """
+        Return the raw entry for a video from memory or disk, refreshing its LRU position.
+
+        :param video_id: ID of the video.
+        """
+        with self._lock:
+            if video_id in self._memo:
+                self._memo.move_to_end(video_id)
+                return self._memo[video_id]
+            path = self._path(video_id)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)  # Mark as recently used for disk eviction
+            except (OSError, ValueError):
+                return None
+            self._remember(video_id, entry)
+            return entry
+
+    def _remember(self, video_id: str, entry: Dict) -> None:
+        self._memo[video_id] = entry
+        self._memo.move_to_end(video_id)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    def get_title(self, video_id: str) -> Union[str, None]:
+        """
+        Return the cached title of a video, or None on a miss.
+
+        :param video_id: ID of the video.
+        """
+        entry = self._load(video_id)
+        if not entry or not entry.get("title"):
+            return None
+        if time.time() - entry.get("title_fetched", 0) > self.title_ttl:
+            return None
+        return entry["title"]
+
+    def get_streams(self, video_id: str) -> Union[List[StreamInfo], None]:
+        """
+        Return the cached stream manifest of a video, or None on a miss or expiry.
+
+        :param video_id: ID of the video.
+        """
+        entry = self._load(video_id)
+        if not entry or not entry.get("streams"):
+            return None
+        if time.time() >= entry.get("streams_expire", 0):
+            return None
+        return [StreamInfo.from_dict(data) for data in entry["streams"]]
+
+    def put(
+        self,
+        video_id: str,
+        title: Union[str, None] = None,
+        streams: Union[List[StreamInfo], None] = None,
+    ) -> None:
+        """
+        Store the title and/or stream manifest of a video.
+
+        :param video_id: ID of the video.
+        :param title: Title of the video.
+        :param streams: Stream manifest of the video.
+        """
+        now = time.time()
+        with self._lock:
+            entry = dict(self._load(video_id) or {})
+            if title is not None:
+                entry["title"] = title
+                entry["title_fetched"] = now
+            if streams is not None:
+                expiry = now + self.stream_ttl
+                for stream in streams:
+                    signed = stream.expires_at()
+                    if signed:
+                        expiry = min(expiry, signed - URL_EXPIRY_MARGIN)
+                entry["streams"] = [stream.to_dict() for stream in streams]
+                entry["streams_expire"] = expiry
+            self._write(video_id, entry)
+
+    def _write(self, video_id: str, entry: Dict) -> None:
+        """
+        Store an entry in memory and atomically on disk.
+
+        :param video_id: ID of the video.
+        :param entry: Raw cache entry.
+        """
+        self._remember(video_id, entry)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{self._path(video_id)}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            self._budget.replace(tmp_path, self._path(video_id))
+        except OSError:
+            pass  # The cache is an optimisation; a read-only disk must not fail a download
+
+    def titles(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield the (video ID, title) pairs of every entry on disk.
+        """
+        if not os.path.isdir(self.root):
+            return
+        for filename in os.listdir(self.root):
+            if filename.endswith(".json"):
+                video_id = filename[: -len(".json")]
+                entry = self._load(video_id)
+                if entry and entry.get("title"):
+                    yield video_id, entry["title"]
+
+    def invalidate_streams(self, video_id: str) -> None:
+        """
+        Drop the stream manifest of a video, e.g. after its stream URLs were rejected.
+
+        :param video_id: ID of the video.
+        """
+        with self._lock:
+            entry = self._load(video_id)
+            if entry and entry.pop("streams", None) is not None:
+                entry.pop("streams_expire", None)
+                self._write(video_id, entry)
+
+
+_CACHE: Union[MetadataCache, None] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> MetadataCache:
+    """
+    Return the process-wide metadata cache.
+    """
+    global _CACHE  # pylint: disable = global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = MetadataCache()
+        return _CACHE
@@ -2,13 +2,15 @@
 # pylint: disable = missing-class-docstring
 # pylint: disable = missing-module-docstring
 # pylint: disable = broad-exception-caught
+# pylint: disable = import-outside-toplevel
 import os
 import sys
 import argparse
-from Youtube.yt_vid_logic import YT
-from Youtube.yt_playlist_logic import PL
 from Youtube.logic_helpers import APP_PATH
 
+# Everything else (pytubefix, ffmpeg, the download stack, sqlite) is imported by the
+# command that needs it, so --help, -s and daemon clients start without loading it
+
 
 def show_files(path):
     try:
@@ -22,21 +24,213 @@ def show_files(path):
         print(f"Failed to open folder: {str(e)}")
 
 
-def download(url, is_playlist, file_type, resolution):
+def print_report(results):
+    for result in results:
+        status = (
+            "skipped (already downloaded)"
+            if result.skipped
+            else "ok" if result.ok else f"failed ({result.error})"
+        )
+        print(f"[{result.index + 1}] {result.title or result.url}: {status}")
+    failed = sum(1 for result in results if not result.ok)
+    print(f"{len(results) - failed}/{len(results)} videos downloaded")
+
+
+def parse_rate(value):
+    """Parse a byte rate such as 500K, 2M or 1.5G (per second); 0 means unlimited."""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def enable_metrics(path):
+    """Record download metrics to `path` (.prom: Prometheus text, otherwise JSON lines)."""
+    from Youtube.metrics import recorder_for_path, set_metrics
+
+    recorder = recorder_for_path(path)
+    set_metrics(recorder)
+    return recorder
+
+
+def rebuild_archive():
+    from Youtube.archive import get_archive
+    from Youtube.cache import get_cache
+
+    count, unresolved = get_archive().rebuild(APP_PATH, get_cache().titles())
+    print(f"Archived {count} downloaded files")
+    for path in unresolved:
+        print(f"Unknown video, not archived: {path}")
+
+
+def batch(argv):
+    parser = argparse.ArgumentParser(
+        prog="yt-cli batch",
+        description="Download a list of video URLs (one per line, optionally followed "
+        "by a type and resolution) with JSON-lines progress on stdout",
+    )
+    parser.add_argument("source", help="File with URLs, or - for stdin")
+    parser.add_argument("-f", "--file-type", type=int, default=3, choices=[1, 2, 3])
+    parser.add_argument("-r", "--resolution", type=int, default=3, choices=[1, 2, 3])
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--rate-limit", type=parse_rate, default=0)
+    parser.add_argument("--metrics", help="Write download metrics to this file")
+    args = parser.parse_args(argv)
+    from Youtube.batch import JsonLinesEmitter, parse_batch, run_batch
+    from Youtube.scheduler import get_scheduler
+
+    get_scheduler().set_rate(args.rate_limit)
+
+    if args.source == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.source, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    jobs, rejected = parse_batch(lines, args.file_type, args.resolution)
+    emit = JsonLinesEmitter()
+    for entry in rejected:
+        emit("rejected", **entry)
+    recorder = enable_metrics(args.metrics) if args.metrics else None
+    summary = run_batch(jobs, args.workers, emit, segments=args.segments)
+    if recorder:
+        recorder.flush()
+    return 1 if summary["failed"] else 0
+
+
+DAEMON_COMMANDS = {"daemon", "submit", "jobs", "cancel", "priority"}
+
+
+def daemon_command(command, argv):
+    from Youtube.daemon import DEFAULT_PORT, DaemonClient, DownloadDaemon
+
+    parser = argparse.ArgumentParser(
+        prog=f"yt-cli {command}", description="Talk to the resident download daemon"
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    if command == "daemon":
+        parser.add_argument("-w", "--workers", type=int, default=2)
+        parser.add_argument("--segments", type=int, default=1)
+        parser.add_argument("--rate-limit", type=parse_rate, default=0)
+        parser.add_argument("--stop", action="store_true", help="Stop a running daemon")
+        parser.add_argument(
+            "--metrics", help="Write download metrics to this file after every job"
+        )
+    elif command == "submit":
+        parser.add_argument("-u", "--url", type=str, required=True)
+        parser.add_argument("-p", "--playlist", action="store_true")
+        parser.add_argument("-f", "--file-type", type=int, default=3, choices=[1, 2, 3])
+        parser.add_argument("-r", "--resolution", type=int, default=3, choices=[1, 2, 3])
+        parser.add_argument(
+            "--priority", type=int, default=0, help="Lower values are started first"
+        )
+    elif command == "jobs":
+        parser.add_argument(
+            "-a", "--all", action="store_true", help="Include finished jobs"
+        )
+    else:
+        parser.add_argument("id", type=int)
+        if command == "priority":
+            parser.add_argument("priority", type=int)
+    args = parser.parse_args(argv)
+    client = DaemonClient(port=args.port)
+    not_running = f"No download daemon is running on port {args.port}; start one with 'yt-cli daemon'"
+
+    if command == "daemon":
+        if args.stop:
+            try:
+                return 0 if client.request("shutdown").get("ok") else 1
+            except OSError:
+                print(not_running)
+                return 1
+        if client.is_running():
+            print(f"A download daemon is already running on port {args.port}")
+            return 1
+        from Youtube.scheduler import get_scheduler
+
+        get_scheduler().set_rate(args.rate_limit)
+        if args.metrics:
+            enable_metrics(args.metrics)
+        server = DownloadDaemon(port=args.port, workers=args.workers, segments=args.segments)
+        print(f"Download daemon listening on 127.0.0.1:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        if command == "submit":
+            job_id = client.submit(
+                args.url, args.playlist, args.file_type, args.resolution, args.priority
+            )
+            print(f"Queued job {job_id}")
+            return 0
+        if command == "jobs":
+            for job in client.request("list", all=args.all)["jobs"]:
+                status = job["state"] + (f" ({job['error']})" if job["error"] else "")
+                print(f"{job['id']:>5}  p{job['priority']:<3} {status:<10} {job['title'] or job['url']}")
+            return 0
+        if command == "cancel":
+            response = client.request("cancel", id=args.id)
+        else:
+            response = client.request("priority", id=args.id, priority=args.priority)
+    except OSError:
+        print(not_running)
+        return 1
+    if not response.get("ok"):
+        print(f"Job {args.id} is unknown or already finished")
+        return 1
+    return 0
+
+
+def download(
+    url,
+    is_playlist,
+    file_type,
+    resolution,
+    workers=4,
+    segments=1,
+    streaming_merge=False,
+    sync=False,
+):
+    from Youtube.yt_playlist_logic import PL
+    from Youtube.yt_vid_logic import YT
+
     try:
         if is_playlist:
-            downloader = PL(url)
-            downloader.download_playlist(file_type, resolution)
+            downloader = PL(
+                url,
+                max_workers=workers,
+                segments=segments,
+                streaming_merge=streaming_merge,
+            )
+            print_report(
+                downloader.download_playlist(file_type, resolution, sync=sync)
+            )
         else:
-            downloader = YT(url)
+            downloader = YT(url, segments=segments, streaming_merge=streaming_merge)
             downloader.download_video(file_type, resolution)
+            if downloader.skipped:
+                print(f"{downloader.title} is already downloaded")
+                return
         print(f"{downloader.title} is downloaded")
     except Exception as e:
         print(f"Error: {str(e)}")
 
 
 def main():
-    parser = argparse.ArgumentParser(description="YouTube Downloader CLI")
+    if sys.argv[1:2] == ["batch"]:
+        sys.exit(batch(sys.argv[2:]))
+    if sys.argv[1:2] and sys.argv[1] in DAEMON_COMMANDS:
+        sys.exit(daemon_command(sys.argv[1], sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        description="YouTube Downloader CLI",
+        epilog="Use 'yt-cli batch FILE' to download a list of URLs, or 'yt-cli daemon' "
+        "to start the download daemon and 'yt-cli submit|jobs|cancel|priority' to use it",
+    )
     parser.add_argument("-u", "--url", type=str, help="URL of the video or playlist")
     parser.add_argument(
         "-p", "--playlist", action="store_true", help="Download as a playlist"
@@ -57,6 +251,62 @@ def main():
         choices=[1, 2, 3],
         help="Resolution: 1 for 1080p, 2 for 720p, 3 for 480p",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of playlist videos downloaded at the same time",
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=1,
+        help="Number of byte ranges fetched concurrently per stream",
+    )
+    parser.add_argument(
+        "--stream-merge",
+        action="store_true",
+        help="Pipe audio and video into ffmpeg while downloading instead of using tmp files",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="With -p, only download playlist entries added since the last sync",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=parse_rate,
+        default=0,
+        help="Global download rate cap in bytes/s, e.g. 500K or 2M (0 for unlimited)",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=32,
+        help="Idle keep-alive connections kept for reuse",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=16,
+        help="Connections open at the same time per host",
+    )
+    parser.add_argument(
+        "--pool-stats",
+        action="store_true",
+        help="Print connection reuse counters when done",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write download metrics to this file: Prometheus text if it ends in .prom, "
+        "JSON lines otherwise",
+    )
+    parser.add_argument(
+        "--rebuild-archive",
+        action="store_true",
+        help="Rebuild the archive of downloaded videos by scanning the download folder",
+    )
     parser.add_argument(
         "-s", "--show", action="store_true", help="Show the download folder"
     )
@@ -67,11 +317,39 @@ def main():
         show_files(APP_PATH)
         return
 
+    if args.rebuild_archive:
+        rebuild_archive()
+        return
+
     if not args.url:
-        print("URL is required unless using the -s/--show option.")
+        print("URL is required unless using the -s/--show or --rebuild-archive option.")
         return
 
-    download(args.url, args.playlist, args.file_type, args.resolution)
+    from Youtube.http_pool import configure_pool, get_pool
+    from Youtube.scheduler import get_scheduler
+
+    get_scheduler().set_rate(args.rate_limit)
+    configure_pool(max_idle=args.pool_size, per_host=args.per_host)
+    recorder = enable_metrics(args.metrics) if args.metrics else None
+
+    download(
+        args.url,
+        args.playlist,
+        args.file_type,
+        args.resolution,
+        args.workers,
+        args.segments,
+        args.stream_merge,
+        args.sync,
+    )
+    if recorder:
+        recorder.flush()
+    if args.pool_stats:
+        stats = get_pool().stats()
+        print(
+            f"HTTP requests: {stats['requests']}, connections opened: {stats['created']}, "
+            f"reused: {stats['reused']}"
+        )
 
 
 def interactive_shell():
@@ -90,12 +368,24 @@ def interactive_shell():
 
             if args[0] == "show":
                 show_files(APP_PATH)
+            elif args[0] == "batch":
+                batch(args[1:])
+            elif args[0] in DAEMON_COMMANDS - {"daemon"}:
+                daemon_command(args[0], args[1:])
+            elif args[0] == "limit" and len(args) == 2:
+                from Youtube.scheduler import get_scheduler
+
+                get_scheduler().set_rate(parse_rate(args[1]))
             elif args[0] == "download":
                 parser = argparse.ArgumentParser()
                 parser.add_argument("-u", "--url", type=str, required=True)
                 parser.add_argument("-p", "--playlist", action="store_true")
                 parser.add_argument("-f", "--file-type", type=int, default=3)
                 parser.add_argument("-r", "--resolution", type=int, default=3)
+                parser.add_argument("-w", "--workers", type=int, default=4)
+                parser.add_argument("--segments", type=int, default=1)
+                parser.add_argument("--stream-merge", action="store_true")
+                parser.add_argument("--sync", action="store_true")
                 cmd_args = parser.parse_args(args[1:])
 
                 download(
@@ -103,6 +393,10 @@ def interactive_shell():
                     cmd_args.playlist,
                     cmd_args.file_type,
                     cmd_args.resolution,
+                    cmd_args.workers,
+                    cmd_args.segments,
+                    cmd_args.stream_merge,
+                    cmd_args.sync,
                 )
             else:
                 print(f"Unknown command: {args[0]}")
@@ -116,6 +410,9 @@ def interactive_shell():
 
 
 if __name__ == "__main__":
+    import multiprocessing
+
+    multiprocessing.freeze_support()  # Spawned merge workers of a frozen build
     if len(sys.argv) > 1:
         main()
     else:
@@ -0,0 +1,565 @@
+"""
+Resident download daemon with a persistent job queue.
+
+`yt-cli daemon` starts one long-running process that keeps the job queue in SQLite and
+downloads it with a pool of worker threads. Imports, the metadata cache, the archive and
+the keep-alive connection pool are set up once, and every later `yt-cli submit`/`jobs`/
+`cancel`/`priority` call (and the GUI) only sends a short request over a localhost socket.
+Every state change is committed before it takes effect, so after a crash or restart the
+queued jobs are still queued and jobs that were running are queued again; their partial
+streams resume from the per-video manifests.
+The protocol is JSON lines: one request object per line with an "op" field, answered by
+one response object with "ok" and either the result fields or "error". Every request
+carries a "token" field holding the per-user secret the daemon writes to a file only its
+user can read (`APP_PATH/.cache/daemon.token`, mode 0600), so other users' processes and
+web pages posting to the port cannot drive it. A line that is not a JSON object (such as
+an HTTP request line) or a wrong token closes the connection. "list" reports the bytes
+received and expected of running jobs, so clients such as the GUI can show their progress.
+Methods:
+    JobQueue: SQLite-backed queue of download jobs.
+    DownloadDaemon: Serves the queue over TCP and runs the jobs.
+    DaemonClient: Sends requests to a running daemon.
+"""
+
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Dict, Iterable, List, Union
+from Youtube.errors import DownloadError
+from Youtube.logic_helpers import APP_PATH, describe_error
+from Youtube.logs import log_context, log_setup, logging
+from Youtube.metrics import get_metrics
+from Youtube.scheduler import PRIORITY_BACKGROUND
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47913
+TOKEN_PATH = os.path.join(APP_PATH, ".cache", "daemon.token")
+MAX_REQUEST_BYTES = 64 * 1024
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def write_token(path: str = TOKEN_PATH) -> str:
+    """
+    Create a fresh daemon secret in a file only the current user can read, and return it.
+
+    :param path: Token file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    token = secrets.token_hex(32)
+    if os.path.exists(path):
+        os.remove(path)  # Never reuse a file someone else may have created or opened
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def read_token(path: str = TOKEN_PATH) -> str:
+    """
+    Return the secret of the running daemon; raises OSError when there is none.
+
+    :param path: Token file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+class JobQueue:
+    """Persistent Download Job Queue"""
+
+    def __init__(self, path: str = os.path.join(APP_PATH, ".cache", "jobs.sqlite3")):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")  # A committed job survives power loss
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    playlist INTEGER NOT NULL,
+                    file_type INTEGER NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    priority INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    title TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, priority, id)"
+            )
+
+    def recover(self) -> int:
+        """
+        Queue again the jobs that were running when the previous daemon stopped.
+
+        :return: Number of recovered jobs.
+        """
+        with self._lock, self._db:
+            return self._db.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE state = ?",
+                (QUEUED, time.time(), RUNNING),
+            ).rowcount
+
+    def submit(
+        self,
+        url: str,
+        playlist: bool = False,
+        file_type: int = 3,
+        resolution: int = 3,
+        priority: int = 0,
+    ) -> int:
+        """
+        Add a job to the queue.
+
+        :param url: URL of the video or playlist.
+        :param playlist: Whether the URL is a playlist.
+        :param file_type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution (1: 1080p, 2: 720p, 3: 480p).
+        :param priority: Lower values are started first.
+        :return: ID of the job.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            return self._db.execute(
+                "INSERT INTO jobs (url, playlist, file_type, resolution, priority, state,"
+                " created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, int(playlist), file_type, resolution, priority, QUEUED, now, now),
+            ).lastrowid
+
+    def claim(self) -> Union[Dict, None]:
+        """
+        Mark the next queued job as running and return it, or None if nothing is queued.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY priority, id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE id = ?",
+                (RUNNING, time.time(), row["id"]),
+            )
+        return dict(row, state=RUNNING)
+
+    def finish(
+        self,
+        job_id: int,
+        state: str,
+        title: Union[str, None] = None,
+        error: Union[str, None] = None,
+    ) -> None:
+        """
+        Record the outcome of a running job.
+
+        :param job_id: ID of the job.
+        :param state: queued (to run it again), done, failed or cancelled.
+        :param title: Title of the video or playlist.
+        :param error: Error message of a failed job.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, title = COALESCE(?, title), error = ?, updated = ?"
+                " WHERE id = ? AND state = ?",
+                (state, title, error, time.time(), job_id, RUNNING),
+            )
+
+    def cancel(self, job_id: int) -> Union[str, None]:
+        """
+        Cancel a queued or running job.
+
+        :param job_id: ID of the job.
+        :return: The state the job was in, or None if it was unknown or already finished.
+        """
+        with self._lock, self._db:
+            row = self._db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["state"] in FINISHED:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE id = ?",
+                (CANCELLED, time.time(), job_id),
+            )
+        return row["state"]
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        """
+        Change the priority of a job that has not finished.
+
+        :param job_id: ID of the job.
+        :param priority: Lower values are started first.
+        :return: Whether the job was found.
+        """
+        with self._lock, self._db:
+            return bool(
+                self._db.execute(
+                    "UPDATE jobs SET priority = ?, updated = ? WHERE id = ? AND state IN (?, ?)",
+                    (priority, time.time(), job_id, QUEUED, RUNNING),
+                ).rowcount
+            )
+
+    def jobs(
+        self,
+        include_finished: bool = True,
+        limit: int = 100,
+        ids: Union[Iterable[int], None] = None,
+    ) -> List[Dict]:
+        """
+        Return the jobs, unfinished ones first, then the most recently finished.
+
+        :param include_finished: Whether finished jobs are listed too.
+        :param limit: Maximum number of jobs.
+        :param ids: Only these jobs, e.g. the ones a client submitted.
+        """
+        query = "SELECT * FROM jobs"
+        where, params = [], []
+        if not include_finished:
+            where.append(f"state IN ('{QUEUED}', '{RUNNING}')")
+        if ids is not None:
+            ids = [int(job_id) for job_id in ids]
+            where.append(f"id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            params.extend(ids)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY state IN ('{QUEUED}', '{RUNNING}') DESC, priority, id DESC LIMIT ?"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, (*params, limit)).fetchall()]
+
+
+class JobTransfers:
+    """Bytes received and expected of the streams of one running job."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[str, List[int]] = {}  # stream URL -> [received, total]
+
+    def on_progress(self, stream, _chunk: bytes, remaining: int) -> None:
+        total = getattr(stream, "filesize", 0) or 0
+        with self._lock:
+            entry = self._streams.setdefault(getattr(stream, "url", str(id(stream))), [0, 0])
+            entry[1] = max(total, remaining + entry[0], entry[1])
+            entry[0] = entry[1] - remaining
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Return the bytes received and expected so far.
+        """
+        with self._lock:
+            return {
+                "received": sum(entry[0] for entry in self._streams.values()),
+                "total": sum(entry[1] for entry in self._streams.values()),
+            }
+
+
+class DownloadDaemon:
+    """
+    Download Daemon
+
+    Args:
+        host (str, optional): Interface to listen on. Defaults to 127.0.0.1.
+        port (int, optional): TCP port. Defaults to 47913.
+        workers (int, optional): Jobs downloaded at the same time. Defaults to 2.
+        queue (JobQueue | None, optional): Job queue. Defaults to the one under APP_PATH.
+        token_path (str, optional): File the request secret is written to.
+            Defaults to TOKEN_PATH.
+        options: Extra keyword arguments for YT/PL (e.g. segments).
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        workers: int = 2,
+        queue: Union[JobQueue, None] = None,
+        token_path: str = TOKEN_PATH,
+        **options,
+    ):
+        self.queue = queue or JobQueue()
+        self.workers = max(1, workers)
+        self.options = options
+        self._wake = threading.Condition()
+        self._stopping = threading.Event()
+        self._running: Dict[int, threading.Event] = {}
+        self._transfers: Dict[int, JobTransfers] = {}
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        return
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        return  # Not this protocol (e.g. an HTTP preamble): hang up
+                    if not isinstance(request, dict):
+                        return
+                    if not daemon.authorized(request):
+                        self.reply({"ok": False, "error": "invalid token"})
+                        return
+                    self.reply(daemon.handle_request(request))
+
+            def reply(self, response: Dict) -> None:
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            # On POSIX this only lets a restart bind past TIME_WAIT; on Windows
+            # SO_REUSEADDR would let a second daemon share the port, so claim it exclusively
+            allow_reuse_address = os.name != "nt"
+
+            def server_bind(self):
+                if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+                    self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+                super().server_bind()
+
+        self.server = Server((host, port), Handler)
+        # Only once the port is ours, so a second daemon cannot lock out the first's clients
+        self.token = write_token(token_path)
+
+    def authorized(self, request: Dict) -> bool:
+        """
+        Whether a request carries the daemon's secret; removes it from the request.
+
+        :param request: The parsed request.
+        """
+        token = request.pop("token", None)
+        return isinstance(token, str) and hmac.compare_digest(token, self.token)
+
+    def handle_request(self, request: Dict) -> Dict:
+        """
+        Answer one authorized request.
+
+        :param request: The parsed request line.
+        """
+        try:
+            op = request.pop("op")
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid()}
+            if op == "submit":
+                job_id = self.queue.submit(
+                    request["url"],
+                    bool(request.get("playlist", False)),
+                    int(request.get("file_type", 3)),
+                    int(request.get("resolution", 3)),
+                    int(request.get("priority", 0)),
+                )
+                self._notify()
+                return {"ok": True, "id": job_id}
+            if op == "list":
+                jobs = self.queue.jobs(request.get("all", True), ids=request.get("ids"))
+                for job in jobs:
+                    transfers = self._transfers.get(job["id"])
+                    if transfers is not None and job["state"] == RUNNING:
+                        job.update(transfers.totals())
+                return {"ok": True, "jobs": jobs}
+            if op == "cancel":
+                previous = self.queue.cancel(int(request["id"]))
+                if previous == RUNNING and int(request["id"]) in self._running:
+                    self._running[int(request["id"])].set()
+                return {"ok": previous is not None}
+            if op == "priority":
+                found = self.queue.set_priority(int(request["id"]), int(request["priority"]))
+                self._notify()
+                return {"ok": found}
+            if op == "shutdown":
+                threading.Thread(target=self.stop, daemon=True).start()
+                return {"ok": True}
+            return {"ok": False, "error": f"unknown op: {op}"}
+        except Exception as e:  # pylint: disable = broad-exception-caught
+            return {"ok": False, "error": describe_error(e)}
+
+    def _notify(self) -> None:
+        with self._wake:
+            self._wake.notify_all()
+
+    def _run_job(self, job: Dict, cancel: threading.Event, transfers: JobTransfers) -> str:
+        """
+        Download one job and return its title; raises when it failed.
+
+        :param job: The claimed job.
+        :param cancel: Event set when the job is cancelled or the daemon stops.
+        :param transfers: Receives the progress of the job's streams.
+        """
+        # pylint: disable = import-outside-toplevel
+        from Youtube.yt_playlist_logic import PL
+        from Youtube.yt_vid_logic import YT
+
+        if job["playlist"]:
+            downloader = PL(job["url"], cancel=cancel, **self.options)
+            downloader.video_handle = partial(
+                downloader.video_handle, on_progress_callback=transfers.on_progress
+            )
+            results = downloader.download_playlist(job["file_type"], job["resolution"])
+            failed = [result for result in results if not result.ok]
+            if failed:
+                raise DownloadError(f"{len(failed)} of {len(results)} videos failed")
+        else:
+            # job["priority"] only orders claims; on the link daemon jobs are background
+            # traffic, so downloads started interactively meanwhile go first
+            downloader = YT(
+                job["url"],
+                cancel=cancel,
+                priority=PRIORITY_BACKGROUND,
+                on_progress_callback=transfers.on_progress,
+                **self.options,
+            )
+            downloader.download_video(job["file_type"], job["resolution"])
+        return downloader.title
+
+    def _worker(self) -> None:
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(1.0)
+                continue
+            cancel = threading.Event()
+            self._running[job["id"]] = cancel
+            transfers = self._transfers[job["id"]] = JobTransfers()
+            with log_context(job_id=job["id"]):
+                logging.info(f"Job {job['id']} started: {job['url']}")
+                try:
+                    title = self._run_job(job, cancel, transfers)
+                    self.queue.finish(job["id"], DONE, title=title)
+                    logging.info(f"Job {job['id']} done")
+                except Exception as e:  # pylint: disable = broad-exception-caught
+                    if self._stopping.is_set():
+                        # Interrupted by shutdown: run it again (resuming) after the restart
+                        self.queue.finish(job["id"], QUEUED)
+                    elif cancel.is_set():
+                        self.queue.finish(job["id"], CANCELLED)  # No-op: already cancelled
+                    else:
+                        error = describe_error(e)
+                        self.queue.finish(job["id"], FAILED, error=error)
+                        logging.error(f"Job {job['id']} failed: {error}")
+                finally:
+                    self._running.pop(job["id"], None)
+                    self._transfers.pop(job["id"], None)
+                    get_metrics().flush()
+
+    def serve_forever(self) -> None:
+        """
+        Recover interrupted jobs, start the workers and serve requests until stopped.
+        """
+        log_setup()
+        recovered = self.queue.recover()
+        if recovered:
+            logging.info(f"Requeued {recovered} interrupted jobs")
+        threads = [
+            threading.Thread(target=self._worker, name=f"yt-daemon-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self._stopping.set()
+            for cancel in list(self._running.values()):
+                cancel.set()
+            self._notify()
+            for thread in threads:
+                thread.join()
+            self.server.server_close()
+
+    def stop(self) -> None:
+        """
+        Stop serving; running jobs are interrupted and stay queued for the next start.
+        """
+        self._stopping.set()
+        self.server.shutdown()
+
+
+class DaemonClient:
+    """Client of a running download daemon."""
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        timeout: float = 5,
+        token_path: str = TOKEN_PATH,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token_path = token_path
+
+    def request(self, op: str, **fields) -> Dict:
+        """
+        Send one request and return the response.
+
+        :param op: The operation (ping, submit, list, cancel, priority, shutdown).
+        :param fields: Fields of the request.
+        """
+        token = read_token(self.token_path)
+        with socket.create_connection((self.host, self.port), self.timeout) as sock:
+            sock.sendall(
+                json.dumps({"op": op, "token": token, **fields}).encode("utf-8") + b"\n"
+            )
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("The download daemon closed the connection")
+        return json.loads(line)
+
+    def is_running(self) -> bool:
+        """
+        Whether a daemon answers on the configured address.
+        """
+        try:
+            return self.request("ping").get("ok", False)
+        except OSError:
+            return False
+
+    def job(self, job_id: int) -> Union[Dict, None]:
+        """
+        Return a job with its progress while it runs, or None if the daemon does not know it.
+        """
+        jobs = self.request("list", ids=[job_id]).get("jobs") or []
+        return jobs[0] if jobs else None
+
+    def submit(
+        self,
+        url: str,
+        playlist: bool = False,
+        file_type: int = 3,
+        resolution: int = 3,
+        priority: int = 0,
+    ) -> int:
+        """
+        Queue a download and return its job ID.
+        """
+        response = self.request(
+            "submit",
+            url=url,
+            playlist=playlist,
+            file_type=file_type,
+            resolution=resolution,
+            priority=priority,
+        )
+        if not response.get("ok"):
+            raise DownloadError(response.get("error", "The daemon rejected the job"))
+        return response["id"]
+
@@ -118,3 +118,17 @@ class PlaylistExtractionError(BaseCustomError):
 
     def __init__(self, message: str = "The playlist extraction failed"):
         super().__init__(message)
+
+
+class InsufficientSpaceError(BaseCustomError):
+    """Exception raised when a download would not fit on the disk."""
+
+    def __init__(self, message: str = "Not enough free disk space for the download"):
+        super().__init__(message)
+
+
+class JobInProgressError(BaseCustomError):
+    """Exception raised when the same download is already running."""
+
+    def __init__(self, message: str = "The same download is already in progress"):
+        super().__init__(message)
@@ -1,13 +1,15 @@
+import multiprocessing
 import sys
-from PyQt5.QtGui import QDesktopServices
+from PyQt5.QtGui import QDesktopServices, QImage, QPixmap
+from typing import Dict
 from PyQt5.QtCore import (
     QThreadPool,
+    QTimer,
     QSize, 
     Qt, 
     QRect, 
     QFileInfo, 
     QFile, 
-    QDir, 
     QUrl
 )
 from PyQt5.QtWidgets import (
@@ -22,13 +24,227 @@ from PyQt5.QtWidgets import (
     QLineEdit,
     QWidget,
     QGraphicsView,
+    QGraphicsScene,
     QPushButton,
-    QTreeView,
-    QFileSystemModel,
+    QTableView,
     QMessageBox,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
 )
-from Youtube.gui_helpers import show_alert, DownloadWorker
-from Youtube.logic_helpers import APP_PATH
+from Youtube.daemon import DaemonClient
+from Youtube.gui_helpers import (
+    CANCELLED,
+    DONE,
+    PROGRESS_INTERVAL,
+    QUEUED,
+    RUNNING,
+    DownloadWorker,
+    LibraryModel,
+    QueuedJob,
+    ThumbnailLoader,
+    format_bytes,
+    format_eta,
+    show_alert,
+)
+from Youtube import urls
+
+DEFAULT_CONCURRENCY = 2
+MAX_CONCURRENCY = 16
+PREVIEW_DELAY = 250  # Milliseconds of typing pause before a preview is looked up
+SEARCH_DELAY = 150  # Milliseconds of typing pause before the library is searched
+LIBRARY_REFRESH = 1000  # Milliseconds between checks for archive changes
+
+
+class QueuePanel(QWidget):
+    """
+    Download queue: one row per job with live progress, speed and ETA.
+
+    Jobs run on a QThreadPool whose thread count is the concurrency limit. Queued jobs
+    start in priority order; raising or lowering the priority of a queued job re-queues
+    it. Cancelling removes a queued job or stops a running one. Progress is polled from
+    the jobs by a timer instead of being signalled per chunk, so the event loop sees at
+    most one update per job every PROGRESS_INTERVAL. When a download daemon is running,
+    jobs are handed to it: their workers follow the daemon's state and progress, and
+    cancel and priority changes are sent on to the daemon.
+    """
+
+    COLUMNS = ["Job", "Priority", "Status", "Progress", "Speed", "ETA"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs: Dict[int, QueuedJob] = {}
+        self.workers: Dict[int, DownloadWorker] = {}
+        self.rows: Dict[int, int] = {}
+        self._next_id = 1
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(DEFAULT_CONCURRENCY)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 170)
+        for column in range(1, len(self.COLUMNS)):
+            self.table.setColumnWidth(column, 65)
+        layout.addWidget(self.table)
+
+        controls = QHBoxLayout()
+        self.cancel_btn = QPushButton("Cancel", self)
+        self.up_btn = QPushButton("Priority +", self)
+        self.down_btn = QPushButton("Priority -", self)
+        self.concurrency_label = QLabel("Parallel", self)
+        self.concurrency = QSpinBox(self)
+        self.concurrency.setRange(1, MAX_CONCURRENCY)
+        self.concurrency.setValue(DEFAULT_CONCURRENCY)
+        controls.addWidget(self.cancel_btn)
+        controls.addWidget(self.up_btn)
+        controls.addWidget(self.down_btn)
+        controls.addStretch()
+        controls.addWidget(self.concurrency_label)
+        controls.addWidget(self.concurrency)
+        layout.addLayout(controls)
+
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        self.up_btn.clicked.connect(lambda: self.change_priority(1))
+        self.down_btn.clicked.connect(lambda: self.change_priority(-1))
+        self.concurrency.valueChanged.connect(self.pool.setMaxThreadCount)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(PROGRESS_INTERVAL * 1000))
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def add_job(self, url: str, is_playlist: bool, file_type: int, resolution: int) -> QueuedJob:
+        """
+        Queue a download and show it in the table.
+        """
+        job = QueuedJob(self._next_id, url, is_playlist, file_type, resolution)
+        self._next_id += 1
+        worker = DownloadWorker(url, is_playlist, file_type, resolution, job=job)
+        worker.setAutoDelete(False)  # Kept in self.workers so it can be re-queued
+        worker.signals.started.connect(self.on_started)
+        worker.signals.titled.connect(self.on_titled)
+        worker.signals.finished.connect(self.on_finished)
+        worker.signals.status.connect(self.on_status)
+        self.jobs[job.job_id] = job
+        self.workers[job.job_id] = worker
+
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.rows[job.job_id] = row
+        for column, text in enumerate([url, "0", QUEUED]):
+            self.table.setItem(row, column, QTableWidgetItem(text))
+        bar = QProgressBar(self.table)
+        bar.setRange(0, 100)
+        bar.setValue(0)
+        bar.setAlignment(Qt.AlignCenter)
+        self.table.setCellWidget(row, 3, bar)
+        for column in (4, 5):
+            self.table.setItem(row, column, QTableWidgetItem(""))
+        self.pool.start(worker, job.priority)
+        return job
+
+    def selected_job(self):
+        row = self.table.currentRow()
+        for job_id, job_row in self.rows.items():
+            if job_row == row:
+                return self.jobs[job_id]
+        return None
+
+    def cancel_selected(self):
+        job = self.selected_job()
+        if job is None or job.state not in {QUEUED, RUNNING}:
+            return
+        job.cancel.set()
+        if job.state == QUEUED and self.pool.tryTake(self.workers[job.job_id]):
+            self.on_finished(job.job_id, CANCELLED, "Cancelled")
+        else:
+            self._set_text(job.job_id, 2, "cancelling")
+
+    def change_priority(self, step: int):
+        job = self.selected_job()
+        if job is not None and job.daemon_id is not None and job.state == RUNNING:
+            # Reorders the job in the daemon's queue; higher GUI priorities start first
+            try:
+                ok = DaemonClient().request(
+                    "priority", id=job.daemon_id, priority=-(job.priority + step)
+                ).get("ok")
+            except OSError:
+                ok = False
+            if ok:
+                job.priority += step
+                self._set_text(job.job_id, 1, str(job.priority))
+            return
+        if job is None or job.state != QUEUED:
+            return  # Only the start order of waiting jobs can change
+        worker = self.workers[job.job_id]
+        if self.pool.tryTake(worker):
+            job.priority += step
+            self.pool.start(worker, job.priority)
+            self._set_text(job.job_id, 1, str(job.priority))
+
+    def on_started(self, job_id: int):
+        self.jobs[job_id].state = RUNNING
+        self._set_text(job_id, 2, RUNNING)
+
+    def on_status(self, job_id: int, state: str):
+        if self.jobs[job_id].state == RUNNING and not self.jobs[job_id].cancel.is_set():
+            self._set_text(job_id, 2, f"daemon: {state}")
+
+    def on_titled(self, job_id: int, title: str):
+        self.jobs[job_id].title = title
+        self._set_text(job_id, 0, title)
+
+    def on_finished(self, job_id: int, state: str, message: str):
+        job = self.jobs[job_id]
+        job.state, job.message = state, message
+        self.workers.pop(job_id, None)
+        self._set_text(job_id, 2, state)
+        self.table.item(self.rows[job_id], 2).setToolTip(message)
+        self._set_text(job_id, 4, "")
+        self._set_text(job_id, 5, "")
+        if state == DONE:
+            self.table.cellWidget(self.rows[job_id], 3).setValue(100)
+
+    def refresh(self):
+        """
+        Show the progress of running jobs that changed since the last tick.
+        """
+        for job in self.jobs.values():
+            if job.state != RUNNING:
+                continue
+            snapshot = job.progress.snapshot()
+            if snapshot is None:
+                continue
+            row = self.rows[job.job_id]
+            if snapshot["total"]:
+                percent = int(snapshot["received"] * 100 / snapshot["total"])
+                self.table.cellWidget(row, 3).setValue(percent)
+            self._set_text(job.job_id, 4, f"{format_bytes(snapshot['speed'])}/s")
+            self._set_text(job.job_id, 5, format_eta(snapshot["eta"]))
+
+    def overall_progress(self) -> int:
+        """
+        Percentage of the jobs still in the queue that is done, for the main progress bar.
+        """
+        active = [job for job in self.jobs.values() if job.state in {QUEUED, RUNNING}]
+        if not active:
+            return 100 if self.jobs else 0
+        values = [self.table.cellWidget(self.rows[job.job_id], 3).value() for job in active]
+        return sum(values) // len(values)
+
+    def _set_text(self, job_id: int, column: int, text: str):
+        item = self.table.item(self.rows[job_id], column)
+        if item.text() != text:
+            item.setText(text)
 
 
 class MainWindow(QMainWindow):
@@ -37,9 +253,9 @@ class MainWindow(QMainWindow):
 
         # Set up the UI
         self.setWindowTitle("Youtube Downloader")
-        self.resize(549, 390)
-        self.setMinimumSize(QSize(549, 390))
-        self.setMaximumSize(QSize(549, 390))
+        self.resize(549, 590)
+        self.setMinimumSize(QSize(549, 590))
+        self.setMaximumSize(QSize(549, 590))
         self.setFocusPolicy(Qt.TabFocus)
         self.setAutoFillBackground(False)
 
@@ -47,7 +263,7 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.centralwidget)
 
         self.layoutWidget = QWidget(self.centralwidget)
-        self.layoutWidget.setGeometry(QRect(10, 0, 527, 386))
+        self.layoutWidget.setGeometry(QRect(10, 0, 527, 586))
 
         self.central_layout = QVBoxLayout(self.layoutWidget)
         self.central_layout.setContentsMargins(0, 0, 0, 0)
@@ -92,8 +308,20 @@ class MainWindow(QMainWindow):
 
         self.bar_layout.addLayout(self.options_layout)
 
+        # Thumbnail previews load in the background while the URL is typed
+        self.thumbnail_scene = QGraphicsScene(self)
+        self.thumbnail_item = self.thumbnail_scene.addPixmap(QPixmap())
+        self.thumbnail.setScene(self.thumbnail_scene)
+        self.preview_id = None
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.url_input.textChanged.connect(self.preview_timer.start)
+
         self.progressBar = QProgressBar(self.layoutWidget)
-        self.progressBar.setProperty("value", 100)
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setProperty("value", 0)
         self.progressBar.setAlignment(Qt.AlignCenter)
         self.progressBar.setTextVisible(False)
         self.progressBar.setOrientation(Qt.Horizontal)
@@ -101,8 +329,13 @@ class MainWindow(QMainWindow):
 
         self.th_files_layout.addLayout(self.bar_layout)
 
-        self.file_view = QTreeView(self.layoutWidget)
-        self.th_files_layout.addWidget(self.file_view)
+        self.library_layout = QVBoxLayout()
+        self.search_input = QLineEdit(self.layoutWidget)
+        self.search_input.setPlaceholderText("Search downloads")
+        self.file_view = QTableView(self.layoutWidget)
+        self.library_layout.addWidget(self.search_input)
+        self.library_layout.addWidget(self.file_view)
+        self.th_files_layout.addLayout(self.library_layout)
 
         self.central_layout.addLayout(self.th_files_layout)
 
@@ -119,15 +352,41 @@ class MainWindow(QMainWindow):
 
         self.central_layout.addLayout(self.buttons_layout)
 
+        self.queue_panel = QueuePanel(self.layoutWidget)
+        self.central_layout.addWidget(self.queue_panel)
+
         # Set up file view
-        self.model = QFileSystemModel()
-        self.model.setRootPath(APP_PATH)
+        # The library view pages through the download archive instead of the folder
+        self.model = LibraryModel(parent=self)
         self.file_view.setModel(self.model)
-        self.file_view.setRootIndex(self.model.index(APP_PATH))
+        self.file_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.file_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.file_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.file_view.verticalHeader().setVisible(False)
+        self.file_view.verticalHeader().setDefaultSectionSize(20)
+        self.file_view.horizontalHeader().setSortIndicator(4, Qt.DescendingOrder)
+        self.file_view.setSortingEnabled(True)
         self.file_view.clicked.connect(self.on_clicked)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(
+            lambda: self.model.set_search(self.search_input.text())
+        )
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.library_timer = QTimer(self)
+        self.library_timer.setInterval(LIBRARY_REFRESH)
+        self.library_timer.timeout.connect(self.model.refresh)
+        self.library_timer.start()
 
-        # Set up thread pool
-        self.thread_pool = QThreadPool()
+        self.thumbnails = ThumbnailLoader(self.preview_size(), parent=self)
+        self.thumbnails.loaded.connect(self.on_thumbnail)
+        self.thumbnails.listed.connect(self.on_playlist_listed)
+
+        # The queue panel runs the downloads; the main bar shows their overall progress
+        self.queue_panel.timer.timeout.connect(
+            lambda: self.progressBar.setValue(self.queue_panel.overall_progress())
+        )
 
         # Connect buttons
         self.download_btn.clicked.connect(self.start_download)
@@ -155,10 +414,41 @@ class MainWindow(QMainWindow):
             3 if self._480p.isChecked() else 2 if self._720p.isChecked() else 1
         )
 
-        # Create worker and connect the completion signal
-        worker = DownloadWorker(url, is_playlist, file_type, resolution)
-        worker.signals.completed.connect(show_alert)
-        self.thread_pool.start(worker)
+        self.queue_panel.add_job(url, is_playlist, file_type, resolution)
+
+    def update_preview(self):
+        """
+        Show the thumbnail of the typed video, or of the first entry of a typed playlist.
+        """
+        url = self.url_input.text().strip()
+        self.thumbnails.size = self.preview_size()  # Laid out by now
+        self.preview_id = urls.video_id(url)
+        if self.preview_id:
+            image = self.thumbnails.request(self.preview_id)
+            if image is not None:
+                self.on_thumbnail(self.preview_id, image)  # Cached: shown without waiting
+        elif urls.playlist_id(url):
+            self.preview_id = url
+            self.thumbnails.request_playlist(url)
+        else:
+            self.thumbnail_item.setPixmap(QPixmap())
+
+    def preview_size(self):
+        size = self.thumbnail.viewport().size()
+        return (max(1, size.width()), max(1, size.height()))
+
+    def on_thumbnail(self, video_id: str, image: QImage):
+        if video_id != self.preview_id:
+            return  # A preview the user has typed past, or a prefetched playlist entry
+        self.thumbnail_item.setPixmap(QPixmap.fromImage(image))
+        self.thumbnail_scene.setSceneRect(self.thumbnail_item.boundingRect())
+
+    def on_playlist_listed(self, url: str, video_ids: list):
+        if url == self.preview_id and video_ids:
+            self.preview_id = video_ids[0]
+            image = self.thumbnails.request(self.preview_id)
+            if image is not None:
+                self.on_thumbnail(self.preview_id, image)
 
     def open_selected(self):
         if hasattr(self, "selected_path") and QFileInfo(self.selected_path).isFile():
@@ -174,20 +464,25 @@ class MainWindow(QMainWindow):
                 QMessageBox.No,
             )
             if reply == QMessageBox.Yes:
-                if QFileInfo(self.selected_path).isDir():
-                    QDir(self.selected_path).removeRecursively()
-                else:
-                    QFile.remove(self.selected_path)
+                if not QFile.remove(self.selected_path) and QFileInfo(self.selected_path).exists():
+                    show_alert(f"Could not delete '{self.selected_path}'.")
+                    return
                 # QMessageBox.information(
                 #     self, "Deleted", f"'{self.selected_path}' has been deleted."
                 # )
-                self.file_view.setRootIndex(self.model.index(APP_PATH))
+                self.model.archive.forget(self.selected_path)
+                self.model.refresh()  # Re-queries the archive; the folder is never rescanned
+                del self.selected_path
 
     def on_clicked(self, index):
-        self.selected_path = self.model.filePath(index)
+        entry = self.model.entry(index.row())
+        if entry:
+            self.selected_path = entry["path"]
 
 
 if __name__ == "__main__":
+    # Lets the spawned merge workers of a frozen build start instead of opening the GUI
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
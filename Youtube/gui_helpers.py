@@ -1,8 +1,38 @@
-from PyQt5.QtCore import QRunnable, pyqtSlot, pyqtSignal, QObject
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Tuple, Union
+from PyQt5.QtCore import (
+    QAbstractTableModel,
+    QBuffer,
+    QByteArray,
+    QIODevice,
+    QModelIndex,
+    QRunnable,
+    QThreadPool,
+    Qt,
+    pyqtSlot,
+    pyqtSignal,
+    QObject,
+)
+from PyQt5.QtGui import QImage
 from PyQt5.QtWidgets import QMessageBox
-from typing import Union
-from Youtube.yt_vid_logic import YT
-from Youtube.yt_playlist_logic import PL
+from Youtube.archive import DownloadArchive, get_archive
+from Youtube import daemon
+from Youtube.daemon import DaemonClient
+from Youtube import urls
+from Youtube.thumbnails import ThumbnailCache, fetch_thumbnail, get_thumbnail_cache
+
+# Job states shown in the queue panel
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+PROGRESS_INTERVAL = 0.1  # Seconds between progress refreshes of a job (10 Hz)
+DAEMON_POLL_INTERVAL = 0.5  # Seconds between state requests for a job run by the daemon
+SPEED_SMOOTHING = 0.3  # Weight of the newest sample in the speed average
+PLAYLIST_PREVIEW_ITEMS = 12  # Playlist entries whose thumbnails are prefetched
+TYPE_LABELS = {1: "audio", 2: "video", 3: "both"}
+
 
 def show_alert(msg: Union[str, None] = None):
     alert = QMessageBox()
@@ -13,31 +43,482 @@ def show_alert(msg: Union[str, None] = None):
     alert.exec_()
 
 
+def format_bytes(size: float) -> str:
+    """
+    Format a byte count for display, e.g. "12.3 MiB".
+    """
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return ""
+
+
+def format_eta(seconds: Union[float, None]) -> str:
+    """
+    Format a remaining time for display, e.g. "1:05" or "1:02:03".
+    """
+    if seconds is None:
+        return ""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class JobProgress:
+    """
+    Progress of one job, coalesced between the download threads and the GUI thread.
+
+    `on_progress` is the YT progress callback and runs for every chunk on every transfer
+    thread; it only updates counters under a lock. The GUI thread calls `snapshot` from a
+    timer, so Qt sees at most one update per job and timer tick however fast chunks arrive.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[str, List[int]] = {}  # stream URL -> [received, total]
+        self._changed = False
+        self._last_time = time.monotonic()
+        self._last_received = 0
+        self.speed = 0.0
+
+    def on_progress(self, stream, _chunk: bytes, remaining: int) -> None:
+        total = getattr(stream, "filesize", 0) or 0
+        with self._lock:
+            entry = self._streams.setdefault(getattr(stream, "url", str(id(stream))), [0, 0])
+            entry[1] = max(total, remaining + entry[0], entry[1])
+            entry[0] = entry[1] - remaining
+            self._changed = True
+
+    def set_totals(self, received: int, total: int) -> None:
+        """
+        Replace the counters with totals reported from elsewhere, e.g. by the daemon.
+        """
+        with self._lock:
+            if self._streams.get("") != [received, total]:
+                self._streams = {"": [received, total]}
+                self._changed = True
+
+    def snapshot(self) -> Union[Dict, None]:
+        """
+        Return the received and total bytes, speed and ETA, or None when nothing changed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._changed:
+                return None
+            self._changed = False
+            received = sum(entry[0] for entry in self._streams.values())
+            total = sum(entry[1] for entry in self._streams.values())
+        elapsed = now - self._last_time
+        if elapsed > 0:
+            sample = max(0, received - self._last_received) / elapsed
+            self.speed = sample if not self.speed else (
+                SPEED_SMOOTHING * sample + (1 - SPEED_SMOOTHING) * self.speed
+            )
+        self._last_time, self._last_received = now, received
+        eta = (total - received) / self.speed if self.speed > 0 else None
+        return {"received": received, "total": total, "speed": self.speed, "eta": eta}
+
+
+@dataclass
+class QueuedJob:
+    """A download in the GUI queue."""
+
+    job_id: int
+    url: str
+    is_playlist: bool
+    file_type: int
+    resolution: int
+    priority: int = 0
+    state: str = QUEUED
+    title: str = ""
+    message: str = ""
+    cancel: threading.Event = field(default_factory=threading.Event)
+    progress: JobProgress = field(default_factory=JobProgress)
+    daemon_id: Union[int, None] = None  # Set when the download daemon runs the job
+
+
 class WorkerSignals(QObject):
     completed = pyqtSignal(str)
+    started = pyqtSignal(int)
+    titled = pyqtSignal(int, str)
+    finished = pyqtSignal(int, str, str)  # job ID, final state, message
+    status = pyqtSignal(int, str)  # job ID, state of the job in the daemon
 
 
 class DownloadWorker(QRunnable):
-    def __init__(self, url: str, is_playlist: bool, file_type: int, resolution: int):
+    def __init__(
+        self,
+        url: str,
+        is_playlist: bool,
+        file_type: int,
+        resolution: int,
+        max_workers: int = 4,
+        job: Union[QueuedJob, None] = None,
+    ):
         super().__init__()
         self.url = url
         self.is_playlist = is_playlist
         self.file_type = file_type
         self.resolution = resolution
+        self.max_workers = max_workers
+        self.job = job or QueuedJob(0, url, is_playlist, file_type, resolution)
         self.signals = WorkerSignals()
 
     @pyqtSlot()
     def run(self):
+        # pytubefix and ffmpeg load on the first download, not when the window opens
+        from Youtube.yt_vid_logic import YT  # pylint: disable = import-outside-toplevel
+        from Youtube.yt_playlist_logic import PL  # pylint: disable = import-outside-toplevel
+
+        job = self.job
+        if job.cancel.is_set():
+            self.signals.finished.emit(job.job_id, CANCELLED, "Cancelled")
+            return
+        self.signals.started.emit(job.job_id)
+        state = DONE
         try:
-            if self.is_playlist:
-                downloader = PL(self.url)
-                downloader.download_playlist(self.file_type, self.resolution)
+            client = DaemonClient()
+            if client.is_running():
+                # A resident daemon is already warm and keeps the job across restarts;
+                # higher GUI priorities start first, lower daemon priorities do
+                job.daemon_id = client.submit(
+                    self.url, self.is_playlist, self.file_type, self.resolution, -job.priority
+                )
+                state, msg = self._track(client)
+            elif self.is_playlist:
+                downloader = PL(self.url, max_workers=self.max_workers, cancel=job.cancel)
+                downloader.video_handle = partial(
+                    downloader.video_handle, on_progress_callback=job.progress.on_progress
+                )
+                self.signals.titled.emit(job.job_id, downloader.title)
+                results = downloader.download_playlist(self.file_type, self.resolution)
+                failed = [result for result in results if not result.ok]
+                msg = f"{downloader.title}: {len(results) - len(failed)}/{len(results)} videos downloaded"
+                if failed:
+                    state = FAILED
+                    msg += "\nFailed:\n" + "\n".join(
+                        f"{result.title or result.url} ({result.error})" for result in failed
+                    )
             else:
-                downloader = YT(self.url)
+                downloader = YT(
+                    self.url,
+                    on_progress_callback=job.progress.on_progress,
+                    cancel=job.cancel,
+                )
+                self.signals.titled.emit(job.job_id, downloader.title)
                 downloader.download_video(self.file_type, self.resolution)
-
-            # Emit signal when done
-            self.signals.completed.emit(f"{downloader.title} is downloaded")
+                msg = f"{downloader.title} is downloaded"
 
         except Exception as e:
-            self.signals.completed.emit(f"{str(e)}")
+            state = CANCELLED if job.cancel.is_set() else FAILED
+            msg = "Cancelled" if state == CANCELLED else f"{str(e)}"
+
+        # Emit signals when done
+        self.signals.finished.emit(job.job_id, state, msg)
+        self.signals.completed.emit(msg)
+
+    def _track(self, client: DaemonClient) -> Tuple[str, str]:
+        """
+        Follow a job run by the daemon until it finishes, passing cancellation on to it.
+
+        :return: The final state and message of the job.
+        """
+        job = self.job
+        cancel_sent = titled = False
+        while True:
+            if job.cancel.is_set() and not cancel_sent:
+                client.request("cancel", id=job.daemon_id)
+                cancel_sent = True
+            entry = client.job(job.daemon_id)
+            if entry is None:
+                return FAILED, f"Job {job.daemon_id} is unknown to the download daemon"
+            if entry["title"] and not titled:
+                self.signals.titled.emit(job.job_id, entry["title"])
+                titled = True
+            if entry.get("total"):
+                job.progress.set_totals(entry["received"], entry["total"])
+            if entry["state"] in daemon.FINISHED:
+                title = entry["title"] or self.url
+                if entry["state"] == daemon.DONE:
+                    return DONE, f"{title} is downloaded"
+                if entry["state"] == daemon.CANCELLED:
+                    return CANCELLED, "Cancelled"
+                return FAILED, entry["error"] or "The download daemon failed the job"
+            self.signals.status.emit(job.job_id, entry["state"])
+            if cancel_sent:
+                time.sleep(DAEMON_POLL_INTERVAL)
+            else:
+                job.cancel.wait(DAEMON_POLL_INTERVAL)
+
+
+def load_thumbnail(
+    video_id: str, size: Tuple[int, int], cache: ThumbnailCache
+) -> Union[QImage, None]:
+    """
+    Return a thumbnail scaled to fit `size`, from memory, disk or the network.
+
+    Decoding, scaling and encoding happen in the calling (worker) thread; QImage, unlike
+    QPixmap, may be used outside the GUI thread.
+
+    :param video_id: ID of the video.
+    :param size: (width, height) of the view.
+    :param cache: Cache the image is looked up in and stored to.
+    """
+    image = cache.get(video_id, size)
+    if image is not None:
+        return image
+    data = cache.read(video_id, size)
+    if data is not None:
+        image = QImage.fromData(data)
+    else:
+        image = QImage.fromData(fetch_thumbnail(video_id))
+        if image.isNull():
+            return None
+        image = image.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        encoded = QByteArray()
+        buffer = QBuffer(encoded)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "JPG", 85)
+        buffer.close()
+        cache.write(video_id, size, bytes(encoded))
+    if image.isNull():
+        return None
+    cache.remember(video_id, size, image, image.bytesPerLine() * image.height())
+    return image
+
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+    listed = pyqtSignal(str, list)
+    failed = pyqtSignal(str)
+
+
+class ThumbnailWorker(QRunnable):
+    """Loads one thumbnail, or lists the first entries of a playlist, off the GUI thread."""
+
+    def __init__(
+        self, key: str, size: Tuple[int, int], cache: ThumbnailCache, playlist: bool = False
+    ):
+        super().__init__()
+        self.key = key
+        self.size = size
+        self.cache = cache
+        self.playlist = playlist
+        self.signals = ThumbnailSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            if self.playlist:
+                from pytubefix import Playlist  # pylint: disable = import-outside-toplevel
+
+                video_ids = []
+                for url in Playlist(self.key).url_generator():
+                    video_id = urls.video_id(url)
+                    if video_id:
+                        video_ids.append(video_id)
+                    if len(video_ids) >= PLAYLIST_PREVIEW_ITEMS:
+                        break
+                self.signals.listed.emit(self.key, video_ids)
+                return
+            image = load_thumbnail(self.key, self.size, self.cache)
+            if image is None:
+                self.signals.failed.emit(self.key)
+            else:
+                self.signals.loaded.emit(self.key, image)
+        except Exception:  # pylint: disable = broad-exception-caught
+            self.signals.failed.emit(self.key)  # A missing preview is not worth an alert
+
+
+class ThumbnailLoader(QObject):
+    """
+    Loads thumbnails on a small thread pool of its own, so previews never wait behind
+    downloads, and never requests the same thumbnail twice at the same time.
+    """
+
+    loaded = pyqtSignal(str, QImage)
+    listed = pyqtSignal(str, list)
+
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        cache: Union[ThumbnailCache, None] = None,
+        max_threads: int = 4,
+        parent: Union[QObject, None] = None,
+    ):
+        super().__init__(parent)
+        self.size = size
+        self.cache = cache or get_thumbnail_cache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._in_flight = set()
+
+    def request(self, video_id: str) -> Union[QImage, None]:
+        """
+        Return the thumbnail at once when it is in memory; otherwise load it in the
+        background and emit `loaded` when it is ready.
+
+        :param video_id: ID of the video.
+        """
+        image = self.cache.get(video_id, self.size)
+        if image is None:
+            self._start(video_id, playlist=False)
+        return image
+
+    def request_playlist(self, url: str) -> None:
+        """
+        List the first entries of a playlist in the background, emit `listed` with their
+        video IDs and prefetch their thumbnails.
+
+        :param url: URL of the playlist.
+        """
+        self._start(url, playlist=True)
+
+    def _start(self, key: str, playlist: bool) -> None:
+        if key in self._in_flight:
+            return
+        self._in_flight.add(key)
+        worker = ThumbnailWorker(key, self.size, self.cache, playlist=playlist)
+        worker.signals.loaded.connect(self._on_loaded)
+        worker.signals.listed.connect(self._on_listed)
+        worker.signals.failed.connect(self._in_flight.discard)
+        self.pool.start(worker)
+
+    def _on_loaded(self, video_id: str, image: QImage):
+        self._in_flight.discard(video_id)
+        self.loaded.emit(video_id, image)
+
+    def _on_listed(self, url: str, video_ids: list):
+        self._in_flight.discard(url)
+        for video_id in video_ids:
+            self.request(video_id)  # Prefetch, so stepping through entries is instant
+        self.listed.emit(url, video_ids)
+
+
+class LibraryModel(QAbstractTableModel):
+    """
+    Table model of the downloaded media, backed by the download archive.
+
+    Only the row count is known up front; rows are read from the archive a page at a
+    time when the view asks for them, and only the most recently used pages are kept, so
+    the view stays fast and small however many files the library holds. Searching and
+    sorting run in SQLite. `refresh` re-reads the archive only when its revision
+    changed, e.g. after a job finished or a file was deleted.
+    """
+
+    COLUMNS = [
+        ("title", "Title"),
+        ("type", "Type"),
+        ("resolution", "Res"),
+        ("size", "Size"),
+        ("completed", "Date"),
+        ("video_id", "Video ID"),
+    ]
+    PAGE_SIZE = 200
+    MAX_PAGES = 8
+
+    def __init__(
+        self, archive: Union[DownloadArchive, None] = None, parent: Union[QObject, None] = None
+    ):
+        super().__init__(parent)
+        self.archive = archive or get_archive()
+        self.search = ""
+        self.order_by = "completed"
+        self.descending = True
+        self._pages: "OrderedDict[int, List[Dict]]" = OrderedDict()
+        self._revision = self.archive.revision()
+        self._count = self.archive.library_count()
+
+    def rowCount(self, parent=QModelIndex()):  # pylint: disable = invalid-name
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):  # pylint: disable = invalid-name
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):  # pylint: disable = invalid-name
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entry(index.row())
+        if entry is None:
+            return None
+        key = self.COLUMNS[index.column()][0]
+        if role == Qt.DisplayRole:
+            value = entry[key]
+            if key == "type":
+                return TYPE_LABELS.get(value, str(value))
+            if key == "size":
+                return format_bytes(value)
+            if key == "completed":
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(value))
+            return value
+        if role == Qt.ToolTipRole:
+            return entry["path"]
+        if role == Qt.TextAlignmentRole and key == "size":
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def entry(self, row: int) -> Union[Dict, None]:
+        """
+        Return the archive entry shown in a row, reading its page on first use.
+        """
+        number, offset = divmod(row, self.PAGE_SIZE)
+        page = self._pages.get(number)
+        if page is None:
+            page = self.archive.library_page(
+                self.search,
+                self.order_by,
+                self.descending,
+                number * self.PAGE_SIZE,
+                self.PAGE_SIZE,
+            )
+            self._pages[number] = page
+            while len(self._pages) > self.MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page[offset] if offset < len(page) else None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.order_by = self.COLUMNS[column][0]
+        self.descending = order == Qt.DescendingOrder
+        self._reload()
+
+    def set_search(self, text: str):
+        """
+        Show only the entries whose title or video ID contains `text`.
+        """
+        text = text.strip()
+        if text != self.search:
+            self.search = text
+            self._reload()
+
+    def refresh(self):
+        """
+        Pick up archive changes made since the last call; cheap when there are none.
+        """
+        revision = self.archive.revision()
+        if revision == self._revision:
+            return
+        self._revision = revision
+        count = self.archive.library_count(self.search)
+        if count != self._count:
+            self._reload(count)
+            return
+        self._pages.clear()
+        if count:
+            self.dataChanged.emit(
+                self.index(0, 0), self.index(count - 1, len(self.COLUMNS) - 1)
+            )
+
+    def _reload(self, count: Union[int, None] = None):
+        self.beginResetModel()
+        self._pages.clear()
+        self._count = self.archive.library_count(self.search) if count is None else count
+        self.endResetModel()
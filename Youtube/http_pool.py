@@ -0,0 +1,307 @@
+"""
+Process-wide keep-alive HTTP connection pool.
+
+urllib opens (and TLS-handshakes) a fresh connection for every request. ConnectionPool
+keeps idle HTTP/1.1 connections per host and hands them to the next request for the same
+host, so the metadata requests and stream ranges of consecutive YT/PL instances reuse
+connections instead of paying TCP/TLS setup again. Reuse counters are exposed through
+`stats` to confirm the savings.
+Args:
+    max_idle (int, optional): Idle connections kept across all hosts. Defaults to 32.
+    per_host (int, optional): Connections open at the same time per host. Defaults to 16.
+    timeout (float, optional): Default socket timeout in seconds. Defaults to 30.
+Methods:
+    open: Sends a request and returns a file-like response, raising HTTPError for 4xx/5xx.
+    urlopen: `urllib.request.urlopen` compatible wrapper used to route pytubefix through the pool.
+    stats: Returns the request, connection and reuse counters.
+"""
+
+import http.client
+import ssl
+import threading
+import urllib.request
+from collections import defaultdict, deque
+from typing import Dict, Union
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+REDIRECTS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+# Errors that mean an idle keep-alive connection was closed by the server meanwhile
+STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class PooledResponse:
+    """
+    File-like response that returns its connection to the pool once fully read.
+
+    Callers such as pytubefix read responses to the end without closing them, so the
+    connection is released as soon as the body is exhausted, not only on close().
+    """
+
+    def __init__(self, pool: "ConnectionPool", key: tuple, conn, response, url: str):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        if response.length == 0 or getattr(response, "_method", None) == "HEAD":
+            self.read()  # No body: release right away
+
+    def read(self, amt: Union[int, None] = None) -> bytes:
+        data = self._response.read(amt)
+        if self._response.isclosed():
+            self.close()
+        return data
+
+    def getcode(self) -> int:
+        return self.status
+
+    def geturl(self) -> str:
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        reusable = self._response.isclosed() and not self._response.will_close
+        if not reusable:
+            self._response.close()
+        self._pool._release(self._key, self._conn, reusable)
+        self._conn = None
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:  # pylint: disable = broad-exception-caught
+            pass
+
+
+class ConnectionPool:
+    """Keep-Alive Connection Pool"""
+
+    def __init__(self, max_idle: int = 32, per_host: int = 16, timeout: float = 30):
+        self.max_idle = max_idle
+        self.per_host = per_host
+        self.timeout = timeout
+        self._lock = threading.Condition()
+        self._idle: Dict[tuple, deque] = defaultdict(deque)
+        self._active: Dict[tuple, int] = defaultdict(int)
+        self._ssl = ssl.create_default_context()
+        self._stats = {"requests": 0, "created": 0, "reused": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the request, connection and reuse counters.
+        """
+        with self._lock:
+            return dict(self._stats, idle=sum(len(q) for q in self._idle.values()))
+
+    def _acquire_slot(self, key: tuple) -> None:
+        """
+        Wait until fewer than `per_host` connections to the host are in use.
+
+        :param key: (scheme, host, port) of the connection.
+        """
+        with self._lock:
+            while self._active[key] >= self.per_host:
+                self._lock.wait()
+            self._active[key] += 1
+
+    def _release_slot(self, key: tuple) -> None:
+        with self._lock:
+            self._active[key] -= 1
+            self._lock.notify_all()
+
+    def _connect(self, key: tuple, timeout: float):
+        """
+        Take an idle connection for a host, or create one.
+
+        :param key: (scheme, host, port) of the connection.
+        :param timeout: Socket timeout in seconds.
+        :return: The connection and whether it was reused.
+        """
+        with self._lock:
+            if self._idle[key]:
+                self._stats["reused"] += 1
+                conn = self._idle[key].pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self._stats["created"] += 1
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self._ssl
+            )
+            return conn, False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key: tuple, conn, reusable: bool) -> None:
+        with self._lock:
+            idle = sum(len(q) for q in self._idle.values())
+            if reusable and idle < self.max_idle:
+                self._idle[key].append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+        self._release_slot(key)
+
+    def _send(self, method: str, url: str, headers: Dict[str, str], data, timeout: float):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        self._acquire_slot(key)
+        try:
+            while True:
+                conn, reused = self._connect(key, timeout)
+                try:
+                    conn.request(method, path, body=data, headers=headers)
+                    response = conn.getresponse()
+                    break
+                except STALE_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    # Only a reused connection may have gone stale; retry on a new one
+        except BaseException:
+            self._release_slot(key)
+            raise
+        with self._lock:
+            self._stats["requests"] += 1
+        return PooledResponse(self, key, conn, response, url)
+
+    def open(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: Union[Dict[str, str], None] = None,
+        data: Union[bytes, None] = None,
+        timeout: Union[float, None] = None,
+    ) -> PooledResponse:
+        """
+        Send a request through the pool, following redirects.
+
+        :param url: Request URL.
+        :param method: HTTP method.
+        :param headers: Request headers.
+        :param data: Request body.
+        :param timeout: Socket timeout in seconds, defaults to the pool timeout.
+        :return: The response; close it (or use it as a context manager) to release it.
+        """
+        headers = dict(headers or {})
+        timeout = self.timeout if timeout is None else timeout
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, url, headers, data, timeout)
+            if response.status in REDIRECTS and response.headers.get("Location"):
+                response.read()
+                response.close()
+                url = urljoin(url, response.headers["Location"])
+                if response.status == 303:
+                    method, data = "GET", None
+                continue
+            if response.status >= 400:
+                response.close()
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+            return response
+        raise HTTPError(url, 310, "Too many redirects", None, None)
+
+    def urlopen(
+        self, request, data=None, timeout: Union[float, None] = None, **_
+    ) -> PooledResponse:
+        """
+        `urllib.request.urlopen` compatible entry point.
+
+        :param request: urllib.request.Request object or URL.
+        :param data: Request body overriding the one of `request`.
+        :param timeout: Socket timeout in seconds.
+        """
+        if isinstance(request, str):
+            request = urllib.request.Request(request)
+        return self.open(
+            request.full_url,
+            method=request.get_method(),
+            headers=dict(request.header_items()),
+            data=request.data if data is None else data,
+            timeout=timeout if isinstance(timeout, (int, float)) else None,
+        )
+
+
+_POOL = ConnectionPool()
+_HOOKED = False
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide connection pool.
+    """
+    return _POOL
+
+
+def configure_pool(max_idle: int = 32, per_host: int = 16, timeout: float = 30) -> None:
+    """
+    Resize the process-wide pool at runtime.
+
+    :param max_idle: Idle connections kept across all hosts.
+    :param per_host: Connections open at the same time per host.
+    :param timeout: Default socket timeout in seconds.
+    """
+    with _POOL._lock:  # pylint: disable = protected-access
+        _POOL.max_idle = max_idle
+        _POOL.per_host = per_host
+        _POOL.timeout = timeout
+        _POOL._lock.notify_all()  # pylint: disable = protected-access
+
+
+def _proxy_installed() -> bool:
+    """
+    Whether a proxy opener was installed into urllib (pytubefix does so for `proxies`).
+    """
+    opener = getattr(urllib.request, "_opener", None)
+    return any(
+        isinstance(handler, urllib.request.ProxyHandler) and handler.proxies
+        for handler in getattr(opener, "handlers", [])
+    )
+
+
+def install_pytubefix_hook() -> None:
+    """
+    Route the metadata requests pytubefix makes through the shared pool.
+
+    pytubefix sends every innertube and page request through `pytubefix.request.urlopen`;
+    replacing that name keeps its request building intact while reusing connections.
+    The pool does not speak to proxies, so requests fall back to the original urlopen
+    whenever a proxy opener is installed.
+    """
+    global _HOOKED  # pylint: disable = global-statement
+    if _HOOKED:
+        return
+    from pytubefix import request  # pylint: disable = import-outside-toplevel
+
+    original = getattr(request, "urlopen", None)
+    if original is None:
+        return
+
+    def pooled_urlopen(req, *args, **kwargs):
+        if _proxy_installed():
+            return original(req, *args, **kwargs)
+        return _POOL.urlopen(req, *args, **kwargs)
+
+    request.urlopen = pooled_urlopen
+    _HOOKED = True
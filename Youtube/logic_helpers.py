@@ -1,12 +1,31 @@
 '''Hepler methods for yt_vid and yt_playlist'''
 import os
 import re
-from Youtube.logs import log_setup, logging
+import threading
+from typing import TYPE_CHECKING, Iterable
+from Youtube.errors import BaseCustomError, DownloadAbortedError
+from Youtube.logs import logging
 
-log_setup()
+if TYPE_CHECKING:
+    from concurrent.futures import Future
 
 
 APP_PATH = os.path.join(os.path.expanduser("~"), "Downloads", "YoutubeDownloader")
+RESOLUTIONS = {1: "1080p", 2: "720p", 3: "480p"}
+
+
+def resolution_label(resolution: int = None) -> str:
+    """
+    Returns the label of a resolution option, e.g. "720p" for 2. Defaults to "1080p".
+
+    Args:
+        resolution (int, optional): Resolution option (1: 1080p, 2: 720p, 3: 480p).
+
+    Returns:
+        str: The resolution label.
+    """
+
+    return RESOLUTIONS[resolution] if resolution else "1080p"
 
 
 def handle_errors(custom_exception):
@@ -28,7 +47,9 @@ def handle_errors(custom_exception):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                logging.error(e)
+                # An inner handler already logged the cause; log each failure only once
+                if not (isinstance(e, BaseCustomError) and e.__cause__ is not None):
+                    logging.error(e, extra={"error": type(e).__name__})
                 raise custom_exception from e
 
         return wrapper
@@ -52,3 +73,67 @@ def sanitize_filename(filename: str) -> str:
 
     invalid_chars_pattern = r'[\\\/:*?"<>|]'
     return re.sub(invalid_chars_pattern, "", filename)
+
+
+class CancelEvent(threading.Event):
+    """
+    Cancellation event that also reads as set once its parent event is set.
+
+    Setting it does not set the parent, so a task group that cancels itself after a
+    failure leaves the parent (e.g. a whole playlist or daemon job) running.
+
+    Args:
+        parent (threading.Event, optional): The enclosing cancellation event.
+"""
+
+    def __init__(self, parent: threading.Event = None):
+        super().__init__()
+        self.parent = parent
+
+    def is_set(self) -> bool:
+        return super().is_set() or (self.parent is not None and self.parent.is_set())
+
+
+def wait_all(futures: Iterable["Future"], cancel: threading.Event) -> None:
+    """
+    Waits for a group of futures that must all succeed.
+
+    On the first failure `cancel` is set so the remaining tasks stop early. Once every
+    future has finished, the original failure is re-raised rather than the
+    DownloadAbortedError it caused in the other tasks.
+
+    Args:
+        futures (Iterable[Future]): The futures to wait for.
+        cancel (threading.Event): The event the tasks watch for cancellation.
+"""
+
+    from concurrent.futures import as_completed  # pylint: disable = import-outside-toplevel
+
+    errors = []
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception as e:  # pylint: disable = broad-exception-caught
+            cancel.set()
+            errors.append(e)
+    if errors:
+        raise next(
+            (e for e in errors if not isinstance(e, DownloadAbortedError)), errors[0]
+        )
+
+
+def describe_error(error: BaseException) -> str:
+    """
+    Describes an error raised through `handle_errors` by its type and its root cause.
+
+    Args:
+        error (BaseException): The error to describe.
+
+    Returns:
+        str: e.g. "DownloadError: HTTP Error 403: Forbidden".
+    """
+
+    cause = error
+    while cause.__cause__ is not None:
+        cause = cause.__cause__
+    return f"{type(error).__name__}: {cause}"
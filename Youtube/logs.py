@@ -1,9 +1,235 @@
-# pylint: disable = missing-function-docstring
-# pylint: disable = missing-module-docstring
+"""
+Download log: structured, rotated and written off the download threads.
+
+Records are handed to a bounded in-memory queue and written by a single background thread
+(a QueueListener), so a download thread never waits on the disk. Each record is one JSON
+object per line with its time, level, message and whatever fields were attached to it:
+`extra={...}` fields on the call and the fields of every enclosing `log_context`, such as
+the job and video IDs. The file lives at a fixed location, `APP_PATH/logs/download_log.jsonl`
+(or `YT_LOG_DIR`), and rotates by size, keeping a few old files. When the writer falls
+behind and the queue is full, new records are dropped and counted instead of blocking.
+High-frequency progress goes through `log_progress`, which writes at most one record per
+job every `PROGRESS_LOG_INTERVAL` seconds plus the final one. The last record time of at
+most `PROGRESS_KEYS` transfers is kept, so transfers that fail or are cancelled before
+their final record cannot grow it without bound.
+Methods:
+    log_setup: Starts the background writer once, on first real use.
+    log_shutdown: Flushes the queue and stops the writer (also run at exit).
+    log_context: Attaches fields to every record logged inside it on this thread.
+    log_progress: Rate-limited progress record of a transfer.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
 import logging
-def log_setup():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(levelname)s - %(message)s",
-        handlers=[logging.FileHandler("download_log.txt")],
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+LOG_NAME = "download_log.jsonl"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+LOG_QUEUE_SIZE = 10000
+PROGRESS_LOG_INTERVAL = 5.0  # Seconds between progress records of one job
+PROGRESS_KEYS = 1024  # Transfers whose last progress record time is remembered
+
+# Attributes every LogRecord has; anything else was attached by the caller
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+}
+_TRACEBACKS = logging.Formatter()
+_CONTEXT: contextvars.ContextVar = contextvars.ContextVar("yt_log_context", default={})
+
+_CONFIGURED = False
+_LISTENER: Union[logging.handlers.QueueListener, None] = None
+_HANDLER: Union["DroppingQueueHandler", None] = None
+_SETUP_LOCK = threading.Lock()
+_PROGRESS: "OrderedDict[str, float]" = OrderedDict()
+_PROGRESS_LOCK = threading.Lock()
+
+
+def log_dir() -> str:
+    """
+    Return the directory the download log is written to.
+    """
+    from Youtube.logic_helpers import APP_PATH  # pylint: disable = import-outside-toplevel
+
+    return os.environ.get("YT_LOG_DIR") or os.path.join(APP_PATH, "logs")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the fields of the enclosing `log_context` onto each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _CONTEXT.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, while they are still current, but leave
+        # the JSON encoding to the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def log_setup(
+    path: Union[str, None] = None,
+    max_bytes: int = LOG_MAX_BYTES,
+    backups: int = LOG_BACKUPS,
+) -> None:
+    """
+    Start the background log writer once, on first real use rather than at import time.
+
+    :param path: Log file. Defaults to `download_log.jsonl` in `log_dir()`.
+    :param max_bytes: Size at which the file is rotated.
+    :param backups: Rotated files kept.
+    """
+    global _CONFIGURED, _LISTENER, _HANDLER  # pylint: disable = global-statement
+    with _SETUP_LOCK:
+        if _CONFIGURED:
+            return
+        _CONFIGURED = True
+        path = path or os.path.join(log_dir(), LOG_NAME)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            file_handler: logging.Handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+            )
+        except OSError:
+            file_handler = logging.StreamHandler()  # Unwritable log dir: keep logging
+        file_handler.setFormatter(JsonFormatter())
+        _HANDLER = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _HANDLER.addFilter(ContextFilter())
+        _LISTENER = logging.handlers.QueueListener(_HANDLER.queue, file_handler)
+        _LISTENER.start()
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(_HANDLER)
+        atexit.register(log_shutdown)
+
+
+def log_shutdown() -> None:
+    """
+    Write out the queued records and stop the background writer.
+    """
+    global _CONFIGURED, _LISTENER, _HANDLER  # pylint: disable = global-statement
+    with _SETUP_LOCK:
+        if _LISTENER is None:
+            return
+        logging.getLogger().removeHandler(_HANDLER)
+        _LISTENER.stop()  # Drains the queue first
+        if _HANDLER.dropped:
+            _LISTENER.handle(
+                logging.makeLogRecord(
+                    {
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"{_HANDLER.dropped} log records dropped",
+                    }
+                )
+            )
+        for handler in _LISTENER.handlers:
+            handler.close()
+        _LISTENER = _HANDLER = None
+        _CONFIGURED = False
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """
+    Attach fields (e.g. job_id, video_id) to every record logged inside the block.
+
+    Contexts nest, and only apply to the current thread or task.
+    """
+    token = _CONTEXT.set({**_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        _CONTEXT.reset(token)
+
+
+def log_progress(
+    key: str,
+    received: int,
+    total: Union[int, None],
+    interval: float = PROGRESS_LOG_INTERVAL,
+    **fields,
+) -> bool:
+    """
+    Log the progress of a transfer, at most once every `interval` seconds per key.
+
+    Safe to call for every chunk: the rate check runs before any record is created, and
+    the final call (received == total) is always logged.
+
+    :param key: Identifies the transfer, e.g. "<video_id>:<itag>".
+    :param received: Bytes received so far.
+    :param total: Expected size in bytes, if known.
+    :param interval: Minimum seconds between records of the same key.
+    :return: Whether a record was logged.
+    """
+    now = time.monotonic()
+    done = bool(total) and received >= total
+    with _PROGRESS_LOCK:
+        if not done and now - _PROGRESS.get(key, float("-inf")) < interval:
+            return False
+        if done:
+            _PROGRESS.pop(key, None)
+        else:
+            _PROGRESS[key] = now
+            _PROGRESS.move_to_end(key)
+            if len(_PROGRESS) > PROGRESS_KEYS:
+                # Least recently logged; at worst that transfer logs one record early
+                _PROGRESS.popitem(last=False)
+    logging.info(
+        "progress",
+        extra={"event": "progress", "key": key, "received": received, "total": total, **fields},
     )
+    return True
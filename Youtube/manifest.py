@@ -0,0 +1,177 @@
+"""
+On-disk job manifest used to resume interrupted downloads.
+
+A manifest is a small JSON file kept next to the partial files of a job. It records,
+per stream, the expected size and how many bytes of every byte range are already on
+disk, and for playlists which entries are finished. Re-running the same job reads it
+back so partial streams resume from their byte offsets and finished entries are skipped.
+Args:
+    path (str): Location of the manifest file.
+    save_interval (float, optional): Minimum seconds between progress writes. Defaults to 1.
+Methods:
+    stream: Returns the recorded state of a stream, if any.
+    start_stream: Records a new stream with its byte ranges.
+    update_range: Records the completed bytes of one range.
+    finish_item / is_item_finished: Track finished playlist entries.
+    save: Atomically writes the manifest to disk.
+PlaylistIndex keeps the IDs of playlist entries downloaded by previous incremental syncs.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Union
+
+
+class JobManifest:
+    """Resumable Job Manifest"""
+
+    def __init__(self, path: str, save_interval: float = 1.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self.data = {"streams": {}, "items": []}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError):
+                # A corrupt manifest only costs a fresh download
+                self.data = {"streams": {}, "items": []}
+
+    def stream(self, stream_id: str) -> Union[Dict, None]:
+        """
+        Return the recorded state of a stream, or None when it was never started.
+
+        :param stream_id: Identifier of the stream (e.g. its itag).
+        """
+        with self._lock:
+            return self.data["streams"].get(str(stream_id))
+
+    def start_stream(
+        self, stream_id: str, path: str, size: int, ranges: List[List[int]]
+    ) -> Dict:
+        """
+        Record a new stream download, replacing any previous state for it.
+
+        :param stream_id: Identifier of the stream.
+        :param path: Path of the partial file.
+        :param size: Expected size in bytes.
+        :param ranges: Inclusive [start, end] byte ranges.
+        """
+        with self._lock:
+            entry = {
+                "path": path,
+                "size": size,
+                "ranges": [[start, end, 0] for start, end in ranges],
+            }
+            self.data["streams"][str(stream_id)] = entry
+            self.save(force=True)
+            return entry
+
+    def update_range(self, stream_id: str, index: int, done: int, save: bool = True) -> None:
+        """
+        Record how many bytes of a range are written and periodically persist it.
+
+        :param stream_id: Identifier of the stream.
+        :param index: Index of the range.
+        :param done: Bytes of the range already written.
+        :param save: Whether to persist it here; callers that must not block (the asyncio
+            downloader) record it in memory only and call `save` elsewhere.
+        """
+        with self._lock:
+            self.data["streams"][str(stream_id)]["ranges"][index][2] = done
+            if save:
+                self.save()
+
+    def completed(self, stream_id: str) -> int:
+        """
+        Return the number of bytes already written for a stream.
+
+        :param stream_id: Identifier of the stream.
+        """
+        entry = self.stream(stream_id)
+        return sum(r[2] for r in entry["ranges"]) if entry else 0
+
+    def finish_item(self, item_id: str) -> None:
+        """
+        Mark a playlist entry as finished.
+
+        :param item_id: Video ID of the entry.
+        """
+        with self._lock:
+            if item_id not in self.data["items"]:
+                self.data["items"].append(item_id)
+            self.save(force=True)
+
+    def is_item_finished(self, item_id: str) -> bool:
+        """
+        Check whether a playlist entry was finished by a previous run.
+
+        :param item_id: Video ID of the entry.
+        """
+        with self._lock:
+            return item_id in self.data["items"]
+
+    def save(self, force: bool = False) -> None:
+        """
+        Atomically write the manifest, at most once per `save_interval` unless forced.
+
+        :param force: Write even if the last write was recent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.save_interval:
+                return
+            self._last_save = now
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+
+
+class PlaylistIndex:
+    """
+    Persistent record of the entries of a playlist that were already downloaded.
+
+    Used by incremental syncs: entries found in the index are not processed again, so a
+    re-sync only downloads what was added to the playlist since the last run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("entries", {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def seen(self, video_id: str) -> bool:
+        """
+        Check whether an entry was downloaded by a previous sync.
+
+        :param video_id: ID of the video.
+        """
+        with self._lock:
+            return video_id in self.entries
+
+    def add(self, video_id: str, **info) -> None:
+        """
+        Record a downloaded entry and persist the index.
+
+        :param video_id: ID of the video.
+        :param info: Extra details stored with the entry.
+        """
+        with self._lock:
+            self.entries[video_id] = {"synced": time.time(), **info}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self.entries}, f)
+            os.replace(tmp_path, self.path)
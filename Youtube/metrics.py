@@ -0,0 +1,229 @@
+"""
+Download metrics.
+
+YT reports what a download spent its time on through a pluggable recorder: metadata
+latency, time to first byte, stream download time and throughput, ffmpeg merge time, tmp
+cleanup time and the total job time. Each measurement is one `observe` call per stream or
+per job step, never per chunk, so recording can stay enabled in production.
+Recorders:
+    NullRecorder: Discards everything; the default.
+    AggregatingRecorder: Keeps count/sum/min/max per metric and labels, and writes them as
+        a Prometheus text-format file (e.g. for the node_exporter textfile collector).
+    JsonLinesRecorder: Appends every observation as one JSON line.
+    MultiRecorder: Sends observations to several recorders.
+Methods:
+    get_metrics / set_metrics: The process-wide recorder YT uses unless given one.
+    recorder_for_path: Picks a recorder from a file name (.prom or JSON lines).
+"""
+
+import abc
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple, Union
+
+# Labels that identify a single job; kept in event logs but dropped from aggregates
+HIGH_CARDINALITY = {"video_id"}
+
+
+class MetricsRecorder(abc.ABC):
+    """Metrics Recorder Interface"""
+
+    @abc.abstractmethod
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Record one measurement.
+
+        :param name: Metric name, e.g. "yt_stream_seconds".
+        :param value: Measured value.
+        :param labels: Dimensions of the measurement, e.g. stream="video".
+        """
+
+    def flush(self) -> None:
+        """
+        Write buffered data to its destination.
+        """
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[Dict]:
+        """
+        Observe the wall-clock seconds spent in the block.
+
+        The yielded dict may be updated with labels only known at the end (e.g. outcome).
+
+        :param name: Metric name.
+        :param labels: Dimensions of the measurement.
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+
+class NullRecorder(MetricsRecorder):
+    """Recorder that discards every measurement."""
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        pass
+
+
+class AggregatingRecorder(MetricsRecorder):
+    """
+    In-memory aggregates exported as Prometheus text format.
+
+    Args:
+        path (str | None, optional): File written by `flush`.
+    """
+
+    def __init__(self, path: Union[str, None] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, Tuple], List[float]] = {}  # [count, sum, min, max]
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (
+            name,
+            tuple(sorted((k, str(v)) for k, v in labels.items() if k not in HIGH_CARDINALITY)),
+        )
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                self._series[key] = [1, value, value, value]
+            else:
+                series[0] += 1
+                series[1] += value
+                series[2] = min(series[2], value)
+                series[3] = max(series[3], value)
+
+    def snapshot(self) -> Dict[Tuple[str, Tuple], Dict[str, float]]:
+        """
+        Return the current aggregates keyed by (name, labels).
+        """
+        with self._lock:
+            return {
+                key: {"count": s[0], "sum": s[1], "min": s[2], "max": s[3]}
+                for key, s in self._series.items()
+            }
+
+    def prometheus_text(self) -> str:
+        """
+        Render the aggregates in the Prometheus text exposition format.
+        """
+        lines = []
+        by_name: Dict[str, List] = {}
+        for (name, labels), values in sorted(self.snapshot().items()):
+            by_name.setdefault(name, []).append((labels, values))
+        for name, series in by_name.items():
+            lines.append(f"# TYPE {name} summary")
+            for labels, values in series:
+                lines.append(f"{name}_count{_labels(labels)} {values['count']}")
+                lines.append(f"{name}_sum{_labels(labels)} {values['sum']:.6g}")
+            lines.append(f"# TYPE {name}_max gauge")
+            for labels, values in series:
+                lines.append(f"{name}_max{_labels(labels)} {values['max']:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.path)  # Scrapers never see a half-written file
+
+
+def _labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class JsonLinesRecorder(MetricsRecorder):
+    """
+    Appends every observation to a JSON-lines file.
+
+    Args:
+        path (str): File the observations are appended to.
+        flush_interval (float, optional): Seconds between writes. Defaults to 1.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        line = json.dumps(
+            {"time": round(time.time(), 3), "metric": name, "value": value, **labels}
+        )
+        with self._lock:
+            self._buffer.append(line)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not lines:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+class MultiRecorder(MetricsRecorder):
+    """Sends every observation to several recorders."""
+
+    def __init__(self, recorders: List[MetricsRecorder]):
+        self.recorders = recorders
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        for recorder in self.recorders:
+            recorder.observe(name, value, **labels)
+
+    def flush(self) -> None:
+        for recorder in self.recorders:
+            recorder.flush()
+
+
+def recorder_for_path(path: str) -> MetricsRecorder:
+    """
+    Return a Prometheus recorder for `*.prom` paths and a JSON-lines recorder otherwise.
+
+    :param path: Output file.
+    """
+    if path.endswith(".prom"):
+        return AggregatingRecorder(path)
+    return JsonLinesRecorder(path)
+
+
+_METRICS: MetricsRecorder = NullRecorder()
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    Return the process-wide metrics recorder.
+    """
+    return _METRICS
+
+
+def set_metrics(recorder: Union[MetricsRecorder, None]) -> None:
+    """
+    Replace the process-wide metrics recorder; None turns recording off.
+
+    :param recorder: The new recorder.
+    """
+    global _METRICS  # pylint: disable = global-statement
+    _METRICS = recorder or NullRecorder()
@@ -0,0 +1,219 @@
+"""
+Staged fetch/merge/finalize download pipeline.
+
+Downloading a video is network bound while merging it is CPU and disk bound. Running
+both back to back on the same worker leaves the link idle during every merge and the CPU
+idle during every transfer. DownloadPipeline splits the work into three stages:
+    fetch: a thread pool transferring the streams of each item into its tmp folder.
+    merge: ffmpeg merges on a process pool sized to the CPU count. The pool is created
+        once per process and shared by every pipeline; its workers are spawned rather
+        than forked, so they never inherit the locks of running download threads.
+    finalize: one thread recording results and cleaning up tmp folders.
+The stages are connected by queues. The merge queue is bounded, so when merges fall
+behind, fetch workers wait before taking new items. This keeps the number of fetched but
+unmerged items, and with it the tmp disk usage, bounded.
+Args:
+    fetch_workers (int, optional): Items transferred at the same time. Defaults to 4.
+    merge_workers (int | None, optional): Concurrent merges. Defaults to the CPU count.
+    max_pending_merges (int | None, optional): Fetched items allowed to wait for a merge.
+        Defaults to `merge_workers`.
+    metrics (MetricsRecorder | None, optional): Receives the merge times.
+Methods:
+    merge_files: Merges a video and an audio file with ffmpeg (runs in the merge pool).
+    get_merge_pool: The process-wide merge pool.
+    run: Pushes items through the stages and returns the finalized results.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Tuple, Union
+from Youtube.errors import FFmpegError, _FileExistsError
+from Youtube.metrics import MetricsRecorder, get_metrics
+
+_STOP = object()
+
+# fetch(item) -> (payload, merge arguments or None); finalize(payload, error) -> result
+FetchFn = Callable[[Any], Tuple[Any, Union[Tuple[str, str, str], None]]]
+FinalizeFn = Callable[[Any, Union[BaseException, None]], Any]
+
+
+def merge_files(v_out: str, a_out: str, out_path: str) -> float:
+    """
+    Merge a video and an audio file into `out_path` without re-encoding.
+
+    Runs in the merge process pool, so it only raises errors that pickle cleanly.
+
+    :param v_out: Path to the video file.
+    :param a_out: Path to the audio file.
+    :param out_path: Path of the merged output, which must not exist yet.
+    :return: Seconds the merge took.
+    """
+    import ffmpeg  # pylint: disable = import-outside-toplevel
+
+    if os.path.exists(out_path):
+        raise _FileExistsError
+    start = time.perf_counter()
+    output = ffmpeg.output(
+        ffmpeg.input(v_out),
+        ffmpeg.input(a_out),
+        out_path,
+        vcodec="copy",
+        acodec="copy",
+        loglevel="quiet",
+    )
+    try:
+        ffmpeg.run(output, overwrite_output=True)
+    except ffmpeg.Error as e:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise FFmpegError(f"ffmpeg failed to merge {os.path.basename(out_path)}") from e
+    return time.perf_counter() - start
+
+
+_MERGE_POOL: Union[ProcessPoolExecutor, None] = None
+_MERGE_POOL_SIZE = 0
+_MERGE_POOL_LOCK = threading.Lock()
+
+
+def get_merge_pool(
+    workers: int, broken: Union[ProcessPoolExecutor, None] = None
+) -> ProcessPoolExecutor:
+    """
+    Return the process-wide merge pool, with room for at least `workers` merges.
+
+    Spawned workers start a fresh interpreter, so the pool is kept for the life of the
+    process instead of being created per run. It is replaced when a pipeline needs more
+    workers than it has, or when the caller found it broken by a crashed worker.
+
+    :param workers: Concurrent merges the caller runs.
+    :param broken: A pool that raised BrokenProcessPool, replaced if it is still current.
+    """
+    global _MERGE_POOL, _MERGE_POOL_SIZE  # pylint: disable = global-statement
+    with _MERGE_POOL_LOCK:
+        if _MERGE_POOL is None or _MERGE_POOL is broken or _MERGE_POOL_SIZE < workers:
+            if _MERGE_POOL is not None:
+                _MERGE_POOL.shutdown(wait=False)  # Merges already submitted still finish
+            _MERGE_POOL_SIZE = max(workers, _MERGE_POOL_SIZE)
+            _MERGE_POOL = ProcessPoolExecutor(
+                max_workers=_MERGE_POOL_SIZE, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _MERGE_POOL
+
+
+class DownloadPipeline:
+    """Fetch/Merge/Finalize Pipeline"""
+
+    def __init__(
+        self,
+        fetch_workers: int = 4,
+        merge_workers: Union[int, None] = None,
+        max_pending_merges: Union[int, None] = None,
+        metrics: Union[MetricsRecorder, None] = None,
+    ):
+        self.fetch_workers = max(1, fetch_workers)
+        self.merge_workers = max(1, merge_workers or os.cpu_count() or 1)
+        self.max_pending_merges = max(1, max_pending_merges or self.merge_workers)
+        self.metrics = metrics or get_metrics()
+
+    def _fetch(self, fetch: FetchFn, item, merges: queue.Queue, finals: queue.Queue) -> None:
+        payload, merge_args = fetch(item)
+        if merge_args is None:
+            finals.put((payload, None))
+        else:
+            merges.put((payload, merge_args))  # Blocks while the merge stage is behind
+
+    def _merge_stage(self, merges: queue.Queue, finals: queue.Queue) -> None:
+        slots = threading.Semaphore(self.merge_workers)
+
+        def done(future, payload):
+            slots.release()
+            error = future.exception()
+            if error is None:
+                self.metrics.observe("yt_merge_seconds", future.result(), mode="pool")
+            finals.put((payload, error))
+
+        pool = get_merge_pool(self.merge_workers)
+        while True:
+            entry = merges.get()
+            if entry is _STOP:
+                break
+            payload, merge_args = entry
+            # Take items off the queue only when a merge process is free, so the
+            # bounded queue (not this thread) holds the backlog
+            slots.acquire()
+            try:
+                try:
+                    future = pool.submit(merge_files, *merge_args)
+                except BrokenProcessPool:
+                    pool = get_merge_pool(self.merge_workers, broken=pool)
+                    future = pool.submit(merge_files, *merge_args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                slots.release()
+                finals.put((payload, e))
+                continue
+            future.add_done_callback(lambda f, p=payload: done(f, p))
+        # The pool outlives this run; wait for its own merges by taking back every slot
+        for _ in range(self.merge_workers):
+            slots.acquire()
+        finals.put(_STOP)
+
+    @staticmethod
+    def _finalize_stage(finalize: FinalizeFn, finals: queue.Queue, results: List) -> None:
+        while True:
+            entry = finals.get()
+            if entry is _STOP:
+                return
+            payload, error = entry
+            results.append(finalize(payload, error))
+
+    def run(self, items: Iterable, fetch: FetchFn, finalize: FinalizeFn) -> List:
+        """
+        Push every item through the fetch, merge and finalize stages.
+
+        `fetch` transfers an item and returns a payload plus the (video, audio, output)
+        paths to merge, or None when nothing needs merging. `finalize` receives the
+        payload and the merge error, if any, and returns the item's result. Neither
+        should raise; failures belong in the results.
+
+        :param items: Items to process; consumed lazily.
+        :param fetch: Fetch stage callable.
+        :param finalize: Finalize stage callable.
+        :return: The results, in completion order.
+        """
+        merges: queue.Queue = queue.Queue(maxsize=self.max_pending_merges)
+        finals: queue.Queue = queue.Queue()
+        results: List = []
+        merger = threading.Thread(
+            target=self._merge_stage, args=(merges, finals), name="yt-merge", daemon=True
+        )
+        finalizer = threading.Thread(
+            target=self._finalize_stage,
+            args=(finalize, finals, results),
+            name="yt-finalize",
+            daemon=True,
+        )
+        merger.start()
+        finalizer.start()
+        try:
+            pending = set()
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+                for item in items:
+                    # Keep at most two items queued per worker so enumeration stays
+                    # just ahead of the transfers
+                    if len(pending) >= self.fetch_workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(pool.submit(self._fetch, fetch, item, merges, finals))
+            for future in pending:
+                future.result()
+        finally:
+            merges.put(_STOP)
+            merger.join()
+            finalizer.join()
+        return results
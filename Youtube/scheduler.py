@@ -0,0 +1,134 @@
+"""
+Process-wide bandwidth scheduler.
+
+Every network read of a transfer started from YT/PL asks the scheduler for permission to
+read `n` bytes first. The scheduler enforces a global byte-rate cap with a token bucket
+and, while the cap is the bottleneck, serves waiting transfers strictly by priority (then
+first come, first served). Interactive single-video downloads therefore keep their
+bandwidth while background playlist items share whatever is left.
+With a rate of 0 the cap is off and requests are granted immediately.
+Args:
+    rate (float, optional): Global cap in bytes per second, 0 for unlimited. Defaults to 0.
+    burst (int | None, optional): Bucket size in bytes. Defaults to one second of `rate`.
+Methods:
+    set_rate: Changes the cap at runtime; waiting transfers pick it up immediately.
+    acquire: Blocks until `n` bytes may be read.
+    reserve: Charges `n` bytes and returns the delay to wait, for event loops.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Tuple, Union
+from Youtube.errors import DownloadAbortedError
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+MIN_BURST = 1 << 16
+
+
+class BandwidthScheduler:
+    """Token Bucket Bandwidth Scheduler"""
+
+    def __init__(self, rate: float = 0, burst: Union[int, None] = None):
+        self._cond = threading.Condition()
+        self._waiters = []  # Heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self.rate = 0.0
+        self.burst = 0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float, burst: Union[int, None] = None) -> None:
+        """
+        Change the global cap.
+
+        :param rate: Bytes per second, 0 for unlimited.
+        :param burst: Bucket size in bytes. Defaults to one second of `rate`.
+        """
+        with self._cond:
+            self._refill()
+            self.rate = max(0.0, float(rate))
+            self.burst = max(MIN_BURST, int(burst or self.rate))
+            self._tokens = min(self._tokens, self.burst)
+            self._cond.notify_all()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, n: int, priority: int = PRIORITY_INTERACTIVE) -> Tuple[bool, float]:
+        """
+        Charge `n` bytes without blocking and return how long to wait before reading them.
+
+        For event loops: sleep for the returned delay instead of parking a thread in
+        `acquire`. The bucket goes into debt, so concurrent reservations queue up behind
+        each other in time. While a more urgent transfer is blocked in `acquire`, nothing
+        is charged and the caller should ask again after the delay.
+
+        :param n: Number of bytes about to be read.
+        :param priority: Lower values are served first.
+        :return: (granted, seconds to wait).
+        """
+        with self._cond:
+            if not self.rate:
+                return True, 0.0
+            self._refill()
+            if self._waiters and self._waiters[0][0] < priority:
+                return False, min(n, self.burst) / self.rate
+            self._tokens -= n
+            return True, max(0.0, -self._tokens / self.rate)
+
+    def acquire(
+        self,
+        n: int,
+        priority: int = PRIORITY_INTERACTIVE,
+        cancel: Union[threading.Event, None] = None,
+    ) -> None:
+        """
+        Block until `n` bytes may be read.
+
+        :param n: Number of bytes about to be read.
+        :param priority: Lower values are served first.
+        :param cancel: Event that aborts the wait with DownloadAbortedError.
+        """
+        with self._cond:
+            if not self.rate:
+                return
+            entry = (priority, next(self._tickets))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise DownloadAbortedError
+                    if not self.rate:
+                        return
+                    self._refill()
+                    if self._waiters[0] == entry:
+                        # Requests larger than the bucket are granted once it is full and
+                        # paid for by going into debt, so they cannot wait forever
+                        if self._tokens >= min(n, self.burst):
+                            self._tokens -= n
+                            return
+                        timeout = (min(n, self.burst) - self._tokens) / self.rate
+                    else:
+                        timeout = None
+                    self._cond.wait(min(timeout, 0.25) if timeout else 0.25)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+_SCHEDULER = BandwidthScheduler()
+
+
+def get_scheduler() -> BandwidthScheduler:
+    """
+    Return the process-wide bandwidth scheduler.
+    """
+    return _SCHEDULER
@@ -0,0 +1,314 @@
+"""
+Segmented HTTP range downloader.
+
+A single HTTP connection to the stream servers tops out well below the available
+bandwidth for large streams. SegmentedDownloader splits the stream into byte ranges,
+fetches them concurrently and writes each one at its offset into a preallocated file.
+Args:
+    url (str): Direct URL of the stream.
+    path (str): Output file path.
+    size (int | None, optional): Expected size in bytes. Probed from the server when omitted.
+    segments (int, optional): Number of ranges fetched at the same time. Defaults to 4.
+    segment_size (int | None, optional): Size of each range in bytes. When omitted the
+        stream is split into `segments` equal ranges.
+    chunk_size (int, optional): Read size for each network read. Defaults to 64 KiB.
+    timeout (float, optional): Socket timeout in seconds. Defaults to 30.
+    headers (Dict[str, str] | None, optional): Extra request headers.
+    manifest (JobManifest | None, optional): Manifest recording per-range progress so an
+        interrupted download resumes from its byte offsets.
+    stream_id (str | None, optional): Key of the stream in the manifest.
+    cancel (threading.Event | None, optional): Aborts the transfer when set.
+    priority (int, optional): Bandwidth scheduler priority of the transfer.
+        Defaults to PRIORITY_INTERACTIVE.
+    pool (ConnectionPool | None, optional): Keep-alive pool the ranges are fetched through.
+    on_progress (Callable[[bytes, int], None] | None, optional): Called after every chunk
+        with the chunk and the number of bytes still missing.
+    retries (int, optional): Retries of a range after transient failures (throttling,
+        5xx, dropped connections), resuming at its last byte. Defaults to 4.
+    controller (AdaptiveController | None, optional): Per-host concurrency windows every
+        range request takes a slot of. Defaults to the process-wide controller.
+Methods:
+    download: Fetches all missing ranges, verifies the final size and returns it.
+"""
+
+import http.client
+import os
+import re
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+from Youtube.adaptive import (
+    AdaptiveController,
+    Transfer,
+    backoff_delay,
+    get_controller,
+    is_transient,
+)
+from Youtube.errors import DownloadError, DownloadAbortedError
+from Youtube.http_pool import ConnectionPool
+from Youtube.logic_helpers import wait_all
+from Youtube.logs import logging
+from Youtube.manifest import JobManifest
+from Youtube.scheduler import PRIORITY_INTERACTIVE, get_scheduler
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def open_range(
+    url: str,
+    start: int,
+    end: Union[int, None] = None,
+    headers: Union[Dict[str, str], None] = None,
+    timeout: float = 30,
+    pool: Union[ConnectionPool, None] = None,
+):
+    """
+    Open a ranged GET request for the inclusive byte range [start, end].
+
+    :param url: URL of the stream.
+    :param start: First byte offset.
+    :param end: Last byte offset, or None for the rest of the stream.
+    :param headers: Extra request headers.
+    :param timeout: Socket timeout in seconds.
+    :param pool: Keep-alive connection pool to send the request through; plain urllib
+        (which honours installed proxies) when None.
+    """
+    headers = {
+        **DEFAULT_HEADERS,
+        **(headers or {}),
+        "Range": f"bytes={start}-{'' if end is None else end}",
+    }
+    if pool is not None:
+        return pool.open(url, headers=headers, timeout=timeout)
+    request = urllib.request.Request(url, headers=headers)
+    return urllib.request.urlopen(request, timeout=timeout)  # nosec
+
+
+class SegmentedDownloader:
+    """Segmented Range Downloader"""
+
+    save_progress = True  # Write the manifest from the chunk loop (throttled by the manifest)
+
+    def __init__(
+        self,
+        url: str,
+        path: str,
+        size: Union[int, None] = None,
+        segments: int = 4,
+        segment_size: Union[int, None] = None,
+        chunk_size: int = 1 << 16,
+        timeout: float = 30,
+        headers: Union[Dict[str, str], None] = None,
+        manifest: Union[JobManifest, None] = None,
+        stream_id: Union[str, None] = None,
+        cancel: Union[threading.Event, None] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        pool: Union[ConnectionPool, None] = None,
+        on_progress: Union[Callable[[bytes, int], None], None] = None,
+        retries: int = 4,
+        controller: Union[AdaptiveController, None] = None,
+    ):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.segments = max(1, segments)
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.manifest = manifest
+        self.stream_id = stream_id if stream_id is not None else url
+        self.cancel = cancel or threading.Event()
+        self.priority = priority
+        self.pool = pool
+        self.on_progress = on_progress
+        self.retries = max(0, retries)
+        self.controller = controller or get_controller()
+        self.state: List[List[int]] = []
+        self._lock = threading.Lock()
+
+    def _request(self, start: int, end: int):
+        """
+        Open a ranged request for the inclusive byte range [start, end].
+
+        :param start: First byte offset.
+        :param end: Last byte offset.
+        """
+        return open_range(self.url, start, end, self.headers, self.timeout, self.pool)
+
+    def probe_size(self) -> int:
+        """
+        Ask the server for the total size of the stream with a one byte range request.
+        """
+        with self._request(0, 0) as response:
+            match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status != 206 or not match or match.group(3) == "*":
+                raise DownloadError(f"Server does not support range requests: {self.url}")
+            return int(match.group(3))
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """
+        Split the stream into inclusive byte ranges.
+        """
+        if self.segment_size:
+            step = self.segment_size
+        else:
+            step = -(-self.size // self.segments)  # Ceiling division
+        step = max(1, step)
+        return [
+            (start, min(start + step, self.size) - 1)
+            for start in range(0, self.size, step)
+        ]
+
+    def _resume_state(self) -> List[List[int]]:
+        """
+        Return [start, end, done] for every range.
+
+        Progress recorded in the manifest is reused when the partial file on disk still
+        matches it; otherwise the output file is preallocated and a fresh state recorded.
+        """
+        entry = self.manifest.stream(self.stream_id) if self.manifest else None
+        if (
+            entry
+            and entry["size"] == self.size
+            and entry["path"] == self.path
+            and os.path.exists(self.path)
+            and os.path.getsize(self.path) == self.size
+        ):
+            return entry["ranges"]
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)  # Preallocate so every range can seek to its offset
+        ranges = self.ranges()
+        if self.manifest:
+            return self.manifest.start_stream(self.stream_id, self.path, self.size, ranges)[
+                "ranges"
+            ]
+        return [[start, end, 0] for start, end in ranges]
+
+    def _fetch(self, index: int) -> None:
+        """
+        Fetch the missing part of one range, retrying transient failures.
+
+        Every attempt holds a slot of the host's adaptive window and resumes at the last
+        byte written, so a dropped connection or a throttled response only costs the
+        rest of the range, after a jittered backoff.
+
+        :param index: Index of the range in `self.state`.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.controller.slot(self.url, self.cancel) as transfer:
+                    self._fetch_range(index, transfer)
+                return
+            except Exception as e:  # pylint: disable = broad-exception-caught
+                delay = self._retry_delay(index, attempt, e)
+                attempt += 1
+                if self.cancel.wait(delay):
+                    raise DownloadAbortedError from e
+
+    def _retry_delay(self, index: int, attempt: int, error: Exception) -> float:
+        """
+        Return the backoff before retrying a failed range, or raise when it must not be.
+
+        :param index: Index of the range in `self.state`.
+        :param attempt: Retries of the range already made.
+        :param error: The error the attempt failed with.
+        """
+        if not is_transient(error) or self.cancel.is_set():
+            raise error
+        start, end, _ = self.state[index]
+        if attempt >= self.retries:
+            raise DownloadError(
+                f"Range {start}-{end} failed after {attempt + 1} attempts: {error}"
+            ) from error
+        delay = backoff_delay(attempt, error=error)
+        logging.warning(
+            f"Retrying range {start}-{end} of {self.stream_id} in {delay:.1f}s: {error}",
+            extra={"attempt": attempt + 1},
+        )
+        return delay
+
+    def _fetch_range(self, index: int, transfer: Transfer) -> None:
+        """
+        Fetch the missing part of one range and write it at its offset in the output file.
+
+        :param index: Index of the range in `self.state`.
+        :param transfer: Slot of the request; receives the bytes read.
+        """
+        start, end, done = self.state[index]
+        expected = end - start + 1
+        if done >= expected:
+            return
+        with self._request(start + done, end) as response, self._writer(start + done) as write:
+            if response.status != 206:
+                raise DownloadError(
+                    f"Expected partial content for bytes {start + done}-{end}, got HTTP {response.status}"
+                )
+            while done < expected:
+                if self.cancel.is_set():
+                    raise DownloadAbortedError
+                want = min(self.chunk_size, expected - done)
+                get_scheduler().acquire(want, self.priority, self.cancel)
+                chunk = response.read(want)
+                if not chunk:
+                    break
+                write(chunk)
+                done += len(chunk)
+                transfer.received += len(chunk)
+                self._set_done(index, done, chunk)
+        if done != expected:
+            # The server closed early; retried from `done`
+            raise http.client.IncompleteRead(b"", expected - done)
+
+    @contextmanager
+    def _writer(self, offset: int) -> Iterator[Callable[[bytes], None]]:
+        """
+        Yield a function that writes chunks to the output, starting at `offset`.
+
+        :param offset: Byte offset of the first chunk.
+        """
+        # Unbuffered so the progress recorded in the manifest never runs ahead of the file
+        with open(self.path, "r+b", buffering=0) as f:
+            f.seek(offset)
+            yield f.write
+
+    def _set_done(self, index: int, done: int, chunk: bytes) -> None:
+        with self._lock:
+            self.state[index][2] = done
+            remaining = self.size - sum(r[2] for r in self.state)
+        if self.manifest:
+            self.manifest.update_range(self.stream_id, index, done, save=self.save_progress)
+        if self.on_progress:
+            self.on_progress(chunk, remaining)
+
+    def download(self) -> int:
+        """
+        Download the stream into `self.path` and verify its final size.
+
+        :return: Number of bytes written.
+        """
+        if self.size is None:
+            self.size = self.probe_size()
+        self.state = self._resume_state()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(self.segments, len(self.state) or 1)
+            ) as pool:
+                wait_all(
+                    [pool.submit(self._fetch, index) for index in range(len(self.state))],
+                    self.cancel,
+                )
+        finally:
+            if self.manifest:
+                self.manifest.save(force=True)
+        written = sum(r[2] for r in self.state)
+        actual = os.path.getsize(self.path)
+        if written != self.size or actual != self.size:
+            raise DownloadError(
+                f"Size mismatch for {self.path}: expected {self.size}, got {actual}"
+            )
+        return self.size
@@ -0,0 +1,151 @@
+"""
+Per-job staging areas for downloads.
+
+Every download stages its partial streams, manifest and merge output in a directory of
+its own, named after the video, type and resolution, so concurrent jobs never touch each
+other's files and an interrupted job finds its partial files again. Only one job per
+directory may run at a time in a process. Finished files are moved into the download
+folder with an atomic rename, so readers never see a half-written output.
+The default staging root is `<app_path>/tmp`, on the same filesystem as the outputs, so
+the final move is a plain rename. Small jobs can stage in RAM instead (tmpfs such as
+/dev/shm) and skip the disk entirely until their output is committed; files staged on
+another filesystem are copied next to their destination under a hidden name first and
+then renamed.
+Before a job starts, the expected stream sizes are checked against the free space of the
+staging and destination filesystems.
+Args:
+    root (str): Directory the job directory is created in.
+    key (str): Name of the job directory.
+Methods:
+    claim: Checks the free space, creates the directory and marks the job as running.
+    release: Marks the job as no longer running.
+    commit_file: Atomically moves a finished file to its destination.
+    ram_root: Returns the RAM-backed staging root of the platform, if any.
+    check_free_space: Raises InsufficientSpaceError when a filesystem lacks room.
+"""
+
+import os
+import shutil
+import threading
+from typing import Set, Union
+from Youtube.errors import InsufficientSpaceError, JobInProgressError, _FileExistsError
+
+RAM_ROOTS = ["/dev/shm"]
+SPACE_RESERVE = 64 << 20  # Bytes left free on every filesystem a job writes to
+
+_ACTIVE: Set[str] = set()
+_ACTIVE_LOCK = threading.Lock()
+
+
+def ram_root() -> Union[str, None]:
+    """
+    Return a writable RAM-backed directory to stage in, or None when there is none.
+    """
+    for root in RAM_ROOTS:
+        if os.path.isdir(root) and os.access(root, os.W_OK):
+            return os.path.join(root, "yt-staging")
+    return None
+
+
+def _existing_parent(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def free_space(path: str) -> int:
+    """
+    Return the free bytes of the filesystem `path` is (or will be) on.
+
+    :param path: A file or directory, which need not exist yet.
+    """
+    return shutil.disk_usage(_existing_parent(path)).free
+
+
+def same_filesystem(a: str, b: str) -> bool:
+    """
+    Whether two paths, which need not exist yet, are on the same filesystem.
+    """
+    return os.stat(_existing_parent(a)).st_dev == os.stat(_existing_parent(b)).st_dev
+
+
+def check_free_space(path: str, needed: int) -> None:
+    """
+    Raise InsufficientSpaceError unless `needed` bytes plus the reserve fit at `path`.
+
+    :param path: A file or directory on the filesystem to check.
+    :param needed: Bytes the job will write there.
+    """
+    if needed <= 0:
+        return
+    free = free_space(path)
+    if free < needed + SPACE_RESERVE:
+        raise InsufficientSpaceError(
+            f"{needed / (1 << 20):.1f} MiB needed at {path}, {free / (1 << 20):.1f} MiB free"
+        )
+
+
+def commit_file(src: str, dest: str) -> None:
+    """
+    Move a finished file to `dest` so that `dest` appears complete or not at all.
+
+    :param src: The staged file.
+    :param dest: Its final path, which must not exist yet.
+    """
+    if os.path.exists(dest):
+        raise _FileExistsError
+    if same_filesystem(src, dest):
+        os.replace(src, dest)
+        return
+    # Across filesystems a rename is impossible: copy next to the destination, then rename
+    part = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.part")
+    try:
+        shutil.copyfile(src, part)
+        os.replace(part, dest)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    os.remove(src)
+
+
+class StagingArea:
+    """Per-Job Staging Directory"""
+
+    def __init__(self, root: str, key: str):
+        self.root = root
+        self.key = key
+        self.path = os.path.join(root, key)
+        self._claimed = False
+
+    def claim(self, needed: int = 0) -> "StagingArea":
+        """
+        Check the free space, create the directory and mark the job as running.
+
+        :param needed: Bytes the job will stage.
+        :return: self.
+        """
+        check_free_space(self.root, needed)
+        with _ACTIVE_LOCK:
+            if self.path in _ACTIVE:
+                raise JobInProgressError(f"{self.key} is already being downloaded")
+            _ACTIVE.add(self.path)
+        self._claimed = True
+        try:
+            os.makedirs(self.path, exist_ok=True)
+        except OSError:
+            self.release()
+            raise
+        return self
+
+    def release(self) -> None:
+        """
+        Mark the job as no longer running; its files are kept for a later resume.
+        """
+        if self._claimed:
+            with _ACTIVE_LOCK:
+                _ACTIVE.discard(self.path)
+            self._claimed = False
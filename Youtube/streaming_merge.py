@@ -0,0 +1,263 @@
+"""
+Streaming merge of audio and video streams.
+
+Instead of writing both streams to tmp files and having ffmpeg read them back,
+StreamingMerger starts ffmpeg on two named pipes (FIFOs) and feeds the stream bytes into
+them while they download, so muxing runs alongside the transfer and the intermediate
+files never touch the disk.
+Streaming needs containers that can be muxed front to back. `can_stream` peeks at the
+first bytes of both streams and refuses layouts that need seeking (an MP4 whose `moov`
+box comes after `mdat`), in which case callers keep the temp-file merge.
+Each stream is fed by a FifoDownloader, a single-range SegmentedDownloader, so it holds a
+slot of the host's adaptive window, reports progress, and resumes at the last byte
+written after a transient failure; that byte is exactly where ffmpeg stopped reading.
+Args:
+    work_dir (str): Directory the FIFOs are created in.
+    out_path (str): Path of the merged output file.
+    chunk_size (int, optional): Bytes read from the network per write. Defaults to 64 KiB.
+    timeout (float, optional): Socket timeout in seconds. Defaults to 30.
+    cancel (threading.Event | None, optional): Aborts the merge when set.
+    priority (int, optional): Bandwidth scheduler priority of the transfers.
+    pool (ConnectionPool | None, optional): Keep-alive pool the streams are fetched through.
+    on_progress (Callable[[str, bytes, int], None] | None, optional): Called with the
+        stream URL, the chunk and the bytes remaining of that stream.
+    retries (int, optional): Retries of a stream after transient failures. Defaults to 4.
+    controller (AdaptiveController | None, optional): Per-host windows. Defaults to the
+        process-wide controller.
+Methods:
+    merge: Streams both URLs into ffmpeg and waits for the output.
+    FifoDownloader: Writes one stream front to back into a FIFO.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Union
+from Youtube.adaptive import AdaptiveController
+from Youtube.errors import DownloadAbortedError, FFmpegError
+from Youtube.http_pool import ConnectionPool
+from Youtube.logic_helpers import wait_all
+from Youtube.scheduler import PRIORITY_INTERACTIVE
+from Youtube.segmented import SegmentedDownloader, open_range
+
+PEEK_SIZE = 1 << 16
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"  # WebM/Matroska header
+
+
+def streaming_supported() -> bool:
+    """
+    Whether the platform provides named pipes for streaming merges.
+    """
+    return hasattr(os, "mkfifo")
+
+
+def needs_seeking(head: bytes) -> bool:
+    """
+    Inspect the first bytes of a stream and decide whether ffmpeg must seek to read it.
+
+    WebM is always readable front to back. For MP4 the top-level boxes are walked: if
+    `moov` (the index) comes before `mdat` (the media data) the file can be streamed.
+    Anything unrecognised is treated as needing seeking.
+
+    :param head: First bytes of the stream.
+    """
+    if head[:4] == EBML_MAGIC:
+        return False
+    offset = 0
+    while offset + 8 <= len(head):
+        size = int.from_bytes(head[offset : offset + 4], "big")
+        box = head[offset + 4 : offset + 8]
+        if size == 1 and offset + 16 <= len(head):
+            size = int.from_bytes(head[offset + 8 : offset + 16], "big")
+        if box == b"moov":
+            return False
+        if box == b"mdat" or size < 8:
+            return True
+        offset += size
+    return True
+
+
+def can_stream(
+    video_url: str,
+    audio_url: str,
+    timeout: float = 30,
+    pool: Union[ConnectionPool, None] = None,
+) -> bool:
+    """
+    Check that streaming is available and both streams have a streamable layout.
+
+    :param video_url: URL of the video stream.
+    :param audio_url: URL of the audio stream.
+    :param timeout: Socket timeout in seconds.
+    :param pool: Keep-alive connection pool for the peek requests.
+    """
+    if not streaming_supported():
+        return False
+    for url in (video_url, audio_url):
+        with open_range(url, 0, PEEK_SIZE - 1, timeout=timeout, pool=pool) as response:
+            if needs_seeking(response.read(PEEK_SIZE)):
+                return False
+    return True
+
+
+class FifoDownloader(SegmentedDownloader):
+    """
+    SegmentedDownloader writing a stream front to back into an open FIFO.
+
+    A FIFO cannot seek, so the stream is a single range with no manifest; retries resume
+    at the last byte written.
+    """
+
+    def __init__(self, url: str, fd: int, **options):
+        super().__init__(url, "", segments=1, segment_size=None, manifest=None, **options)
+        self.fd = fd
+
+    def _resume_state(self) -> List[List[int]]:
+        return [[0, self.size - 1, 0]]
+
+    @contextmanager
+    def _writer(self, offset: int) -> Iterator[Callable[[bytes], None]]:
+        def write(chunk: bytes) -> None:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(self.fd, view) :]
+
+        yield write
+
+    def download(self) -> int:
+        if self.size is None:
+            self.size = self.probe_size()
+        self.state = self._resume_state()
+        self._fetch(0)
+        return self.size
+
+
+class StreamingMerger:
+    """Streaming FFmpeg Merger"""
+
+    def __init__(
+        self,
+        work_dir: str,
+        out_path: str,
+        chunk_size: int = 1 << 16,
+        timeout: float = 30,
+        cancel: Union[threading.Event, None] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        pool: Union[ConnectionPool, None] = None,
+        on_progress: Union[Callable[[str, bytes, int], None], None] = None,
+        retries: int = 4,
+        controller: Union[AdaptiveController, None] = None,
+    ):
+        self.work_dir = work_dir
+        self.out_path = out_path
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.cancel = cancel or threading.Event()
+        self.priority = priority
+        self.pool = pool
+        self.on_progress = on_progress
+        self.retries = retries
+        self.controller = controller
+        self.sizes: Dict[str, int] = {}  # Bytes fed per stream URL
+        self.process = None
+
+    def _open_fifo(self, path: str) -> int:
+        """
+        Open a FIFO for writing without blocking forever if ffmpeg never opens it.
+
+        :param path: Path of the FIFO.
+        """
+        while True:
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+                os.set_blocking(fd, True)
+                return fd
+            except OSError:  # ENXIO until ffmpeg opens the read end
+                if self.process.poll() is not None:
+                    raise FFmpegError("ffmpeg exited before reading its inputs")
+                if self.cancel.is_set():
+                    raise DownloadAbortedError
+                time.sleep(0.05)
+
+    def _feed(self, url: str, fifo: str, size: Union[int, None]) -> None:
+        """
+        Download a stream front to back into a FIFO.
+
+        :param url: URL of the stream.
+        :param fifo: Path of the FIFO ffmpeg reads from.
+        :param size: Size of the stream in bytes; probed when None.
+        """
+        fd = self._open_fifo(fifo)
+        try:
+            self.sizes[url] = FifoDownloader(
+                url,
+                fd,
+                size=size,
+                chunk_size=self.chunk_size,
+                timeout=self.timeout,
+                cancel=self.cancel,
+                priority=self.priority,
+                pool=self.pool,
+                on_progress=partial(self.on_progress, url) if self.on_progress else None,
+                retries=self.retries,
+                controller=self.controller,
+            ).download()
+        finally:
+            os.close(fd)
+
+    def merge(
+        self,
+        video_url: str,
+        audio_url: str,
+        video_size: Union[int, None] = None,
+        audio_size: Union[int, None] = None,
+    ) -> None:
+        """
+        Stream both URLs into ffmpeg and wait for the merged output.
+
+        :param video_url: URL of the video stream.
+        :param audio_url: URL of the audio stream.
+        :param video_size: Size of the video stream, if known.
+        :param audio_size: Size of the audio stream, if known.
+        """
+        import ffmpeg  # pylint: disable = import-outside-toplevel
+
+        v_fifo = os.path.join(self.work_dir, "video.fifo")
+        a_fifo = os.path.join(self.work_dir, "audio.fifo")
+        for fifo in (v_fifo, a_fifo):
+            if os.path.exists(fifo):
+                os.remove(fifo)
+            os.mkfifo(fifo)
+        output = ffmpeg.output(
+            ffmpeg.input(v_fifo),
+            ffmpeg.input(a_fifo),
+            self.out_path,
+            vcodec="copy",
+            acodec="copy",
+            loglevel="quiet",
+        )
+        self.process = ffmpeg.run_async(output, overwrite_output=True)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                wait_all(
+                    [
+                        pool.submit(self._feed, video_url, v_fifo, video_size),
+                        pool.submit(self._feed, audio_url, a_fifo, audio_size),
+                    ],
+                    self.cancel,
+                )
+            if self.process.wait() != 0:
+                raise FFmpegError(f"ffmpeg exited with code {self.process.returncode}")
+        except BaseException:
+            self.process.kill()
+            self.process.wait()
+            if os.path.exists(self.out_path):
+                os.remove(self.out_path)  # Never leave a half-muxed file behind
+            raise
+        finally:
+            for fifo in (v_fifo, a_fifo):
+                if os.path.exists(fifo):
+                    os.remove(fifo)
@@ -0,0 +1,217 @@
+"""
+Plain description of a downloadable stream.
+
+StreamInfo holds the fields the download logic needs from a pytubefix Stream. Unlike a
+Stream it does not reference its YouTube object, so it can be cached on disk and
+rebuilt without a network round-trip.
+`plan_streams` chooses which streams to fetch for a download: it ranks the candidate
+plans by closeness to the requested resolution, whether ffmpeg can stream-copy them into
+the MP4 output, and the bytes to transfer plus the cost of a merge, so a progressive
+(already muxed) stream is taken whenever it gives the same result without a merge.
+Methods:
+    from_stream: Builds a StreamInfo from a pytubefix Stream.
+    to_dict / from_dict: JSON friendly conversion used by the metadata cache.
+    expires_at: Expiry timestamp of the signed stream URL, if it carries one.
+    plan_streams: Picks the cheapest StreamPlan for a download type and resolution.
+"""
+
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, List, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class StreamInfo:
+    """Stream Description"""
+
+    itag: int
+    url: str
+    mime_type: str
+    filesize: Union[int, None] = None
+    resolution: Union[str, None] = None
+    abr: Union[str, None] = None
+    fps: Union[int, None] = None
+    video_codec: Union[str, None] = None
+    audio_codec: Union[str, None] = None
+    is_progressive: bool = False
+    includes_audio: bool = False
+    includes_video: bool = False
+
+    @property
+    def subtype(self) -> str:
+        return self.mime_type.split("/")[-1]
+
+    @property
+    def is_audio_only(self) -> bool:
+        return self.includes_audio and not self.includes_video
+
+    @classmethod
+    def from_stream(cls, stream: Any) -> "StreamInfo":
+        """
+        Build a StreamInfo from a pytubefix Stream without triggering a size request.
+
+        :param stream: pytubefix Stream object.
+        """
+        return cls(
+            itag=int(stream.itag),
+            url=stream.url,
+            mime_type=stream.mime_type,
+            # `_filesize` comes from the stream metadata; `filesize` would issue a HEAD request
+            filesize=getattr(stream, "_filesize", None) or None,
+            resolution=getattr(stream, "resolution", None),
+            abr=getattr(stream, "abr", None),
+            fps=getattr(stream, "fps", None),
+            video_codec=getattr(stream, "video_codec", None),
+            audio_codec=getattr(stream, "audio_codec", None),
+            is_progressive=bool(stream.is_progressive),
+            includes_audio=bool(stream.includes_audio_track),
+            includes_video=bool(stream.includes_video_track),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StreamInfo":
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def expires_at(self) -> Union[float, None]:
+        """
+        Return the expiry timestamp signed into the stream URL, or None if absent.
+        """
+        expire = parse_qs(urlparse(self.url).query).get("expire")
+        try:
+            return float(expire[0]) if expire else None
+        except ValueError:
+            return None
+
+
+# A merge re-reads and re-writes both streams; price it as a share of the bytes plus a
+# fixed ffmpeg start-up cost, in bytes-equivalent
+MERGE_OVERHEAD = 0.1
+MERGE_FIXED_COST = 4 * 1024 * 1024
+# Codecs ffmpeg can stream-copy into an .mp4 output without re-encoding
+MP4_VIDEO_CODECS = ("avc1", "av01", "hev1", "hvc1")
+MP4_AUDIO_CODECS = ("mp4a",)
+
+
+@dataclass
+class StreamPlan:
+    """Streams chosen for a download and why."""
+
+    video: Union[StreamInfo, None]
+    audio: Union[StreamInfo, None]
+    cost: float
+    reason: str = ""
+
+    @property
+    def needs_merge(self) -> bool:
+        return self.video is not None and self.audio is not None
+
+    @property
+    def resolution(self) -> Union[str, None]:
+        return self.video.resolution if self.video else None
+
+    def describe(self) -> str:
+        parts = [
+            f"{s.resolution or s.abr or ''} itag {s.itag}".strip()
+            for s in (self.video, self.audio)
+            if s is not None
+        ]
+        kind = "merge" if self.needs_merge else (
+            "progressive" if self.video and self.video.is_progressive else "single"
+        )
+        transfer = _bytes(*(s for s in (self.video, self.audio) if s is not None))
+        size = f"{transfer / (1 << 20):.1f} MB" if transfer < float("inf") else "size unknown"
+        return f"{kind} {' + '.join(parts)} ({size})"
+
+
+def _height(resolution: Union[str, None]) -> int:
+    digits = "".join(c for c in resolution or "" if c.isdigit())
+    return int(digits) if digits else 0
+
+
+def _abr(stream: StreamInfo) -> int:
+    digits = "".join(c for c in stream.abr or "" if c.isdigit())
+    return int(digits) if digits else 0
+
+
+def _copyable(stream: StreamInfo) -> bool:
+    """Whether ffmpeg can stream-copy the stream into an MP4 container."""
+    codecs = [c for c in (stream.video_codec, stream.audio_codec) if c]
+    if not codecs:
+        return stream.subtype == "mp4"
+    allowed = MP4_VIDEO_CODECS + MP4_AUDIO_CODECS
+    return all(codec.startswith(allowed) for codec in codecs)
+
+
+def _bytes(*streams: StreamInfo) -> float:
+    sizes = [s.filesize for s in streams]
+    return float("inf") if None in sizes else float(sum(sizes))
+
+
+def _best_audio(infos: List[StreamInfo]) -> Union[StreamInfo, None]:
+    """Highest bitrate audio-only stream, preferring ones that copy into MP4."""
+    audio_only = [s for s in infos if s.is_audio_only]
+    return max(audio_only, key=lambda s: (_copyable(s), _abr(s)), default=None)
+
+
+def plan_streams(infos: List[StreamInfo], _type: int, resolution: str) -> StreamPlan:
+    """
+    Pick the streams to fetch for a download.
+
+    Candidates are ranked by, in order: distance from the requested resolution (lower
+    first on ties), whether ffmpeg can stream-copy them into MP4, and the bytes to
+    transfer plus the merge cost. A missing resolution therefore falls back to the
+    closest one instead of downloading nothing.
+
+    :param infos: Stream manifest of the video.
+    :param _type: Type of download (1: audio, 2: video, 3: both).
+    :param resolution: Requested resolution label, e.g. "720p".
+    :return: The cheapest plan, with the reason it was chosen.
+    :raises LookupError: If the manifest has no usable stream for the type.
+    """
+    if _type == 1:
+        audio = _best_audio(infos)
+        if audio is None:
+            raise LookupError("No audio stream available")
+        plan = StreamPlan(None, audio, _bytes(audio))
+        plan.reason = f"{plan.describe()}: highest bitrate audio"
+        return plan
+
+    wanted = _height(resolution)
+    candidates: List[Tuple[Tuple, StreamPlan]] = []
+    audio = _best_audio(infos) if _type == 3 else None
+    for stream in infos:
+        if not stream.includes_video:
+            continue
+        if _type == 3 and stream.is_progressive:
+            plan = StreamPlan(stream, None, _bytes(stream))
+            copyable = _copyable(stream)
+        elif _type == 3:
+            if audio is None:
+                continue
+            transfer = _bytes(stream, audio)
+            plan = StreamPlan(stream, audio, transfer * (1 + MERGE_OVERHEAD) + MERGE_FIXED_COST)
+            copyable = _copyable(stream) and _copyable(audio)
+        else:
+            plan = StreamPlan(stream, None, _bytes(stream))
+            copyable = _copyable(stream)
+        height = _height(stream.resolution)
+        rank = (abs(height - wanted), height > wanted, not copyable, plan.cost)
+        candidates.append((rank, plan))
+    if not candidates:
+        raise LookupError("No video stream available")
+    candidates.sort(key=lambda candidate: candidate[0])
+    best = candidates[0][1]
+    reasons = []
+    if best.resolution != resolution:
+        reasons.append(f"{resolution} unavailable, closest is {best.resolution}")
+    runner_up = next(
+        (plan for _, plan in candidates[1:] if plan.resolution == best.resolution), None
+    )
+    if runner_up is not None:
+        reasons.append(f"preferred over {runner_up.describe()}")
+    best.reason = f"{best.describe()}" + (f": {'; '.join(reasons)}" if reasons else "")
+    return best
@@ -0,0 +1,162 @@
+"""
+Thumbnail fetching and caching for previews.
+
+Thumbnails come straight from the image CDN (`i.ytimg.com/vi/<id>/hqdefault.jpg`), which
+needs no metadata request, so a preview costs one small image fetch. The GUI decodes and
+downscales them to the view size on a worker thread; ThumbnailCache keeps the results in
+two layers:
+    memory: decoded images, bounded by their total size in bytes and evicted least
+        recently used first, so repeat previews are instant and memory stays flat.
+    disk: the downscaled images re-encoded as JPEG under `<root>/<id>_<w>x<h>.jpg`,
+        bounded by `max_bytes` and evicted by modification time through the same
+        DiskBudget as the metadata cache.
+Args:
+    root (str, optional): Cache directory. Defaults to `APP_PATH/.cache/thumbnails`.
+    max_bytes (int, optional): Size bound of the disk layer. Defaults to 32 MiB.
+    memory_bytes (int, optional): Size bound of the memory layer. Defaults to 16 MiB.
+Methods:
+    thumbnail_url: Returns the CDN URL of a video's thumbnail.
+    fetch_thumbnail: Downloads the original thumbnail bytes.
+    get_thumbnail_cache: The process-wide cache.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple, Union
+from Youtube.cache import DiskBudget
+from Youtube.http_pool import ConnectionPool, get_pool
+from Youtube.logic_helpers import APP_PATH
+
+THUMBNAIL_URL = "https://i.ytimg.com/vi/{video_id}/{quality}.jpg"
+
+
+def thumbnail_url(video_id: str, quality: str = "hqdefault") -> str:
+    """
+    Return the CDN URL of a video thumbnail.
+
+    :param video_id: ID of the video.
+    :param quality: Image variant, e.g. "hqdefault" (480x360) or "mqdefault" (320x180).
+    """
+    return THUMBNAIL_URL.format(video_id=video_id, quality=quality)
+
+
+def fetch_thumbnail(
+    video_id: str, pool: Union[ConnectionPool, None] = None, timeout: float = 10
+) -> bytes:
+    """
+    Download the original thumbnail of a video.
+
+    :param video_id: ID of the video.
+    :param pool: Keep-alive pool the request goes through. Defaults to the process-wide one.
+    :param timeout: Socket timeout in seconds.
+    """
+    with (pool or get_pool()).open(thumbnail_url(video_id), timeout=timeout) as response:
+        return response.read()
+
+
+class ThumbnailCache:
+    """Memory and Disk Thumbnail Cache"""
+
+    def __init__(
+        self,
+        root: str = os.path.join(APP_PATH, ".cache", "thumbnails"),
+        max_bytes: int = 32 * 1024 * 1024,
+        memory_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memo: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self._memo_size = 0
+        self._lock = threading.Lock()
+        self._budget = DiskBudget(root, ".jpg", max_bytes)
+
+    @staticmethod
+    def _key(video_id: str, size: Tuple[int, int]) -> Tuple:
+        return (video_id, int(size[0]), int(size[1]))
+
+    def _path(self, video_id: str, size: Tuple[int, int]) -> str:
+        return os.path.join(self.root, f"{video_id}_{int(size[0])}x{int(size[1])}.jpg")
+
+    def get(self, video_id: str, size: Tuple[int, int]) -> Any:
+        """
+        Return the decoded image from memory, or None.
+
+        :param video_id: ID of the video.
+        :param size: (width, height) the image was scaled to.
+        """
+        key = self._key(video_id, size)
+        with self._lock:
+            if key not in self._memo:
+                return None
+            self._memo.move_to_end(key)
+            return self._memo[key][0]
+
+    def remember(self, video_id: str, size: Tuple[int, int], image: Any, cost: int) -> None:
+        """
+        Keep a decoded image in memory, evicting the least recently used ones over budget.
+
+        :param video_id: ID of the video.
+        :param size: (width, height) the image was scaled to.
+        :param image: The decoded image (e.g. a QImage).
+        :param cost: Its size in bytes.
+        """
+        key = self._key(video_id, size)
+        with self._lock:
+            if key in self._memo:
+                self._memo_size -= self._memo.pop(key)[1]
+            self._memo[key] = (image, cost)
+            self._memo_size += cost
+            while self._memo_size > self.memory_bytes and len(self._memo) > 1:
+                _, (_, evicted) = self._memo.popitem(last=False)
+                self._memo_size -= evicted
+
+    def read(self, video_id: str, size: Tuple[int, int]) -> Union[bytes, None]:
+        """
+        Return the encoded, downscaled image from disk, or None.
+
+        :param video_id: ID of the video.
+        :param size: (width, height) the image was scaled to.
+        """
+        path = self._path(video_id, size)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            return None
+        return data
+
+    def write(self, video_id: str, size: Tuple[int, int], data: bytes) -> None:
+        """
+        Store an encoded, downscaled image on disk.
+
+        :param video_id: ID of the video.
+        :param size: (width, height) the image was scaled to.
+        :param data: The encoded image.
+        """
+        path = self._path(video_id, size)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            self._budget.replace(tmp_path, path)
+        except OSError:
+            pass  # Previews work without the disk layer
+
+
+_CACHE: Union[ThumbnailCache, None] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """
+    Return the process-wide thumbnail cache.
+    """
+    global _CACHE  # pylint: disable = global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ThumbnailCache()
+        return _CACHE
@@ -0,0 +1,136 @@
+"""
+Offline YouTube URL validation and canonicalization.
+
+Everything here is string work on precompiled patterns: no metadata request, no pytubefix
+import. A URL is accepted when it is on a YouTube host (youtube.com, m., music.,
+youtube-nocookie.com, youtu.be) and carries a video ID (watch, youtu.be, shorts, embed,
+live) and/or a playlist ID (`list=`); a bare 11-character video ID is accepted too.
+Canonical forms are `https://www.youtube.com/watch?v=<id>` and
+`https://www.youtube.com/playlist?list=<id>`, so the same video typed in different ways
+deduplicates to one entry.
+Methods:
+    parse_url: Validates a URL and returns its IDs, raising InvalidURLError.
+    video_id / playlist_id: Return the ID in a URL, or None.
+    watch_url / playlist_url: Build canonical URLs.
+    canonicalize: Validates a batch, dropping duplicates and reporting rejected URLs.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple, Union
+from Youtube.errors import InvalidURLError
+
+HOST = re.compile(
+    r"^(?:https?://)?(?:(?:www|m|music)\.)?(?:youtube\.com|youtube-nocookie\.com|youtu\.be)"
+    r"(?=[/?#]|$)",
+    re.IGNORECASE,
+)
+BARE_VIDEO_ID = re.compile(r"^[\w-]{11}$")
+# Hosts are case-insensitive, query keys and paths are not
+VIDEO_ID = re.compile(
+    r"(?:[?&]v=|(?i:youtu\.be)/|/(?:embed|shorts|v|e|live)/)([\w-]{11})(?![\w-])"
+)
+PLAYLIST_ID = re.compile(r"[?&]list=([\w-]{2,})")
+
+
+@dataclass(frozen=True)
+class YouTubeURL:
+    """A validated YouTube URL."""
+
+    url: str
+    video_id: Union[str, None] = None
+    playlist_id: Union[str, None] = None
+
+    @property
+    def watch_url(self) -> Union[str, None]:
+        return watch_url(self.video_id) if self.video_id else None
+
+    @property
+    def playlist_url(self) -> Union[str, None]:
+        return playlist_url(self.playlist_id) if self.playlist_id else None
+
+
+def watch_url(video_id: str) -> str:
+    """
+    Return the canonical watch URL of a video.
+    """
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def playlist_url(playlist_id: str) -> str:
+    """
+    Return the canonical URL of a playlist.
+    """
+    return f"https://www.youtube.com/playlist?list={playlist_id}"
+
+
+def parse_url(url: str) -> YouTubeURL:
+    """
+    Validate a URL and extract its video and playlist IDs.
+
+    :param url: URL as typed, or a bare video ID.
+    :raises InvalidURLError: When it is not a YouTube URL or carries no ID.
+    """
+    text = url.strip()
+    if BARE_VIDEO_ID.match(text):
+        return YouTubeURL(text, video_id=text)
+    if not HOST.match(text):
+        raise InvalidURLError(f"Not a YouTube URL: {url}")
+    video = VIDEO_ID.search(text)
+    playlist = PLAYLIST_ID.search(text)
+    if not (video or playlist):
+        raise InvalidURLError(f"No video or playlist ID in {url}")
+    return YouTubeURL(
+        text,
+        video_id=video.group(1) if video else None,
+        playlist_id=playlist.group(1) if playlist else None,
+    )
+
+
+def video_id(url: str) -> Union[str, None]:
+    """
+    Return the video ID in a URL, or None when it is invalid or has none.
+    """
+    try:
+        return parse_url(url).video_id
+    except InvalidURLError:
+        return None
+
+
+def playlist_id(url: str) -> Union[str, None]:
+    """
+    Return the playlist ID in a URL, or None when it is invalid or has none.
+    """
+    try:
+        return parse_url(url).playlist_id
+    except InvalidURLError:
+        return None
+
+
+def canonicalize(
+    urls: Iterable[str], playlists: bool = False
+) -> Tuple[List[YouTubeURL], List[Tuple[str, str]]]:
+    """
+    Validate a batch of URLs and drop the ones pointing at an item already seen.
+
+    :param urls: URLs as typed.
+    :param playlists: Identify entries by playlist ID instead of video ID.
+    :return: The unique URLs in input order, and (url, reason) for every rejected one.
+    """
+    unique, rejected, seen = [], [], set()
+    for url in urls:
+        try:
+            parsed = parse_url(url)
+        except InvalidURLError as e:
+            rejected.append((url, str(e)))
+            continue
+        key = parsed.playlist_id if playlists else parsed.video_id
+        if key is None:
+            kind = "playlist" if playlists else "video"
+            rejected.append((url, f"No {kind} ID in {url}"))
+        elif key in seen:
+            rejected.append((url, f"Duplicate of {key}"))
+        else:
+            seen.add(key)
+            unique.append(parsed)
+    return unique, rejected
@@ -8,29 +8,63 @@ Args:
     use_oauth (bool, optional): Whether to use OAuth for authentication. Defaults to False.
     allow_oauth_cache (bool, optional): Whether to allow caching of OAuth tokens. Defaults to True.
     token_file (str | None, optional): The file path to store the OAuth token.
+    max_workers (int, optional): Number of videos downloaded at the same time. Defaults to 4.
+    merge_workers (int | None, optional): Number of ffmpeg merges run at the same time, in
+        separate processes. Defaults to the CPU count.
+    segments (int, optional): Number of byte ranges fetched concurrently per stream. Defaults to 1.
+    streaming_merge (bool, optional): Pipe merged downloads straight into ffmpeg. Defaults to False.
+    cancel (threading.Event | None, optional): Stops the playlist download when set.
+Construction only validates the URL offline; the title is fetched and the playlist folders
+created when the download starts.
 Methods:
     _create_directories: Creates necessary directories for storing downloads.
-    download_playlist: Downloads videos from the playlist based on specified _type and resolution.
-    _extract_links: Extracts video URLs from the playlist.
+    download_playlist: Downloads videos from the playlist concurrently and returns a per-item report.
+    iter_video_urls: Yields video URLs page by page as the playlist is enumerated.
     empty_folder: Removes all files and subdirectories in the specified folder.
 """
 
 import os
 import shutil
-import re
-from typing import Union, Dict
+import threading
+import time
+from dataclasses import dataclass
+from typing import Union, Dict, Iterator, List, Tuple
 from pytubefix import Playlist
 from Youtube.errors import (
+    DownloadAbortedError,
     InvalidURLError,
     DirectoryCreationError,
     DownloadError,
     FailedDirectoryEmptyError,
 )
-from Youtube.logs import log_setup
+from Youtube.logs import log_context, log_setup, logging
+from Youtube import urls
+from Youtube.archive import archive_resolution, get_archive
+from Youtube.http_pool import install_pytubefix_hook
+from Youtube.manifest import JobManifest, PlaylistIndex
+from Youtube.pipeline import DownloadPipeline
+from Youtube.scheduler import PRIORITY_BACKGROUND
 from Youtube.yt_vid_logic import YT
-from Youtube.logic_helpers import APP_PATH, handle_errors, sanitize_filename
+from Youtube.logic_helpers import (
+    APP_PATH,
+    describe_error,
+    handle_errors,
+    resolution_label,
+    sanitize_filename,
+)
+
+
+@dataclass
+class ItemResult:
+    """Outcome of downloading a single playlist entry."""
 
-log_setup()
+    index: int
+    url: str
+    ok: bool
+    title: str = ""
+    error: str = ""
+    elapsed: float = 0.0
+    skipped: bool = False
 
 
 class PL(Playlist):
@@ -47,17 +81,52 @@ class PL(Playlist):
         use_oauth: bool = False,
         allow_oauth_cache: bool = True,
         token_file: Union[str, None] = None,
+        max_workers: int = 4,
+        merge_workers: Union[int, None] = None,
+        segments: int = 1,
+        streaming_merge: bool = False,
+        cancel: Union[threading.Event, None] = None,
     ):
-        super().__init__(url, client, proxies, use_oauth, allow_oauth_cache, token_file)
-        self.regex = r"(?:http|https|)(?::\/\/|)(?:www.|)(?:youtu\.be\/|youtube\.com(?:\/embed\/|\/v\/|\/watch\?v=|\/ytscreeningroom\?v=|\/feeds\/api\/videos\/|\/user\S*[^\w\-\s]|\S*[^\w\-\s]))([\w\-]{12,})[a-z0-9;:@#?&%=+\/\$_.-]*"
-        if not re.match(self.regex, url):
-            raise InvalidURLError
+        log_setup()
+        parsed = urls.parse_url(url)
+        if not parsed.playlist_id:
+            raise InvalidURLError(f"No playlist ID in {url}")
+        super().__init__(
+            parsed.playlist_url, client, proxies, use_oauth, allow_oauth_cache, token_file
+        )
         self.video_handle = YT
+        if not proxies:
+            install_pytubefix_hook()  # Playlist pages share the keep-alive pool too
         self.app_path = app_path
-        self._title = sanitize_filename(self.title)
-        self.path = f"{self.app_path}\\{self._title}"
-        self.tmp = f"{self.app_path}\\{self._title}\\tmp"
-        self._create_directories()
+        self.max_workers = max_workers
+        self.merge_workers = merge_workers
+        self.segments = segments
+        self.streaming_merge = streaming_merge
+        self.cancel = cancel
+        self._safe_title: Union[str, None] = None
+
+    @property
+    def safe_title(self) -> str:
+        """
+        The playlist title sanitized for use in file names, fetched on first use.
+        """
+        if self._safe_title is None:
+            self._safe_title = sanitize_filename(self.title)
+        return self._safe_title
+
+    @property
+    def path(self) -> str:
+        """
+        Folder the playlist is downloaded to.
+        """
+        return os.path.join(self.app_path, self.safe_title)
+
+    @property
+    def tmp(self) -> str:
+        """
+        Folder holding the playlist manifest.
+        """
+        return os.path.join(self.app_path, self.safe_title, "tmp")
 
     @handle_errors(DirectoryCreationError)
     def _create_directories(self):
@@ -73,22 +142,186 @@ class PL(Playlist):
         if not os.path.exists(self.tmp):
             os.makedirs(self.tmp, exist_ok=True)
 
+    def iter_video_urls(self) -> Iterator[str]:
+        """
+        Yield the video URLs of the playlist as each page of it arrives.
+
+        Unlike `video_urls`, nothing waits for the whole playlist to be enumerated, so
+        downloads can start while later pages are still being fetched.
+        """
+        yield from self.url_generator()
+
     @handle_errors(DownloadError)
-    def download_playlist(self, _type: int, resolution: int = None):
+    def download_playlist(
+        self,
+        _type: int,
+        resolution: int = None,
+        max_workers: int = None,
+        sync: bool = False,
+    ) -> List[ItemResult]:
         """
         Download all videos in a playlist.
 
-        This method iterates over the list of video URLs in the playlist and downloads each video
-        according to the specified _type and resolution.
-        After all videos are downloaded, the tmp directory is emptied.
+        Entries run through a DownloadPipeline as the playlist pages arrive: a bounded pool
+        of threads transfers the streams, ffmpeg merges run in a process pool, and one
+        thread archives finished entries. A failing video is recorded in the report and
+        does not stop the remaining downloads. Finished entries are recorded in a manifest,
+        so re-running an interrupted playlist skips them and resumes partial ones. The tmp
+        directory is emptied only once every entry succeeded.
 
         Args:
             _type (int): The _type of download (1: audio, 2: video, 3: both).
             resolution (int): The resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+            max_workers (int, optional): Overrides the worker count given to the constructor.
+            sync (bool, optional): Incremental sync; only entries not downloaded by a previous
+                sync of this playlist are processed.
+
+        Returns:
+            List[ItemResult]: One result per processed entry, in playlist order.
+        """
+        workers = max(1, max_workers or self.max_workers)
+        self._create_directories()
+        manifest = JobManifest(os.path.join(self.tmp, "playlist.json"))
+        sync_index = (
+            PlaylistIndex(
+                os.path.join(self.app_path, ".cache", "playlists", f"{self.playlist_id}.json")
+            )
+            if sync
+            else None
+        )
+
+        def entries() -> Iterator[Tuple[int, str]]:
+            for position, url in enumerate(self.iter_video_urls()):
+                if self.cancel and self.cancel.is_set():
+                    return
+                if sync_index and sync_index.seen(urls.video_id(url)):
+                    continue
+                yield position, url
+
+        pipeline = DownloadPipeline(fetch_workers=workers, merge_workers=self.merge_workers)
+        results = pipeline.run(
+            entries(),
+            lambda entry: self._fetch_item(*entry, _type, resolution, manifest),
+            lambda payload, error: self._finalize_item(payload, error, manifest, sync_index),
+        )
+        if self.cancel and self.cancel.is_set():
+            raise DownloadAbortedError
+        results.sort(key=lambda result: result.index)
+        failed = [result for result in results if not result.ok]
+        if not failed:
+            self.empty_folder(self.tmp)
+        logging.info(
+            f"Playlist {self.playlist_url}: {len(results) - len(failed)} downloaded, {len(failed)} failed"
+        )
+        return results
+
+    def _fetch_item(
+        self,
+        index: int,
+        url: str,
+        _type: int,
+        resolution: int = None,
+        manifest: Union[JobManifest, None] = None,
+    ) -> Tuple[Tuple, Union[Tuple[str, str, str], None]]:
+        """
+        Fetch stage: transfer a single playlist entry and report failures instead of raising.
+
+        :param index: Position of the entry in the playlist.
+        :param url: URL of the video.
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :param manifest: Playlist manifest recording finished entries.
+        :return: The payload for `_finalize_item` and the paths to merge, if any.
+        """
+        start = time.monotonic()
+        result = ItemResult(index=index, url=url, ok=False)
+        item_id = video = fetched = None
+        try:
+            video_id = urls.video_id(url)
+            item_id = f"{video_id}:{_type}:{resolution}"
+            finished = manifest is not None and manifest.is_item_finished(item_id)
+            archived = None if finished else get_archive().lookup(
+                video_id, _type, archive_resolution(_type, resolution_label(resolution))
+            )
+            if finished or archived is not None:
+                # Finished earlier or already archived; checked before any network request
+                result.ok = result.skipped = True
+                result.title = archived["title"] if archived else None
+                return (result, item_id, None, None, start), None
+            video = self.video_handle(
+                url,
+                app_path=self.path,
+                segments=self.segments,
+                streaming_merge=self.streaming_merge,
+                priority=PRIORITY_BACKGROUND,  # Single videos started meanwhile go first
+                cancel=self.cancel,
+            )
+            result.title = video.title
+            with log_context(playlist_id=self.playlist_id, index=index):
+                fetched = video.fetch(_type, resolution)
+            result.skipped = video.skipped
+        except Exception as e:  # pylint: disable = broad-exception-caught
+            result.error = describe_error(e)
+            logging.error(
+                f"Failed to download {url}: {result.error}",
+                extra={"playlist_id": self.playlist_id, "video_id": urls.video_id(url)},
+            )
+            if video is not None:
+                video.release()
+        return (result, item_id, video, fetched, start), fetched.merge_args if fetched else None
+
+    def _finalize_item(
+        self,
+        payload: Tuple,
+        error: Union[BaseException, None],
+        manifest: Union[JobManifest, None] = None,
+        sync_index: Union[PlaylistIndex, None] = None,
+    ) -> ItemResult:
+        """
+        Finalize stage: archive a fetched (and merged) entry and return its report.
+
+        :param payload: Payload returned by `_fetch_item`.
+        :param error: Error raised by the merge, if any.
+        :param manifest: Playlist manifest recording finished entries.
+        :param sync_index: Incremental sync index the entry is added to once downloaded or
+            skipped as already on disk.
         """
-        for i in self.video_urls:
-            self.video_handle(i, app_path=self.path).download_video(_type, resolution)
-        self.empty_folder(self.tmp)
+        result, item_id, video, fetched, start = payload
+        if video is None and result.skipped and sync_index:
+            # Skipped without a handle: still on disk, so later syncs need not look again
+            try:
+                sync_index.add(urls.video_id(result.url), title=result.title)
+            except OSError as e:
+                logging.warning(f"Could not record {result.url} in the sync index: {e}")
+        if video is not None and not result.error:
+            try:
+                if error is not None:
+                    raise error
+                if fetched is not None:
+                    video.finalize(fetched)
+                result.ok = True
+                if manifest:
+                    manifest.finish_item(item_id)
+                if sync_index:
+                    sync_index.add(video.video_id, title=result.title)
+            except Exception as e:  # pylint: disable = broad-exception-caught
+                result.error = describe_error(e)
+                logging.error(
+                    f"Failed to download {result.url}: {result.error}",
+                    extra={"playlist_id": self.playlist_id, "video_id": video.video_id},
+                )
+            finally:
+                video.release()
+        result.elapsed = time.monotonic() - start
+        if video is not None and fetched is not None:
+            video.metrics.observe(
+                "yt_job_seconds",
+                result.elapsed,
+                type=video._type[fetched._type],  # pylint: disable = protected-access
+                outcome="done" if result.ok else "failed",
+                video_id=video.video_id,
+            )
+        return result
 
     @handle_errors(FailedDirectoryEmptyError)
     def empty_folder(self, path: str) -> None:
@@ -11,17 +11,40 @@ Args:
     use_oauth (bool, optional): Whether to use OAuth for authentication. Defaults to False.
     allow_oauth_cache (bool, optional): Whether to allow caching of OAuth tokens. Defaults to True.
     token_file (str | None, optional): The file path to store the OAuth token.
+    segments (int, optional): Number of byte ranges fetched concurrently per stream. Defaults to 1.
+    segment_size (int | None, optional): Size of each byte range when segmented.
+    streaming_merge (bool, optional): Pipe merged downloads straight into ffmpeg instead of
+        writing tmp files first, when the streams allow it. Defaults to False.
+    cache (MetadataCache | None, optional): Cache for the title and stream manifest.
+        Defaults to the process-wide cache.
+    archive (DownloadArchive | None, optional): Archive of completed downloads checked before
+        downloading. Defaults to the process-wide archive.
+    priority (int, optional): Bandwidth scheduler priority of the transfers.
+        Defaults to PRIORITY_INTERACTIVE.
+    cancel (threading.Event | None, optional): Aborts the running download when set.
+    metrics (MetricsRecorder | None, optional): Receives the timings and throughput of the
+        download. Defaults to the process-wide recorder.
+    staging_root (str | None, optional): Directory the per-job staging folders are created
+        in. Defaults to `<app_path>/tmp`, on the same filesystem as the outputs.
+    ram_staging_limit (int, optional): Jobs expected to stage at most this many bytes are
+        staged in RAM (tmpfs) when the platform has one. Defaults to 0 (never).
+Metadata and stream requests share the process-wide keep-alive connection pool unless
+proxies are given. Construction only validates the URL offline; the title is fetched and
+the download folder created when a download starts.
 Returns:
     None
 """
 # pylint: disable = line-too-long
-from typing import Callable, Union, Any, Dict
+from typing import Callable, Union, Any, Dict, List
 import os
 import shutil
+import threading
 import time
-import re
-import ffmpeg
-from pytubefix import YouTube, Stream
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pytubefix import YouTube
+from Youtube.archive import DownloadArchive, archive_resolution, get_archive
+from Youtube.cache import MetadataCache, get_cache
 from Youtube.errors import (
     _FileExistsError,
     InvalidURLError,
@@ -29,11 +52,49 @@ from Youtube.errors import (
     DownloadError,
     FailedDirectoryEmptyError,
     FFmpegError,
+    InsufficientSpaceError,
+    StreamSelectionError,
 )
-from Youtube.logs import log_setup, logging
-from Youtube.logic_helpers import APP_PATH, handle_errors, sanitize_filename
+from Youtube.logs import log_context, log_progress, log_setup, logging
+from Youtube.logic_helpers import (
+    APP_PATH,
+    RESOLUTIONS,
+    CancelEvent,
+    handle_errors,
+    resolution_label,
+    sanitize_filename,
+    wait_all,
+)
+from Youtube.http_pool import get_pool, install_pytubefix_hook
+from Youtube.manifest import JobManifest
+from Youtube.metrics import MetricsRecorder, get_metrics
+from Youtube.pipeline import merge_files
+from Youtube.scheduler import PRIORITY_INTERACTIVE
+from Youtube.segmented import SegmentedDownloader
+from Youtube import urls
+from Youtube.staging import StagingArea, check_free_space, commit_file, ram_root, same_filesystem
+from Youtube.streaming_merge import StreamingMerger, can_stream
+from Youtube.streams import StreamInfo, plan_streams
+
+
+@dataclass
+class FetchResult:
+    """Streams of one download, transferred and waiting to be merged and finalized."""
+
+    _type: int
+    out_path: str
+    staged_path: Union[str, None] = None  # Moved to out_path when the job is finalized
+    v_out: Union[str, None] = None
+    a_out: Union[str, None] = None
+
+    @property
+    def merge_args(self) -> Union[tuple, None]:
+        """(video, audio, output) paths when the streams still need merging, else None."""
+        if self.v_out and self.a_out:
+            return self.v_out, self.a_out, self.staged_path
+        return None
+
 
-log_setup()
 class YT(YouTube):
     """Youtube Class"""
 
@@ -50,10 +111,26 @@ class YT(YouTube):
         use_oauth: bool = False,
         allow_oauth_cache: bool = True,
         token_file: Union[str, None] = None,
+        segments: int = 1,
+        segment_size: Union[int, None] = None,
+        streaming_merge: bool = False,
+        cache: Union[MetadataCache, None] = None,
+        archive: Union[DownloadArchive, None] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        cancel: Union[threading.Event, None] = None,
+        metrics: Union[MetricsRecorder, None] = None,
+        staging_root: Union[str, None] = None,
+        ram_staging_limit: int = 0,
     ):
 
+        log_setup()
+        parsed = urls.parse_url(url)
+        if not parsed.video_id:
+            raise InvalidURLError(f"No video ID in {url}")
+        # Construction stays offline: pytubefix only sees the canonical URL and nothing
+        # is requested or created on disk until a download starts
         super().__init__(
-            url,
+            parsed.watch_url,
             client,
             on_progress_callback,
             on_complete_callback,
@@ -63,16 +140,90 @@ class YT(YouTube):
             token_file,
         )
         self.url = url
-        self.regex = r"^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$"
-        if not re.match(self.regex, self.url):
-            raise InvalidURLError
+        self.on_progress_callback = on_progress_callback
+        self.on_complete_callback = on_complete_callback
         self._type = {1: "audio", 2: "video", 3: "both"}
-        self.res = {1: "1080p", 2: "720p", 3: "480p"}
+        self.res = RESOLUTIONS
         self.t_res = ""
+        self.requested_res = ""
         self.app_path = app_path
-        self._title = sanitize_filename(self.title)
-        self.tmp = os.path.join(self.app_path, "tmp")
-        self._create_directories()
+        self.segments = segments
+        self.segment_size = segment_size
+        self.streaming_merge = streaming_merge
+        self.cache = cache or get_cache()
+        self.archive = archive or get_archive()
+        self.priority = priority
+        self.cancel = cancel
+        self.metrics = metrics or get_metrics()
+        # The pool does not speak to proxies; with proxies keep plain urllib everywhere
+        self.http_pool = None if proxies else get_pool()
+        if self.http_pool:
+            install_pytubefix_hook()
+        self.skipped = False  # Set when the archive already holds the requested download
+        self._cached_title: Union[str, None] = None
+        self._safe_title: Union[str, None] = None
+        self.staging_root = staging_root or os.path.join(self.app_path, "tmp")
+        self.ram_staging_limit = ram_staging_limit
+        # Every job gets its own staging folder once its streams are known, so
+        # concurrent downloads never clean up each other's files
+        self.staging: Union[StagingArea, None] = None
+        self.tmp: Union[str, None] = None
+
+    @property
+    def title(self) -> str:
+        """
+        The video title, read from the metadata cache or fetched on first use.
+        """
+        if self._cached_title is None:
+            self._cached_title = self._fetch_title()
+        return self._cached_title
+
+    @title.setter
+    def title(self, value: str) -> None:
+        self._cached_title = value
+
+    @property
+    def safe_title(self) -> str:
+        """
+        The title sanitized for use in file names.
+        """
+        if self._safe_title is None:
+            self._safe_title = sanitize_filename(self.title)
+        return self._safe_title
+
+    def _load_title(self) -> str:
+        """
+        Request the title from YouTube.
+        """
+        return YouTube.title.fget(self)
+
+    def _fetch_title(self) -> str:
+        """
+        Return the video title from the metadata cache, fetching and caching it on a miss.
+        """
+        with self.metrics.timer(
+            "yt_metadata_seconds", kind="title", cache="hit", video_id=self.video_id
+        ) as labels:
+            title = self.cache.get_title(self.video_id)
+            if title is None:
+                labels["cache"] = "miss"
+                title = self._load_title()
+                self.cache.put(self.video_id, title=title)
+        return title
+
+    def _stream_infos(self) -> List[StreamInfo]:
+        """
+        Return the stream manifest from the metadata cache, fetching and caching it on a miss.
+        """
+        with self.metrics.timer(
+            "yt_metadata_seconds", kind="streams", cache="hit", video_id=self.video_id
+        ) as labels:
+            infos = self.cache.get_streams(self.video_id)
+            if infos is None:
+                labels["cache"] = "miss"
+                infos = [StreamInfo.from_stream(stream) for stream in self.streams]
+                self.cache.put(self.video_id, streams=infos)
+        return infos
 
     @handle_errors(DirectoryCreationError)
     def _create_directories(self):
@@ -81,8 +232,6 @@ class YT(YouTube):
         """
         if not os.path.exists(self.app_path):
             os.makedirs(self.app_path, exist_ok=True)
-        if not os.path.exists(self.tmp):
-            os.makedirs(self.tmp, exist_ok=True)
 
     @handle_errors(DownloadError)
     def download_video(self, _type: int, resolution: int = None):
@@ -92,8 +241,115 @@ class YT(YouTube):
         :param _type: Type of download (1: audio, 2: video, 3: both).
         :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
         """
-        self._extract_streams(_type, resolution)
-        self.empty_folder(self.tmp)  # Clean up temporary files after processing
+        with log_context(video_id=self.video_id), self.metrics.timer(
+            "yt_job_seconds", type=self._type[_type], outcome="failed", video_id=self.video_id
+        ) as job:
+            try:
+                fetched = self.fetch(_type, resolution)
+                if fetched is None:
+                    job["outcome"] = "skipped"
+                    return
+                if fetched.merge_args:
+                    self._merge(*fetched.merge_args)
+                self.finalize(fetched)
+            finally:
+                self.release()
+            job["outcome"] = "done"
+
+    def fetch(self, _type: int, resolution: int = None) -> Union[FetchResult, None]:
+        """
+        Transfer the streams of a download into the tmp folder without merging them.
+
+        `download_video` runs fetch, merge and finalize back to back; PL runs them as
+        separate pipeline stages so merges never hold up transfers.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :return: The fetched streams, or None when the archive already holds the download.
+        """
+        self.t_res = self.requested_res = resolution_label(resolution)
+        hit = self.archive.lookup(self.video_id, _type, archive_resolution(_type, self.t_res))
+        if hit:
+            # Already on disk: skip before any stream is requested
+            self.skipped = True
+            logging.info(
+                f"Skipped {self.watch_url}: already downloaded to {hit['path']}",
+                extra={"video_id": self.video_id},
+            )
+            return None
+        try:
+            with log_context(video_id=self.video_id):
+                return self._extract_streams(_type, resolution)
+        except Exception:
+            # The cached stream URLs may have expired early; fetch fresh ones next time
+            self.cache.invalidate_streams(self.video_id)
+            raise
+
+    def finalize(self, fetched: FetchResult) -> None:
+        """
+        Move a finished download into place, archive it and clean up its staging folder.
+
+        :param fetched: Result of `fetch`, merged if it needed merging.
+        """
+        if fetched.staged_path and os.path.exists(fetched.staged_path):
+            commit_file(fetched.staged_path, fetched.out_path)
+        if os.path.exists(fetched.out_path):
+            self._archive(fetched._type, fetched.out_path)
+        with self.metrics.timer("yt_cleanup_seconds", video_id=self.video_id):
+            self.empty_folder(self.tmp)  # Clean up temporary files after processing
+        self.release()
+        logging.info(f"Downloaded {self.watch_url}", extra={"video_id": self.video_id})
+
+    def _archive(self, _type: int, path: str) -> None:
+        """
+        Record an output in the archive under the resolution fetched and, after a
+        fallback, also under the one requested, so asking again is an archive hit.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param path: Path of the output file.
+        """
+        for label in {self.t_res, self.requested_res}:
+            self.archive.record(
+                self.video_id, _type, archive_resolution(_type, label), path, title=self.title
+            )
+
+    def release(self) -> None:
+        """
+        Let other jobs use this job's staging folder again; call once the job is over.
+        """
+        if self.staging:
+            self.staging.release()
+
+    def _stage(self, _type: int, video: StreamInfo = None, audio: StreamInfo = None) -> None:
+        """
+        Claim the staging folder of this job after checking there is room for its streams.
+
+        The streams are staged, plus the merged copy for type 3, and the output lands in
+        `app_path`. Jobs small enough for `ram_staging_limit` stage in RAM when it has room.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param video: Video stream object.
+        :param audio: Audio stream object.
+        """
+        self._create_directories()
+        streams = [video if _type in {2, 3} else None, audio if _type in {1, 3} else None]
+        expected = sum(stream.filesize or 0 for stream in streams if stream)
+        staged = expected * 2 if all(streams) else expected
+        root = self.staging_root
+        ram = ram_root()
+        if ram and expected and staged <= self.ram_staging_limit:
+            try:
+                check_free_space(ram, staged)
+                root = ram
+            except InsufficientSpaceError:
+                pass  # Stage on disk instead
+        if self.staging:
+            self.staging.release()
+        key = f"{self.video_id}-{self._type[_type]}-{self.t_res or 'best'}"
+        self.staging = StagingArea(root, key).claim(staged)
+        self.tmp = self.staging.path
+        if not same_filesystem(root, self.app_path):
+            check_free_space(self.app_path, expected)
 
     @handle_errors(FailedDirectoryEmptyError)
     def empty_folder(self, path: str) -> None:
@@ -110,90 +366,249 @@ class YT(YouTube):
         """
         Extract the video and audio streams based on the download _type and resolution.
 
+        An output already on disk under the planned name is archived and skipped.
+
         :param _type: Type of download (1: audio, 2: video, 3: both).
         :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
         """
-        self.t_res = self.res[resolution] if resolution else "1080p"
-        audio = (
-            self.streams.get_audio_only() if _type in {1, 3} else None
-        )  # Get audio stream
-        video = (
-            self.streams.filter(res=self.t_res).first() if resolution else None
-        )  # Get video stream with specified resolution
-        if _type == 1:
-            audio = self.streams.get_audio_only()  # Get audio stream
-            video = None
-        elif _type == 2:
-            audio = None
-            video = (
-                self.streams.filter(res=self.t_res).first() if resolution else None
-            )  # Get video stream with specified resolution
-        elif _type == 3:
-            audio = self.streams.get_audio_only()  # Get audio stream
-            video = self.streams.filter(res=self.t_res).first() if resolution else None
-        self._processdata(_type, video, audio)
+        video, audio = self._select_streams(_type, resolution)
+        out_path = self._output_path(_type)
+        if os.path.exists(out_path):
+            # Downloaded before the archive knew it (e.g. under a fallback resolution)
+            self.skipped = True
+            self._archive(_type, out_path)
+            logging.info(
+                f"Skipped {self.watch_url}: already downloaded to {out_path}",
+                extra={"video_id": self.video_id},
+            )
+            return None
+        return self._processdata(_type, video, audio)
+
+    def _select_streams(self, _type: int, resolution: int = None):
+        """
+        Plan the video and audio streams for a download _type and resolution.
+
+        A progressive stream comes back as `video` with no `audio` for type 3; it needs no
+        merge. A missing resolution falls back to the closest available one.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        :param resolution: Resolution of the video to download (1: 1080p, 2: 720p, 3: 480p).
+        :return: (video, audio), either of which may be None.
+        """
+        self.t_res = resolution_label(resolution)
+        try:
+            plan = plan_streams(self._stream_infos(), _type, self.t_res)
+        except LookupError as e:
+            raise StreamSelectionError(str(e)) from e
+        logging.info(f"Stream plan for {self.watch_url}: {plan.reason}")
+        if plan.resolution:
+            self.t_res = plan.resolution  # Name the output after what is actually fetched
+        return plan.video, plan.audio
 
     @handle_errors(DownloadError)
-    def _processdata(self, _type: int, video: Stream = None, audio: Stream = None):
+    def _processdata(
+        self, _type: int, video: StreamInfo = None, audio: StreamInfo = None
+    ) -> FetchResult:
         """
         Download and process video and audio streams according to the specified _type.
 
+        Everything is written to the job's staging folder: a video and audio pair is left
+        there for the merge step, and `finalize` moves the output into place.
+
         :param _type: Type of download (1: audio, 2: video, 3: both).
         :param video: Video stream object.
         :param audio: Audio stream object.
         """
-        # pylint: disable = attribute-defined-outside-init
-        self.millis = int(time.time() * 1000)  # Current timestamp in milliseconds
-        # Generate output paths with timestamp
-        v_out = os.path.join(self.tmp, f"{self.millis}.mp4")
-        a_out = os.path.join(self.tmp, f"{self.millis}.mp3")
+        self._stage(_type, video, audio)
+        out_path = self._output_path(_type)
+        if os.path.exists(out_path):
+            raise _FileExistsError  # Refuse an existing output before transferring
+        staged_path = os.path.join(self.tmp, "merged.mp4")
+        if os.path.exists(staged_path):
+            os.remove(staged_path)  # Left behind by an interrupted merge
+        if _type == 3 and video and audio:
+            if self._stream_merge(video, audio, staged_path):
+                return FetchResult(_type, out_path, staged_path)
 
-        # Download video if required
-        if _type in {2, 3} and video:
-            (filename, output_path) = (
-                (f"{self._title}_{self.t_res}_video.mp4", self.app_path)
-                if _type == 2
-                else (f"{self.millis}.mp4", self.tmp)
-            )
-            video.download(output_path=output_path, filename=filename)
+        # Partial files use stable names and a manifest records their progress,
+        # so an interrupted download resumes instead of starting over
+        manifest = JobManifest(os.path.join(self.tmp, "manifest.json"))
+        v_out = os.path.join(self.tmp, f"{video.itag}.mp4") if video else None
+        a_out = os.path.join(self.tmp, f"{audio.itag}.mp3") if audio else None
 
-        # Download audio if required
+        # Fetch the required streams concurrently; if either fails the other is cancelled
+        transfers = []
+        if _type in {2, 3} and video:
+            transfers.append((video, v_out))
         if _type in {1, 3} and audio:
-            (filename, output_path) = (
-                (f"{self._title}_audio.mp3", self.app_path)
-                if _type == 1
-                else (f"{self.millis}.mp3", self.tmp)
+            transfers.append((audio, a_out))
+        cancel = CancelEvent(self.cancel)  # A failed transfer must not cancel the caller's event
+        with ThreadPoolExecutor(max_workers=max(1, len(transfers))) as pool:
+            wait_all(
+                [
+                    pool.submit(self._download_stream, stream, path, manifest, cancel)
+                    for stream, path in transfers
+                ],
+                cancel,
             )
-            audio.download(output_path=output_path, filename=filename)
 
-        # Merge video and audio if both are downloaded
+        # Video and audio both downloaded: the caller merges them
         if video and audio and _type == 3:
-            self._merge(v_out, a_out)
+            return FetchResult(_type, out_path, staged_path, v_out, a_out)
+        if _type in {2, 3} and video:
+            return FetchResult(_type, out_path, v_out)  # Video only, or progressive
+        return FetchResult(_type, out_path, a_out)
+
+    def _download_stream(
+        self,
+        stream: StreamInfo,
+        path: str,
+        manifest: JobManifest,
+        cancel: Union[threading.Event, None] = None,
+    ) -> None:
+        """
+        Download a single stream, resuming any progress recorded in the manifest.
+
+        :param stream: Stream object to download.
+        :param path: Path of the output file.
+        :param manifest: Manifest of the current job.
+        :param cancel: Event that aborts the transfer when set.
+        """
+        start = time.perf_counter()
+        first_byte = []
+        size = SegmentedDownloader(
+            stream.url,
+            path,
+            size=stream.filesize,
+            segments=self.segments,
+            segment_size=self.segment_size,
+            manifest=manifest,
+            stream_id=str(stream.itag),
+            cancel=cancel,
+            priority=self.priority,
+            pool=self.http_pool,
+            on_progress=self._progress_reporter(stream, start, first_byte),
+        ).download()
+        self._observe_stream(
+            stream, time.perf_counter() - start, size, first_byte[0] if first_byte else None
+        )
+        if self.on_complete_callback:
+            self.on_complete_callback(stream, path)
+
+    def _progress_reporter(
+        self, stream: StreamInfo, start: float, first_byte: List[float]
+    ) -> Callable[[bytes, int], None]:
+        """
+        Return the progress callback of a stream transfer.
+
+        It logs progress, forwards every chunk to `on_progress_callback` and appends the
+        time to first byte to `first_byte`.
+
+        :param stream: The transferred stream.
+        :param start: `time.perf_counter()` when the transfer started.
+        :param first_byte: Receives the seconds until the first chunk arrived.
+        """
+        key = f"{self.video_id}:{stream.itag}"
+
+        def on_progress(chunk: bytes, remaining: int) -> None:
+            if not first_byte:
+                first_byte.append(time.perf_counter() - start)
+            if stream.filesize:
+                log_progress(
+                    key, stream.filesize - remaining, stream.filesize, video_id=self.video_id
+                )
+            if self.on_progress_callback:
+                self.on_progress_callback(stream, chunk, remaining)
+
+        return on_progress
+
+    def _observe_stream(
+        self, stream: StreamInfo, elapsed: float, size: int, ttfb: Union[float, None]
+    ) -> None:
+        """
+        Report the time to first byte, duration, size and throughput of a stream transfer.
+
+        :param stream: The transferred stream.
+        :param elapsed: Seconds the transfer took.
+        :param size: Size of the stream in bytes.
+        :param ttfb: Seconds until the first chunk arrived; None when nothing was fetched
+            because the manifest showed the stream complete.
+        """
+        labels = {
+            "stream": "audio" if stream.is_audio_only else "video",
+            "video_id": self.video_id,
+        }
+        if ttfb is not None:
+            self.metrics.observe("yt_ttfb_seconds", ttfb, **labels)
+        self.metrics.observe("yt_stream_seconds", elapsed, **labels)
+        self.metrics.observe("yt_stream_bytes", size, **labels)
+        if elapsed > 0:
+            self.metrics.observe("yt_stream_bytes_per_second", size / elapsed, **labels)
+
+    def _output_path(self, _type: int) -> str:
+        """
+        Return the path of the final output file for a download type.
+
+        :param _type: Type of download (1: audio, 2: video, 3: both).
+        """
+        name = {
+            1: f"{self.safe_title}_audio.mp3",
+            2: f"{self.safe_title}_{self.t_res}_video.mp4",
+            3: f"{self.safe_title}_{self.t_res}.mp4",
+        }[_type]
+        return os.path.join(self.app_path, name)
+
+    @handle_errors(FFmpegError)
+    def _stream_merge(self, video: StreamInfo, audio: StreamInfo, out_path: str) -> bool:
+        """
+        Merge while downloading by piping both streams into ffmpeg.
 
-        # Log and print the completion status
-        logging.info(f"Downloaded {self.watch_url}")
-#        print(f"Downloaded {self._title}")
+        Returns False without side effects when streaming merges are disabled, unsupported
+        on this platform, or the container layout needs seeking; the caller then falls back
+        to the tmp-file download and merge.
+
+        :param video: Video stream object.
+        :param audio: Audio stream object.
+        :param out_path: Path of the merged file.
+        """
+        if not self.streaming_merge or not can_stream(
+            video.url, audio.url, pool=self.http_pool
+        ):
+            return False
+        start = time.perf_counter()
+        first_byte = {video.url: [], audio.url: []}
+        reporters = {
+            stream.url: self._progress_reporter(stream, start, first_byte[stream.url])
+            for stream in (video, audio)
+        }
+        merger = StreamingMerger(
+            self.tmp,
+            out_path,
+            cancel=CancelEvent(self.cancel),
+            priority=self.priority,
+            pool=self.http_pool,
+            on_progress=lambda url, chunk, remaining: reporters[url](chunk, remaining),
+        )
+        with self.metrics.timer(
+            "yt_merge_seconds", mode="streaming", video_id=self.video_id
+        ):
+            merger.merge(video.url, audio.url, video.filesize, audio.filesize)
+        elapsed = time.perf_counter() - start
+        for stream in (video, audio):
+            ttfb = first_byte[stream.url]
+            self._observe_stream(
+                stream, elapsed, merger.sizes[stream.url], ttfb[0] if ttfb else None
+            )
+        return True
 
     @handle_errors(FFmpegError)
-    def _merge(self, v_out: str, a_out: str):
+    def _merge(self, v_out: str, a_out: str, out_path: str):
         """
         Merge the video and audio files into a single output file.
 
         :param v_out: Path to the video file.
         :param a_out: Path to the audio file.
+        :param out_path: Path of the merged file.
         """
-        out_path = (
-            f"{self.app_path}\\{self._title}_{self.t_res}.mp4"  # Output file path
-        )
-        if os.path.exists(out_path):
-            raise _FileExistsError  # Ensure the output file does not already exist
-        # Merge video and audio using FFmpeg
-        output = ffmpeg.output(
-            ffmpeg.input(v_out),
-            ffmpeg.input(a_out),
-            out_path,
-            vcodec="copy",
-            acodec="copy",
-            loglevel="quiet"
-        )
-        ffmpeg.run(output, overwrite_output=True)
+        with self.metrics.timer("yt_merge_seconds", mode="file", video_id=self.video_id):
+            merge_files(v_out, a_out, out_path)
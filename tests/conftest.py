@@ -0,0 +1,23 @@
+"""
+Shared fixtures of the test suite.
+"""
+
+import pytest
+from Youtube.benchmarks.stream_server import StreamServer
+
+
+@pytest.fixture
+def serve():
+    """
+    Start StreamServers with the given options and stop them after the test.
+    """
+    servers = []
+
+    def start(**options) -> StreamServer:
+        server = StreamServer(seed=1, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
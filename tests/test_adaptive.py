@@ -0,0 +1,144 @@
+"""
+Adaptive host windows and range retries, against the local StreamServer.
+"""
+
+import asyncio
+import http.client
+import os
+from urllib.error import HTTPError
+import pytest
+from Youtube import segmented
+from Youtube.adaptive import (
+    FAILED,
+    NEUTRAL,
+    OK,
+    THROTTLED,
+    AdaptiveController,
+    HostWindow,
+    classify,
+)
+from Youtube.benchmarks.stream_server import StreamServer, _synthetic
+from Youtube.errors import DownloadAbortedError
+from Youtube.metrics import NullRecorder
+from Youtube.segmented import SegmentedDownloader
+
+SIZE = 2 * 1024 * 1024
+SEGMENT = 64 * 1024
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    # Keep the jittered backoff out of the test run time, but still let it grow so a
+    # range does not spend all its retries before the server has closed its connections
+    monkeypatch.setattr(
+        segmented, "backoff_delay", lambda attempt, error=None: min(0.2, 0.01 * 2**attempt)
+    )
+
+
+def download(server: StreamServer, path: str, controller: AdaptiveController) -> bytes:
+    url = server.add("stream", SIZE)
+    SegmentedDownloader(
+        url,
+        path,
+        size=SIZE,
+        segments=8,
+        segment_size=SEGMENT,
+        retries=20,
+        controller=controller,
+    ).download()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_window_bounds_connections(serve, tmp_path):
+    server = serve()
+    controller = AdaptiveController(initial=2, maximum=2, metrics=NullRecorder())
+    data = download(server, os.path.join(tmp_path, "out"), controller)
+    assert data == _synthetic(0, SIZE)
+    assert server.peak_active <= 2
+    assert server.throttled == 0
+
+
+def test_window_shrinks_after_throttling(serve, tmp_path):
+    server = serve(max_connections=2, rate=4 * 1024 * 1024)  # Keep connections open
+    controller = AdaptiveController(initial=8, maximum=8, cooldown=0, metrics=NullRecorder())
+    data = download(server, os.path.join(tmp_path, "out"), controller)
+    assert data == _synthetic(0, SIZE)
+    assert server.throttled > 0
+    assert server.peak_active <= 2
+    assert controller.window(server.base_url).limit < 8
+
+
+def test_dropped_ranges_resume(serve, tmp_path):
+    server = serve(drop_rate=0.3)
+    controller = AdaptiveController(metrics=NullRecorder())
+    data = download(server, os.path.join(tmp_path, "out"), controller)
+    assert server.dropped > 0
+    assert data == _synthetic(0, SIZE)
+
+
+@pytest.mark.parametrize(
+    "error, outcome",
+    [
+        (HTTPError("http://host", 429, "Too Many Requests", {}, None), THROTTLED),
+        (HTTPError("http://host", 503, "Unavailable", {}, None), THROTTLED),
+        (HTTPError("http://host", 502, "Bad Gateway", {}, None), FAILED),
+        (HTTPError("http://host", 404, "Not Found", {}, None), NEUTRAL),
+        (http.client.IncompleteRead(b"", 10), FAILED),
+        (ConnectionResetError(), FAILED),
+        (DownloadAbortedError(), NEUTRAL),
+        (ValueError(), NEUTRAL),
+    ],
+)
+def test_classify(error, outcome):
+    assert classify(error) == outcome
+
+
+def test_additive_increase_only_when_full():
+    window = HostWindow("host", initial=4, cooldown=0, metrics=NullRecorder())
+    window.acquire()
+    window.release(OK)
+    assert window.limit == 4
+    for _ in range(4):
+        window.acquire()
+    window.release(OK)
+    assert window.limit == pytest.approx(4.25)
+
+
+def test_multiplicative_decrease_once_per_cooldown():
+    window = HostWindow("host", initial=8, cooldown=60, metrics=NullRecorder())
+    for outcome in (THROTTLED, FAILED):
+        window.acquire()
+        window.release(outcome)
+    assert window.limit == 4
+    shrinking = HostWindow("host", initial=8, minimum=3, cooldown=0, metrics=NullRecorder())
+    for _ in range(3):
+        shrinking.acquire()
+        shrinking.release(THROTTLED)
+    assert shrinking.limit == 3
+
+
+@pytest.mark.parametrize(
+    "options", [{"max_connections": 2, "rate": 4 * 1024 * 1024}, {"drop_rate": 0.3}]
+)
+def test_async_ranges_recover(serve, tmp_path, options):
+    pytest.importorskip("pytubefix")
+    pytest.importorskip("ffmpeg")
+    from Youtube.async_api import AsyncSegmentedDownloader  # pylint: disable = import-outside-toplevel
+
+    server = serve(**options)
+    controller = AdaptiveController(initial=8, maximum=8, cooldown=0, metrics=NullRecorder())
+    path = os.path.join(tmp_path, "out")
+    downloader = AsyncSegmentedDownloader(
+        server.add("stream", SIZE),
+        path,
+        size=SIZE,
+        segments=8,
+        segment_size=SEGMENT,
+        retries=20,
+        controller=controller,
+    )
+    asyncio.run(downloader.download())
+    with open(path, "rb") as f:
+        assert f.read() == _synthetic(0, SIZE)
+    assert server.throttled + server.dropped > 0
@@ -0,0 +1,59 @@
+"""
+Lookups and rebuilds of the DownloadArchive.
+"""
+
+import os
+from Youtube.archive import DownloadArchive
+
+
+def output(root, name: str, size: int = 100) -> str:
+    path = os.path.join(root, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_lookup_returns_intact_files(tmp_path):
+    archive = DownloadArchive(os.path.join(tmp_path, "archive.sqlite3"))
+    path = output(tmp_path, "Title_720p.mp4")
+    archive.record("dQw4w9WgXcQ", 3, "720p", path, "Title")
+    entry = archive.lookup("dQw4w9WgXcQ", 3, "720p")
+    assert entry["path"] == os.path.abspath(path)
+    assert entry["size"] == 100
+    assert archive.lookup("dQw4w9WgXcQ", 3, "1080p") is None
+
+
+def test_lookup_drops_missing_and_resized_files(tmp_path):
+    archive = DownloadArchive(os.path.join(tmp_path, "archive.sqlite3"))
+    deleted = output(tmp_path, "Gone_audio.mp3")
+    resized = output(tmp_path, "Resized_720p.mp4")
+    archive.record("dQw4w9WgXcQ", 1, "", deleted)
+    archive.record("9bZkp7q19f0", 3, "720p", resized)
+    os.remove(deleted)
+    output(tmp_path, "Resized_720p.mp4", size=50)
+    assert archive.lookup("dQw4w9WgXcQ", 1, "") is None
+    assert archive.lookup("9bZkp7q19f0", 3, "720p") is None
+    assert archive.library_count() == 0  # Dropped, not just reported as misses
+
+
+def test_rebuild_matches_files_by_title(tmp_path):
+    archive = DownloadArchive(os.path.join(tmp_path, ".cache", "archive.sqlite3"))
+    stale = output(tmp_path, "Stale_720p.mp4")
+    archive.record("jNQXAC9IVRw", 3, "720p", stale, "Stale")
+    os.remove(stale)
+    output(tmp_path, "Title_1080p.mp4")
+    output(tmp_path, "Title_audio.mp3")
+    output(tmp_path, "Other_480p_video.mp4")
+    unknown = output(tmp_path, "Unknown_720p.mp4")
+    os.makedirs(os.path.join(tmp_path, "tmp"))
+    output(os.path.join(tmp_path, "tmp"), "Other_720p.mp4")  # Staging files are skipped
+    found, unresolved = archive.rebuild(
+        str(tmp_path), [("dQw4w9WgXcQ", "Title"), ("9bZkp7q19f0", "Other")]
+    )
+    assert found == 3
+    assert unresolved == [os.path.abspath(unknown)]
+    assert archive.lookup("dQw4w9WgXcQ", 3, "1080p") is not None
+    assert archive.lookup("dQw4w9WgXcQ", 1, "") is not None
+    assert archive.lookup("9bZkp7q19f0", 2, "480p") is not None
+    assert archive.lookup("jNQXAC9IVRw", 3, "720p") is None
+    assert archive.library_count() == 3
@@ -0,0 +1,68 @@
+"""
+Expiry of the MetadataCache and eviction of its DiskBudget.
+"""
+
+import os
+import time
+from Youtube import cache
+from Youtube.cache import DiskBudget, MetadataCache
+from Youtube.streams import StreamInfo
+
+
+def stream(expire=None) -> StreamInfo:
+    query = f"&expire={int(expire)}" if expire else ""
+    return StreamInfo(137, f"https://host/videoplayback?itag=137{query}", "video/mp4")
+
+
+def test_title_ttl(tmp_path, monkeypatch):
+    metadata = MetadataCache(str(tmp_path), title_ttl=100)
+    metadata.put("dQw4w9WgXcQ", title="Title")
+    assert metadata.get_title("dQw4w9WgXcQ") == "Title"
+    now = time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 101)
+    assert metadata.get_title("dQw4w9WgXcQ") is None
+
+
+def test_stream_ttl(tmp_path, monkeypatch):
+    metadata = MetadataCache(str(tmp_path), stream_ttl=100)
+    metadata.put("dQw4w9WgXcQ", streams=[stream()])
+    assert MetadataCache(str(tmp_path)).get_streams("dQw4w9WgXcQ") == [stream()]
+    now = time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 101)
+    assert metadata.get_streams("dQw4w9WgXcQ") is None
+
+
+def test_streams_expire_with_their_urls(tmp_path):
+    metadata = MetadataCache(str(tmp_path))
+    # Expires within the safety margin, long before stream_ttl
+    metadata.put("dQw4w9WgXcQ", streams=[stream(time.time() + cache.URL_EXPIRY_MARGIN - 1)])
+    assert metadata.get_streams("dQw4w9WgXcQ") is None
+    metadata.put("9bZkp7q19f0", streams=[stream(time.time() + 2 * cache.URL_EXPIRY_MARGIN)])
+    assert metadata.get_streams("9bZkp7q19f0") is not None
+
+
+def test_invalidate_streams_keeps_the_title(tmp_path):
+    metadata = MetadataCache(str(tmp_path))
+    metadata.put("dQw4w9WgXcQ", title="Title", streams=[stream()])
+    metadata.invalidate_streams("dQw4w9WgXcQ")
+    reloaded = MetadataCache(str(tmp_path))
+    assert reloaded.get_streams("dQw4w9WgXcQ") is None
+    assert reloaded.get_title("dQw4w9WgXcQ") == "Title"
+
+
+def test_disk_budget_evicts_least_recently_used(tmp_path):
+    budget = DiskBudget(str(tmp_path), ".bin", max_bytes=1000)
+    for index in range(10):
+        tmp = os.path.join(tmp_path, "entry.tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"x" * 100)
+        path = os.path.join(tmp_path, f"{index}.bin")
+        budget.replace(tmp, path)
+        os.utime(path, (index, index))  # Oldest first
+    assert budget.total == 1000  # At the bound, not over it
+    with open(os.path.join(tmp_path, "entry.tmp"), "wb") as f:
+        f.write(b"x" * 100)
+    budget.replace(os.path.join(tmp_path, "entry.tmp"), os.path.join(tmp_path, "new.bin"))
+    remaining = sorted(name for name in os.listdir(tmp_path) if name.endswith(".bin"))
+    assert budget.total == 900  # Evicted down to EVICT_TARGET of the bound
+    assert remaining == [f"{index}.bin" for index in range(2, 10)] + ["new.bin"]
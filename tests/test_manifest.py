@@ -0,0 +1,35 @@
+"""
+Persistence of the JobManifest.
+"""
+
+import os
+from Youtube.manifest import JobManifest
+
+
+def test_progress_survives_a_restart(tmp_path):
+    path = os.path.join(tmp_path, "job.json")
+    manifest = JobManifest(path, save_interval=60)
+    manifest.start_stream("137", "video.part", 300, [(0, 99), (100, 199), (200, 299)])
+    manifest.update_range("137", 1, 40)
+    assert JobManifest(path).completed("137") == 0  # Throttled by save_interval
+    manifest.save(force=True)
+    reloaded = JobManifest(path)
+    assert reloaded.completed("137") == 40
+    assert reloaded.stream("137")["ranges"][1] == [100, 199, 40]
+
+
+def test_finished_items(tmp_path):
+    path = os.path.join(tmp_path, "job.json")
+    JobManifest(path).finish_item("dQw4w9WgXcQ")
+    manifest = JobManifest(path)
+    assert manifest.is_item_finished("dQw4w9WgXcQ")
+    assert not manifest.is_item_finished("9bZkp7q19f0")
+
+
+def test_corrupt_manifest_starts_fresh(tmp_path):
+    path = os.path.join(tmp_path, "job.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    manifest = JobManifest(path)
+    assert manifest.stream("137") is None
+    assert manifest.completed("137") == 0
@@ -0,0 +1,94 @@
+"""
+Range splitting, manifest resume and size checks of the SegmentedDownloader.
+"""
+
+import os
+import threading
+import pytest
+from Youtube.adaptive import AdaptiveController
+from Youtube.benchmarks.stream_server import _synthetic
+from Youtube.errors import DownloadAbortedError, DownloadError
+from Youtube.manifest import JobManifest
+from Youtube.metrics import NullRecorder
+from Youtube.segmented import SegmentedDownloader
+
+SIZE = 1024 * 1024 + 7  # Not a multiple of the segment size
+
+
+def downloader(url: str, path: str, **options) -> SegmentedDownloader:
+    options.setdefault("size", SIZE)
+    return SegmentedDownloader(
+        url, path, controller=AdaptiveController(metrics=NullRecorder()), **options
+    )
+
+
+@pytest.mark.parametrize(
+    "options, count",
+    [({"segments": 4}, 4), ({"segments": 3}, 3), ({"segment_size": 100_000}, 11)],
+)
+def test_ranges_cover_the_stream(options, count):
+    ranges = downloader("http://host/stream", "out", **options).ranges()
+    assert len(ranges) == count
+    assert ranges[0][0] == 0 and ranges[-1][1] == SIZE - 1
+    assert all(end + 1 == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+
+def test_download_writes_every_range(serve, tmp_path):
+    server = serve()
+    url = server.add("stream", SIZE)
+    path = os.path.join(tmp_path, "out")
+    assert downloader(url, path, size=None, segment_size=100_000).download() == SIZE
+    with open(path, "rb") as f:
+        assert f.read() == _synthetic(0, SIZE)
+    assert server.requests == 12  # The size probe, then one request per range
+
+
+def test_resume_from_manifest(serve, tmp_path):
+    url = serve().add("stream", SIZE)
+    path = os.path.join(tmp_path, "out")
+    manifest_path = os.path.join(tmp_path, "job.json")
+    cancel = threading.Event()
+
+    def stop_halfway(_chunk: bytes, remaining: int) -> None:
+        if remaining <= SIZE // 2:
+            cancel.set()
+
+    with pytest.raises(DownloadAbortedError):
+        downloader(
+            url,
+            path,
+            segments=4,
+            manifest=JobManifest(manifest_path),
+            stream_id="137",
+            cancel=cancel,
+            on_progress=stop_halfway,
+        ).download()
+    done = JobManifest(manifest_path).completed("137")
+    assert 0 < done < SIZE
+
+    fetched = []
+    downloader(
+        url,
+        path,
+        segments=4,
+        manifest=JobManifest(manifest_path),
+        stream_id="137",
+        on_progress=lambda chunk, _remaining: fetched.append(len(chunk)),
+    ).download()
+    assert sum(fetched) == SIZE - done
+    with open(path, "rb") as f:
+        assert f.read() == _synthetic(0, SIZE)
+    assert JobManifest(manifest_path).completed("137") == SIZE
+
+
+def test_size_mismatch(serve, tmp_path):
+    url = serve().add("stream", SIZE)
+    path = os.path.join(tmp_path, "out")
+
+    def grow_file(_chunk: bytes, remaining: int) -> None:
+        if remaining == 0:
+            with open(path, "ab") as f:  # Another writer appends to the output
+                f.write(b"\0")
+
+    with pytest.raises(DownloadError, match="Size mismatch"):
+        downloader(url, path, segments=2, on_progress=grow_file).download()
@@ -0,0 +1,85 @@
+"""
+Claiming staging areas and committing their files.
+"""
+
+import os
+import shutil
+import pytest
+from Youtube import staging
+from Youtube.errors import InsufficientSpaceError, JobInProgressError, _FileExistsError
+from Youtube.staging import StagingArea, commit_file
+
+
+def staged(root, name: str = "out.mp4") -> str:
+    path = os.path.join(root, name)
+    with open(path, "wb") as f:
+        f.write(b"data")
+    return path
+
+
+def test_claim_is_exclusive_until_released(tmp_path):
+    area = StagingArea(str(tmp_path), "dQw4w9WgXcQ_3_720p").claim()
+    assert os.path.isdir(area.path)
+    with pytest.raises(JobInProgressError):
+        StagingArea(str(tmp_path), "dQw4w9WgXcQ_3_720p").claim()
+    area.release()
+    StagingArea(str(tmp_path), "dQw4w9WgXcQ_3_720p").claim().release()
+
+
+def test_claim_checks_free_space(tmp_path):
+    free = shutil.disk_usage(tmp_path).free
+    with pytest.raises(InsufficientSpaceError):
+        StagingArea(str(tmp_path), "job").claim(needed=free)
+    assert not os.path.exists(os.path.join(tmp_path, "job"))
+    StagingArea(str(tmp_path), "job").claim().release()  # Not left marked as running
+
+
+@pytest.mark.parametrize("same_filesystem", [True, False])
+def test_commit_file(tmp_path, monkeypatch, same_filesystem):
+    monkeypatch.setattr(staging, "same_filesystem", lambda a, b: same_filesystem)
+    src = staged(tmp_path)
+    os.makedirs(os.path.join(tmp_path, "downloads"))
+    dest = os.path.join(tmp_path, "downloads", "out.mp4")
+    commit_file(src, dest)
+    assert not os.path.exists(src)
+    with open(dest, "rb") as f:
+        assert f.read() == b"data"
+    assert os.listdir(os.path.join(tmp_path, "downloads")) == ["out.mp4"]  # No .part left
+
+
+def test_commit_file_across_filesystems_cleans_up_on_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, "same_filesystem", lambda a, b: False)
+
+    def fail(src, dest):
+        with open(dest, "wb") as f:
+            f.write(b"da")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(staging.shutil, "copyfile", fail)
+    src = staged(tmp_path)
+    os.makedirs(os.path.join(tmp_path, "downloads"))
+    with pytest.raises(OSError):
+        commit_file(src, os.path.join(tmp_path, "downloads", "out.mp4"))
+    assert os.path.exists(src)  # Kept for a retry
+    assert os.listdir(os.path.join(tmp_path, "downloads")) == []
+
+
+def test_commit_file_never_overwrites(tmp_path):
+    dest = staged(tmp_path, "existing.mp4")
+    with pytest.raises(_FileExistsError):
+        commit_file(staged(tmp_path), dest)
+
+
+def test_commit_file_from_ram(tmp_path):
+    root = staging.ram_root()
+    if root is None or staging.same_filesystem(root, str(tmp_path)):
+        pytest.skip("No RAM-backed staging root on another filesystem")
+    area = StagingArea(root, f"test-{os.getpid()}").claim()
+    try:
+        dest = os.path.join(tmp_path, "out.mp4")
+        commit_file(staged(area.path), dest)
+        with open(dest, "rb") as f:
+            assert f.read() == b"data"
+    finally:
+        area.release()
+        shutil.rmtree(area.path, ignore_errors=True)
@@ -0,0 +1,93 @@
+"""
+Stream ranking of plan_streams.
+"""
+
+import pytest
+from Youtube.streams import StreamInfo, plan_streams
+
+MB = 1 << 20
+
+
+def video(itag, resolution, filesize, codec="avc1.640028", mime="video/mp4"):
+    return StreamInfo(
+        itag,
+        f"https://host/{itag}",
+        mime,
+        filesize,
+        resolution=resolution,
+        video_codec=codec,
+        includes_video=True,
+    )
+
+
+def audio(itag, abr, codec="mp4a.40.2", mime="audio/mp4"):
+    return StreamInfo(
+        itag,
+        f"https://host/{itag}",
+        mime,
+        4 * MB,
+        abr=abr,
+        audio_codec=codec,
+        includes_audio=True,
+    )
+
+
+PROGRESSIVE_360 = StreamInfo(
+    18,
+    "https://host/18",
+    "video/mp4",
+    20 * MB,
+    resolution="360p",
+    video_codec="avc1.42001E",
+    audio_codec="mp4a.40.2",
+    is_progressive=True,
+    includes_audio=True,
+    includes_video=True,
+)
+STREAMS = [
+    video(137, "1080p", 80 * MB),
+    video(248, "1080p", 60 * MB, codec="vp9", mime="video/webm"),
+    video(136, "720p", 40 * MB),
+    video(135, "480p", 20 * MB),
+    PROGRESSIVE_360,
+    audio(140, "128kbps"),
+    audio(251, "160kbps", codec="opus", mime="audio/webm"),
+]
+
+
+def test_audio_prefers_mp4_copyable_then_bitrate():
+    plan = plan_streams(STREAMS, 1, "")
+    assert plan.video is None and plan.audio.itag == 140
+    assert plan_streams([audio(139, "48kbps"), audio(140, "128kbps")], 1, "").audio.itag == 140
+
+
+def test_copyable_beats_smaller():
+    plan = plan_streams(STREAMS, 3, "1080p")
+    assert (plan.video.itag, plan.audio.itag) == (137, 140)
+    assert "preferred over" in plan.reason
+
+
+def test_cheapest_at_the_same_rank():
+    streams = [video(399, "1080p", 50 * MB, codec="av01.0.08M.08"), *STREAMS]
+    assert plan_streams(streams, 2, "1080p").video.itag == 399
+
+
+def test_progressive_when_merging_costs_more():
+    plan = plan_streams(STREAMS + [video(134, "360p", 18 * MB)], 3, "360p")
+    assert plan.video is PROGRESSIVE_360 and not plan.needs_merge
+
+
+@pytest.mark.parametrize(
+    "wanted, chosen", [("1440p", "1080p"), ("600p", "480p"), ("144p", "360p")]
+)
+def test_missing_resolution_falls_back_to_the_closest(wanted, chosen):
+    plan = plan_streams(STREAMS, 2, wanted)
+    assert plan.resolution == chosen
+    assert f"{wanted} unavailable" in plan.reason
+
+
+def test_no_usable_stream():
+    with pytest.raises(LookupError):
+        plan_streams([audio(140, "128kbps")], 2, "720p")
+    with pytest.raises(LookupError):
+        plan_streams([video(137, "1080p", 80 * MB)], 1, "")
@@ -0,0 +1,86 @@
+"""
+Offline validation and canonicalization of YouTube URLs.
+"""
+
+import pytest
+from Youtube.errors import InvalidURLError
+from Youtube.urls import canonicalize, parse_url, playlist_id, video_id
+
+VIDEO = "dQw4w9WgXcQ"
+PLAYLIST = "PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        VIDEO,
+        f"https://www.youtube.com/watch?v={VIDEO}",
+        f"http://youtube.com/watch?feature=share&v={VIDEO}",
+        f"www.youtube.com/watch?v={VIDEO}#t=30",
+        f"https://m.youtube.com/watch?v={VIDEO}",
+        f"https://music.youtube.com/watch?v={VIDEO}",
+        f"https://youtu.be/{VIDEO}?si=abc",
+        f"https://www.youtube.com/shorts/{VIDEO}",
+        f"https://www.youtube.com/embed/{VIDEO}",
+        f"https://www.youtube-nocookie.com/embed/{VIDEO}",
+        f"https://www.youtube.com/live/{VIDEO}",
+        f"  https://YOUTU.BE/{VIDEO}  ",
+    ],
+)
+def test_video_forms(url):
+    parsed = parse_url(url)
+    assert parsed.video_id == VIDEO
+    assert parsed.watch_url == f"https://www.youtube.com/watch?v={VIDEO}"
+    assert parsed.playlist_id is None
+
+
+def test_playlist_forms():
+    assert parse_url(f"https://www.youtube.com/playlist?list={PLAYLIST}").video_id is None
+    parsed = parse_url(f"https://www.youtube.com/watch?v={VIDEO}&list={PLAYLIST}&index=2")
+    assert (parsed.video_id, parsed.playlist_id) == (VIDEO, PLAYLIST)
+    assert parsed.playlist_url == f"https://www.youtube.com/playlist?list={PLAYLIST}"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "",
+        "not a url",
+        f"https://example.com/watch?v={VIDEO}",
+        f"https://notyoutube.com/watch?v={VIDEO}",
+        f"https://youtube.com.evil.com/watch?v={VIDEO}",
+        "https://www.youtube.com/watch?v=short",
+        f"https://www.youtube.com/watch?v={VIDEO}x",
+        "https://www.youtube.com/",
+    ],
+)
+def test_rejected_forms(url):
+    with pytest.raises(InvalidURLError):
+        parse_url(url)
+    assert video_id(url) is None and playlist_id(url) is None
+
+
+def test_canonicalize_deduplicates_and_reports():
+    urls = [
+        f"https://youtu.be/{VIDEO}",
+        f"https://www.youtube.com/watch?v={VIDEO}&t=10",
+        "https://example.com/",
+        f"https://www.youtube.com/playlist?list={PLAYLIST}",
+        "9bZkp7q19f0",
+    ]
+    unique, rejected = canonicalize(urls)
+    assert [parsed.video_id for parsed in unique] == [VIDEO, "9bZkp7q19f0"]
+    assert [url for url, _ in rejected] == urls[1:4]
+    assert rejected[0][1] == f"Duplicate of {VIDEO}"
+    assert rejected[2][1].startswith("No video ID")
+
+
+def test_canonicalize_playlists():
+    urls = [
+        f"https://www.youtube.com/playlist?list={PLAYLIST}",
+        f"https://www.youtube.com/watch?v={VIDEO}&list={PLAYLIST}",
+        f"https://youtu.be/{VIDEO}",
+    ]
+    unique, rejected = canonicalize(urls, playlists=True)
+    assert [parsed.playlist_id for parsed in unique] == [PLAYLIST]
+    assert [url for url, _ in rejected] == urls[1:]